@@ -0,0 +1,82 @@
+"""Benchmark approximate (IVF) against exact vector search.
+
+Builds both indexes over a synthetic clustered corpus and reports build time,
+recall@k against exact search and p50/p99 single-query latency for each
+`nprobe`.
+
+Usage: `uv run python -m benchmarks.bench_ann [--rows N] [--dim D] [--nprobe 1 4 16]`
+"""
+
+import argparse
+import time
+from typing import Any, Callable
+
+import numpy as np
+
+
+def synthetic_corpus(rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Gaussian blobs around random centers, like topic-clustered embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(clusters, size=rows)
+    return (centers[labels] + 0.5 * rng.normal(size=(rows, dim))).astype(np.float32)
+
+
+def _latencies(
+    search: Callable[[np.ndarray], list[list[Any]]], queries: np.ndarray
+) -> tuple[list[set[str]], float, float]:
+    found: list[set[str]] = []
+    timings: list[float] = []
+    for query in queries:
+        start = time.perf_counter()
+        hits = search(query)
+        timings.append(time.perf_counter() - start)
+        found.append({hit.id for hit in hits[0]})
+    p50, p99 = np.percentile(timings, [50, 99]) * 1000
+    return found, float(p50), float(p99)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None, help="default: sqrt(rows)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    from src.retrieval.ivf_index import IVFIndex
+    from src.retrieval.vector_index import VectorIndex
+
+    vectors = synthetic_corpus(args.rows, args.dim, args.clusters)
+    queries = synthetic_corpus(args.queries, args.dim, args.clusters, seed=1)
+    ids = [str(i) for i in range(args.rows)]
+    texts = [""] * args.rows
+
+    start = time.perf_counter()
+    exact = VectorIndex(args.dim, capacity=args.rows)
+    exact.add(ids, vectors, texts)
+    exact_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ivf = IVFIndex(args.dim, nlist=args.nlist)
+    ivf.add(ids, vectors, texts)
+    if not ivf.trained:
+        ivf.train()
+    ivf_build = time.perf_counter() - start
+
+    expected, p50, p99 = _latencies(lambda q: exact.search(q, args.k), queries)
+    print(f"rows={args.rows} dim={args.dim} k={args.k} nlist={len(ivf._lists)}")
+    print(f"{'index':>12} {'build s':>8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'exact':>12} {exact_build:>8.2f} {1.0:>9.3f} {p50:>8.2f} {p99:>8.2f}")
+    for nprobe in args.nprobe:
+        found, p50, p99 = _latencies(lambda q: ivf.search(q, args.k, nprobe=nprobe), queries)
+        recall = np.mean([len(e & f) / args.k for e, f in zip(expected, found)])
+        label = f"ivf/{nprobe}"
+        print(f"{label:>12} {ivf_build:>8.2f} {recall:>9.3f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Offline throughput and latency benchmark of the API.
+
+The chat model is replaced by `FakeChatModel`, so runs need no provider
+access and model latency is controlled from the command line. Concurrent
+clients drive the ASGI app in-process through four phases (create users,
+create conversations, send messages, list conversations) against a temporary
+SQLite database. For each phase it reports requests/s, p50/p95/p99 latency and
+the database time per request (wall time spent inside SQL statements).
+
+Results are compared with a stored baseline (BASELINE_PATH); the run fails
+if a phase's throughput drops or its p95 latency grows by more than
+`--tolerance`. Baselines are machine-specific: record one with
+`--save-baseline` on the machine that runs the comparison.
+
+Usage: `uv run doit bench [--save]` or
+`uv run python -m benchmarks.bench_api [--concurrency N] [--requests N] [--latency-ms MS] [--save-baseline]`
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+import httpx
+import numpy as np
+from sqlalchemy import Engine, event
+
+from benchmarks.fake_chat_model import FakeChatModel, install
+
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "bench_api.json"
+PHASES = ("create_user", "create_conversation", "send_message", "list_conversations")
+
+
+@dataclass
+class PhaseResult:
+    requests: int
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    db_ms_per_request: float
+
+
+class DatabaseTimer:
+    """Sums the time spent executing statements on the engines it is attached to."""
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def attach(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn: Any, *args: Any) -> None:
+        conn.info.setdefault("bench_started", []).append(time.perf_counter())
+
+    def _after(self, conn: Any, *args: Any) -> None:
+        elapsed = time.perf_counter() - conn.info["bench_started"].pop()
+        with self._lock:
+            self.seconds += elapsed
+
+
+async def _run_phase(
+    request: Callable[[int], Awaitable[httpx.Response]],
+    count: int,
+    concurrency: int,
+    timer: DatabaseTimer,
+) -> tuple[PhaseResult, list[Any]]:
+    """Issue `request(0..count-1)` from `concurrency` workers; returns stats and JSON bodies."""
+    latencies = [0.0] * count
+    bodies: list[Any] = [None] * count
+    next_index = iter(range(count))
+
+    async def worker() -> None:
+        for index in next_index:
+            start = time.perf_counter()
+            response = await request(index)
+            latencies[index] = time.perf_counter() - start
+            response.raise_for_status()
+            bodies[index] = response.json()
+
+    db_before = timer.seconds
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    result = PhaseResult(
+        requests=count,
+        rps=count / elapsed,
+        p50_ms=float(p50),
+        p95_ms=float(p95),
+        p99_ms=float(p99),
+        db_ms_per_request=(timer.seconds - db_before) * 1000 / count,
+    )
+    return result, bodies
+
+
+async def run(args: argparse.Namespace) -> dict[str, PhaseResult]:
+    import src.database.utils as db_utils
+    from src.api_server import app
+    from src.database.migrations import run_migrations
+
+    install(
+        FakeChatModel(
+            latency_ms=args.latency_ms,
+            latency_sigma=args.latency_sigma,
+            tokens=args.tokens,
+            token_latency_ms=args.token_latency_ms,
+        )
+    )
+    timer = DatabaseTimer()
+    results: dict[str, PhaseResult] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+        await db_utils.dispose_engines()
+        engine = db_utils.init_engine()
+        run_migrations(engine)
+        timer.attach(engine)
+        timer.attach(db_utils.init_async_engine().sync_engine)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            users = args.requests // 10 or 1
+
+            async def create_user(i: int) -> httpx.Response:
+                return await client.post("/api/v1/users", json={"name": f"user {i}"})
+
+            results["create_user"], bodies = await _run_phase(
+                create_user, users, args.concurrency, timer
+            )
+            user_ids = [body["id"] for body in bodies]
+
+            async def create_conversation(i: int) -> httpx.Response:
+                user_id = user_ids[i % len(user_ids)]
+                return await client.post("/api/v1/conversations", json={"user_id": user_id})
+
+            results["create_conversation"], bodies = await _run_phase(
+                create_conversation, args.requests, args.concurrency, timer
+            )
+            conversation_ids = [body["id"] for body in bodies]
+
+            async def send_message(i: int) -> httpx.Response:
+                conversation_id = conversation_ids[i % len(conversation_ids)]
+                return await client.post(
+                    f"/api/v1/conversations/{conversation_id}/messages",
+                    json={"content": f"question {i}"},
+                )
+
+            results["send_message"], _ = await _run_phase(
+                send_message, args.requests, args.concurrency, timer
+            )
+
+            async def list_conversations(i: int) -> httpx.Response:
+                user_id = user_ids[i % len(user_ids)]
+                return await client.get("/api/v1/conversations", params={"user_id": user_id})
+
+            results["list_conversations"], _ = await _run_phase(
+                list_conversations, args.requests, args.concurrency, timer
+            )
+        await db_utils.dispose_engines()
+    return results
+
+
+def _config(args: argparse.Namespace) -> dict[str, Any]:
+    keys = ("concurrency", "requests", "latency_ms", "latency_sigma", "tokens", "token_latency_ms")
+    return {key: getattr(args, key) for key in keys}
+
+
+def compare(
+    results: dict[str, PhaseResult], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """Describe every phase that regressed against `baseline` by more than `tolerance`."""
+    regressions = []
+    for phase, result in results.items():
+        reference = baseline["results"].get(phase)
+        if reference is None:
+            continue
+        if result.rps < reference["rps"] * (1 - tolerance):
+            regressions.append(f"{phase}: {result.rps:.1f} req/s vs. baseline {reference['rps']:.1f}")
+        if result.p95_ms > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{phase}: p95 {result.p95_ms:.1f} ms vs. baseline {reference['p95_ms']:.1f}"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000, help="per phase; users get a tenth")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal shape")
+    parser.add_argument("--tokens", type=float, default=50.0, help="mean reply length")
+    parser.add_argument("--token-latency-ms", type=float, default=0.0)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{'phase':>20} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'db ms/req':>10}")
+    for phase in PHASES:
+        r = results[phase]
+        print(
+            f"{phase:>20} {r.rps:>9.1f} {r.p50_ms:>8.1f} {r.p95_ms:>8.1f} {r.p99_ms:>8.1f} "
+            f"{r.db_ms_per_request:>10.2f}"
+        )
+
+    current = {
+        "config": _config(args),
+        "results": {phase: asdict(result) for phase, result in results.items()},
+    }
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; record one with --save-baseline")
+        return
+    baseline = json.loads(args.baseline.read_text())
+    if baseline["config"] != current["config"]:
+        print("Baseline was recorded with different settings; not comparing")
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
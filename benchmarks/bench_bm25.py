@@ -0,0 +1,68 @@
+"""Benchmark the BM25 inverted index on a large synthetic corpus.
+
+Documents are drawn from a Zipf-distributed vocabulary, like natural text,
+with a unique product code each. Reports build time, postings size and
+p50/p99 latency for word queries and exact-identifier queries.
+
+Usage: `uv run python -m benchmarks.bench_bm25 [--docs N] [--words W]`
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+def synthetic_corpus(docs: int, words: int, vocabulary: int, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    ranks = np.minimum(rng.zipf(1.2, size=(docs, words)), vocabulary)
+    return [
+        " ".join(f"w{rank}" for rank in row) + f" SKU-{i:07d}" for i, row in enumerate(ranks)
+    ]
+
+
+def _percentiles(timings: list[float]) -> tuple[float, float]:
+    p50, p99 = np.percentile(timings, [50, 99]) * 1000
+    return float(p50), float(p99)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=200_000)
+    parser.add_argument("--words", type=int, default=100)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    from src.retrieval.bm25 import BM25Index
+
+    texts = synthetic_corpus(args.docs, args.words, args.vocabulary)
+    start = time.perf_counter()
+    index = BM25Index()
+    index.add([str(i) for i in range(args.docs)], texts)
+    build_s = time.perf_counter() - start
+
+    rng = np.random.default_rng(1)
+    suites = {
+        "3 words": [
+            " ".join(f"w{rank}" for rank in rng.integers(1, 2000, size=3))
+            for _ in range(args.queries)
+        ],
+        "identifier": [f"SKU-{i:07d}" for i in rng.integers(args.docs, size=args.queries)],
+    }
+    print(f"docs={args.docs} words/doc={args.words} build={build_s:.1f}s "
+          f"postings={index.postings_bytes / 2**20:.0f} MiB")
+    print(f"{'query':>12} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, queries in suites.items():
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, args.k)
+            timings.append(time.perf_counter() - start)
+        p50, p99 = _percentiles(timings)
+        print(f"{name:>12} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark conversation listing on a large table, with and without its indexes.
+
+Seeds `--conversations` rows (default 1M) spread over `--users` users, then
+times `GET /api/v1/conversations` for one user: the whole list (no `limit`),
+the first page and a page half-way through the user's conversations reached
+by keyset cursor, in creation and update order. Each is measured without
+the conversation indexes and again after `add_missing_indexes` created them,
+the same way migration 0004 does on an existing database.
+
+Usage: `uv run python -m benchmarks.bench_conversation_pagination [--conversations N] [--users N] [--limit N]`
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+import httpx
+from sqlalchemy import Engine, text
+
+
+SEED_BATCH = 50_000
+
+
+def _seed(engine: Engine, conversations: int, users: int) -> None:
+    from src.database.models import conversations as conversations_table
+    from src.database.models import user_profiles
+
+    start = datetime(2026, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(user_profiles.insert(), [{"data": {"name": f"user {i}"}} for i in range(users)])
+        for offset in range(0, conversations, SEED_BATCH):
+            conn.execute(
+                conversations_table.insert(),
+                [
+                    {
+                        "user_id": i % users + 1,
+                        "data": {},
+                        "last_message": {"role": "assistant", "content": "hello", "timestamp": "2026-01-01T00:00:00"},
+                        "message_count": 2,
+                        # Update order differs from creation order
+                        "updated_at": start + timedelta(seconds=(i * 7919) % conversations),
+                        "version": 0,
+                    }
+                    for i in range(offset, min(offset + SEED_BATCH, conversations))
+                ],
+            )
+
+
+def _set_indexes(engine: Engine, present: bool) -> None:
+    from src.database.migrations import add_missing_indexes
+    from src.database.models import conversations
+
+    with engine.begin() as conn:
+        if present:
+            add_missing_indexes(conn, conversations)
+        else:
+            for index in conversations.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        conn.execute(text("ANALYZE"))
+
+
+async def _time(client: httpx.AsyncClient, params: dict[str, Any], repeats: int) -> tuple[float, httpx.Response]:
+    """Median latency in milliseconds and the last response."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response = await client.get("/api/v1/conversations", params=params)
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return statistics.median(timings) * 1000, response
+
+
+async def _middle_cursor(client: httpx.AsyncClient, params: dict[str, Any], per_user: int) -> str:
+    """The cursor of the page starting half-way through the user's conversations."""
+    response = await client.get(
+        "/api/v1/conversations", params=dict(params, limit=max(per_user // 2, 1))
+    )
+    return response.headers["x-next-cursor"]
+
+
+async def _measure(client: httpx.AsyncClient, args: argparse.Namespace) -> dict[str, float]:
+    per_user = args.conversations // args.users
+    results = {}
+    results["full list"], _ = await _time(client, {"user_id": 1}, args.repeats)
+    for order in ("created", "updated"):
+        params = {"user_id": 1, "order": order, "limit": args.limit}
+        results[f"{order}: first page"], _ = await _time(client, params, args.repeats)
+        cursor = await _middle_cursor(client, {"user_id": 1, "order": order}, per_user)
+        results[f"{order}: middle page"], _ = await _time(client, dict(params, cursor=cursor), args.repeats)
+    return results
+
+
+async def run(args: argparse.Namespace) -> dict[str, dict[str, float]]:
+    import src.database.utils as db_utils
+    from src.api_server import app
+    from src.database.migrations import run_migrations
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+        await db_utils.dispose_engines()
+        engine = db_utils.init_engine()
+        run_migrations(engine)
+        _set_indexes(engine, present=False)
+        start = time.perf_counter()
+        _seed(engine, args.conversations, args.users)
+        print(f"Seeded {args.conversations} conversations in {time.perf_counter() - start:.1f}s")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            results["no indexes"] = await _measure(client, args)
+            start = time.perf_counter()
+            _set_indexes(engine, present=True)
+            print(f"Created indexes in {time.perf_counter() - start:.1f}s")
+            results["indexes"] = await _measure(client, args)
+        await db_utils.dispose_engines()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=50, help="page size")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{'request':>22} {'no indexes ms':>14} {'indexes ms':>11}")
+    for name, without in results["no indexes"].items():
+        print(f"{name:>22} {without:>14.2f} {results['indexes'][name]:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
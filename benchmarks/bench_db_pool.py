@@ -0,0 +1,82 @@
+"""Benchmark API request throughput for each DB_POOL_PROFILE.
+
+Drives a mixed send/read/list workload with concurrent clients against the
+ASGI app in-process. The model call is replaced by a no-op so the numbers
+reflect the database layer.
+
+Usage: `uv run python -m benchmarks.bench_db_pool [--concurrency N] [--requests N]`
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Any
+
+import httpx
+
+
+async def _client_loop(client: httpx.AsyncClient, user_id: int, iterations: int) -> int:
+    conversation = (await client.post("/api/v1/conversations", json={"user_id": user_id})).json()
+    messages_url = f"/api/v1/conversations/{conversation['id']}/messages"
+    done = 1
+    for _ in range(iterations):
+        response = await client.post(messages_url, json={"content": "hello"})
+        response.raise_for_status()
+        await client.get(messages_url, params={"limit": 20})
+        await client.get("/api/v1/conversations", params={"user_id": user_id})
+        done += 3
+    return done
+
+
+async def run(profile: str, concurrency: int, requests: int) -> float:
+    """Return requests per second for one pool profile."""
+    import src.database.utils as db_utils
+    from src.api_server import app
+    from src.database.migrations import run_migrations
+    from src.graphs.simple_generation_graph import SimpleGenerationGraph
+
+    async def fake_ainvoke(
+        self: Any, messages: Any, user_profile: Any, memory: Any = None
+    ) -> str:
+        return "pong"
+
+    SimpleGenerationGraph.ainvoke = fake_ainvoke  # type: ignore[method-assign]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+        os.environ["DB_POOL_PROFILE"] = profile
+        await db_utils.dispose_engines()
+        run_migrations(db_utils.init_engine())
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            user_id = (await client.post("/api/v1/users", json={"name": "bench"})).json()["id"]
+            iterations = max(1, requests // (concurrency * 3))
+            start = time.perf_counter()
+            counts = await asyncio.gather(
+                *(_client_loop(client, user_id, iterations) for _ in range(concurrency))
+            )
+            elapsed = time.perf_counter() - start
+        await db_utils.dispose_engines()
+    return sum(counts) / elapsed
+
+
+def main() -> None:
+    from src.database.utils import POOL_PROFILES
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--profiles", nargs="+", default=list(POOL_PROFILES))
+    args = parser.parse_args()
+
+    print(f"{'profile':>10} {'requests/s':>12}")
+    for profile in args.profiles:
+        rps = asyncio.run(run(profile, args.concurrency, args.requests))
+        print(f"{profile:>10} {rps:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
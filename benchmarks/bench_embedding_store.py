@@ -0,0 +1,98 @@
+"""Benchmark worker startup with the memory-mapped embedding store.
+
+Compares opening an `EmbeddingStore` (what a worker does on startup with
+EMBEDDING_STORE_DIR set) against rebuilding an in-memory `VectorIndex` from the
+chunks table, the default startup path.
+
+Usage: `uv run python -m benchmarks.bench_embedding_store [--rows N] [--dim D]`
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def _seed_table(rows: int, dim: int, rng: np.random.Generator) -> None:
+    from datetime import datetime
+
+    from src.database.models import chunks, documents
+    from src.database.utils import get_engine
+
+    with get_engine().begin() as conn:
+        conn.execute(
+            documents.insert().values(
+                id=1,
+                source="bench",
+                content_hash="",
+                embedding_model=f"hashing-{dim}",
+                updated_at=datetime.utcnow(),
+            )
+        )
+        for start in range(0, rows, 10_000):
+            batch = rng.normal(size=(min(10_000, rows - start), dim)).astype(np.float32)
+            conn.execute(
+                chunks.insert(),
+                [
+                    {
+                        "document_id": 1,
+                        "position": start + i,
+                        "content_hash": str(start + i),
+                        "text": f"chunk {start + i}",
+                        "embedding": vector.tobytes(),
+                    }
+                    for i, vector in enumerate(batch)
+                ],
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    import src.database.utils as db_utils
+    from src.database.migrations import run_migrations
+    from src.retrieval.embedding_store import EmbeddingStore
+    from src.retrieval.embeddings import HashingEmbedder
+    from src.retrieval.ingestion import load_index
+    from src.retrieval.vector_index import VectorIndex
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+        db_utils._engine = None
+        run_migrations()
+        _seed_table(args.rows, args.dim, rng)
+        embedder = HashingEmbedder(args.dim)
+
+        start = time.perf_counter()
+        index = VectorIndex(args.dim)
+        load_index(embedder=embedder, index=index)
+        rebuild_s = time.perf_counter() - start
+
+        store_dir = Path(tmp) / "store"
+        load_index(embedder=embedder, index=EmbeddingStore(store_dir, args.dim))
+
+        query = rng.normal(size=(1, args.dim))
+        start = time.perf_counter()
+        store = EmbeddingStore(store_dir, args.dim)
+        open_s = time.perf_counter() - start
+        start = time.perf_counter()
+        store.search(query, k=4)
+        first_search_s = time.perf_counter() - start
+        db_utils.get_engine().dispose()
+        db_utils._engine = None
+
+    print(f"rows={args.rows} dim={args.dim}")
+    print(f"{'rebuild VectorIndex from table':>32}: {rebuild_s * 1000:10.1f} ms")
+    print(f"{'open EmbeddingStore':>32}: {open_s * 1000:10.1f} ms")
+    print(f"{'first search on opened store':>32}: {first_search_s * 1000:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark how long a fresh interpreter takes to import the API server.
+
+Times `import src.api_server` in new processes, which is what every API
+worker pays before it can start, and lists the heavy generation-stack
+packages (langgraph, langchain, openai) that import pulled in; they should
+only be loaded by warmup or the first generation.
+
+Usage: `uv run python -m benchmarks.bench_import_time [--repeats N]`
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import src.api_server
+elapsed = time.perf_counter() - start
+heavy = sorted({name.split(".")[0] for name in sys.modules if name.startswith(("langgraph", "langchain", "openai"))})
+print(elapsed, ",".join(heavy))
+"""
+
+
+def _import_api_server() -> tuple[float, str]:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[0]), output[1] if len(output) > 1 else ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [_import_api_server() for _ in range(args.repeats)]
+    timings = [elapsed * 1000 for elapsed, _ in runs]
+    print(f"{'median ms':>10} {'min ms':>8} {'max ms':>8}  heavy modules")
+    print(
+        f"{statistics.median(timings):>10.1f} {min(timings):>8.1f} {max(timings):>8.1f}"
+        f"  {runs[-1][1] or '-'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark `GET /api/v1/conversations` against conversation history length.
+
+Listing reads only the denormalized summary columns, so its cost should stay
+flat as every conversation grows.
+
+Usage: `uv run python -m benchmarks.bench_list_conversations [--conversations N]`
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+def _seed(user_id: int, conversations: int, history: int) -> None:
+    from src.conversation import Conversation
+
+    for _ in range(conversations):
+        conversation = Conversation(user_id=user_id)
+        conversation.data["messages"].extend(
+            {
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": "lorem ipsum dolor sit amet " * 20,
+                "timestamp": "2026-01-01T00:00:00",
+            }
+            for i in range(history)
+        )
+        conversation.save()
+
+
+def run(history: int, conversations: int, repeats: int) -> float:
+    """Return the median list latency in milliseconds for one history length."""
+    from fastapi.testclient import TestClient
+
+    import src.database.utils as db_utils
+    from src.api_server import app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+        asyncio.run(db_utils.dispose_engines())
+        with TestClient(app) as client:
+            user_id = client.post("/api/v1/users", json={"name": "bench"}).json()["id"]
+            _seed(user_id, conversations, history)
+
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                response = client.get("/api/v1/conversations", params={"user_id": user_id})
+                timings.append(time.perf_counter() - start)
+                assert response.status_code == 200
+        asyncio.run(db_utils.dispose_engines())
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--history", type=int, nargs="+", default=[2, 100, 1000])
+    args = parser.parse_args()
+
+    print(f"{'messages/conversation':>22} {'median list ms':>15}")
+    for history in args.history:
+        median_ms = run(history, args.conversations, args.repeats)
+        print(f"{history:>22} {median_ms:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
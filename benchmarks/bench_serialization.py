@@ -0,0 +1,98 @@
+"""Microbenchmark of encoding message-heavy responses, per message.
+
+Compares, for `GET /api/v1/conversations/{id}/messages` bodies of growing
+history length:
+
+- models: a `MessageResponse` per stored message, then FastAPI's
+  `response_model` validation and serialization and `JSONResponse` (the
+  route's previous path)
+- stored: the stored message dicts encoded straight to JSON bytes by
+  `StoredJSONResponse` (the current path)
+
+Usage: `uv run python -m benchmarks.bench_serialization [--messages N ...] [--repeats N]`
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from src.api_server import (
+    MessageResponse,
+    MessagesResponse,
+    StoredJSONResponse,
+    _message_dicts,
+    app,
+)
+
+
+def _messages_route() -> APIRoute:
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.endpoint.__name__ == "get_messages":
+            return route
+    raise LookupError("get_messages route not found")
+
+
+def _history(count: int) -> dict[str, Any]:
+    return {
+        "messages": [
+            {
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": "lorem ipsum dolor sit amet " * 10,
+                "timestamp": "2026-01-01T00:00:00.000000",
+            }
+            for i in range(count)
+        ]
+    }
+
+
+async def encode_models(data: dict[str, Any], route: APIRoute) -> bytes:
+    page = [MessageResponse(**msg, seq=i) for i, msg in enumerate(data["messages"])]
+    content = MessagesResponse(conversation_id=1, messages=page, has_more=False)
+    serialized = await serialize_response(field=route.response_field, response_content=content)
+    return JSONResponse(serialized).body
+
+
+async def encode_stored(data: dict[str, Any]) -> bytes:
+    page = _message_dicts(data)
+    return StoredJSONResponse({"conversation_id": 1, "messages": page, "has_more": False}).body
+
+
+async def _best_seconds(encode: Callable[[], Awaitable[bytes]], number: int) -> float:
+    """Fastest of five rounds of `number` calls, per call."""
+    rounds = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(number):
+            await encode()
+        rounds.append((time.perf_counter() - start) / number)
+    return min(rounds)
+
+
+async def run(args: argparse.Namespace) -> None:
+    route = _messages_route()
+    print(f"{'messages':>9} {'models us/msg':>14} {'stored us/msg':>14} {'speedup':>8}")
+    for count in args.messages:
+        data = _history(count)
+        stored = MessagesResponse.model_validate_json(await encode_stored(data))
+        assert stored == MessagesResponse.model_validate_json(await encode_models(data, route))
+        models = await _best_seconds(lambda: encode_models(data, route), args.repeats)
+        fast = await _best_seconds(lambda: encode_stored(data), args.repeats)
+        print(
+            f"{count:>9} {models / count * 1e6:>14.2f} {fast / count * 1e6:>14.2f} "
+            f"{models / fast:>7.1f}x"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
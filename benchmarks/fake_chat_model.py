@@ -0,0 +1,114 @@
+"""Deterministic stand-in for a provider chat model, for offline benchmarks.
+
+Each call waits a time-to-first-token drawn from a log-normal distribution
+(median `latency_ms`, shape `latency_sigma`) plus `token_latency_ms` per
+generated token, and answers with a Poisson(`tokens`)-length reply. Draws come
+from one RNG seeded with `seed`, so a run replays the same sequence of
+latencies and reply lengths. `install` makes `init_chat_model` return it.
+"""
+
+import asyncio
+import math
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+
+class FakeChatModel(BaseChatModel):
+    latency_ms: float = 200.0
+    latency_sigma: float = 0.5
+    tokens: float = 50.0
+    token_latency_ms: float = 0.0
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr()
+    _rng_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-latency"
+
+    def _draw(self) -> tuple[float, list[str]]:
+        """Time to first token in seconds and the reply tokens of the next call."""
+        with self._rng_lock:
+            first = self.latency_ms * math.exp(self.latency_sigma * self._rng.gauss(0, 1)) / 1000
+            # Knuth's Poisson sampler; reply lengths stay small
+            limit, count, product = math.exp(-self.tokens), 0, self._rng.random()
+            while product > limit:
+                count += 1
+                product *= self._rng.random()
+        return first, [f"token{i}" for i in range(max(count, 1))]
+
+    def _total_delay(self, first: float, tokens: list[str]) -> float:
+        return first + len(tokens) * self.token_latency_ms / 1000
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        first, tokens = self._draw()
+        time.sleep(self._total_delay(first, tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(" ".join(tokens)))])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        first, tokens = self._draw()
+        await asyncio.sleep(self._total_delay(first, tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(" ".join(tokens)))])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        first, tokens = self._draw()
+        time.sleep(first)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_latency_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=(" " if i else "") + token))
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        first, tokens = self._draw()
+        await asyncio.sleep(first)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.token_latency_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=(" " if i else "") + token))
+
+
+def install(model: FakeChatModel) -> None:
+    """Make the registry build `model` for every model name and drop cached clients."""
+    from src.graphs import registry
+
+    setattr(registry, "init_chat_model", lambda *args, **kwargs: model)
+    registry.reload()
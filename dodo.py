@@ -1,11 +1,16 @@
 """Doit tasks for this repository.
 
-Includes tasks for tests, coverage and mypy
+Includes tasks for tests, coverage, mypy, database migrations, document ingestion
+and the API benchmark
 
 Usage:
 - `uv run doit test`
 - `uv run doit mypy`
 - `uv run doit coverage`
+- `uv run doit migrate`
+- `uv run doit ingest [--path DIR]`
+- `uv run doit bench [--save]`
+- `uv run doit worker [--workers N]`
 """
 
 from __future__ import annotations
@@ -184,3 +189,67 @@ def task_mypy() -> Dict[str, object]:
         "verbosity": 2,
         "doc": "Run mypy type checks",
     }
+
+
+def task_migrate() -> Dict[str, object]:
+    return {
+        "actions": ["uv run python -m src.database.migrations"],
+        "verbosity": 2,
+        "doc": "Create missing tables and apply pending data migrations",
+    }
+
+
+def task_ingest() -> Dict[str, object]:
+    return {
+        "actions": ["uv run python -m src.retrieval.ingestion %(path)s"],
+        "params": [
+            {
+                "name": "path",
+                "long": "path",
+                "default": "",
+                "help": "Directory to ingest (default: INGEST_ROOT)",
+            }
+        ],
+        "verbosity": 2,
+        "doc": "Chunk, embed and index new or changed documents; drop removed ones",
+    }
+
+
+def task_worker() -> Dict[str, object]:
+    return {
+        "actions": ["uv run python -m src.jobs --workers %(workers)s"],
+        "params": [
+            {
+                "name": "workers",
+                "long": "workers",
+                "type": int,
+                "default": 4,
+                "help": "Concurrent jobs in this process",
+            }
+        ],
+        "verbosity": 2,
+        "doc": "Run background generation workers draining the job queue",
+    }
+
+
+def task_bench() -> Dict[str, object]:
+    from doit.action import CmdAction
+
+    def command(save: bool) -> str:
+        flag = " --save-baseline" if save else ""
+        return f"uv run python -m benchmarks.bench_api{flag}"
+
+    return {
+        "actions": [CmdAction(command)],
+        "params": [
+            {
+                "name": "save",
+                "long": "save",
+                "type": bool,
+                "default": False,
+                "help": "Record the results as the new baseline instead of comparing",
+            }
+        ],
+        "verbosity": 2,
+        "doc": "Benchmark the API with a fake chat model and compare with the stored baseline",
+    }
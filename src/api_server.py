@@ -1,16 +1,39 @@
+import asyncio
+import json
+from dataclasses import asdict
 from datetime import datetime
-from typing import Any
+from typing import Any, AsyncIterator, Literal
 
 from dotenv import load_dotenv
 
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import pydantic_core
 from pydantic import BaseModel, Field
-from sqlalchemy import select
-
-from src.conversation import Conversation
-from src.database.models import conversations, metadata
-from src.database.utils import get_engine, init_engine
-from src.user_profile import UserProfile
+from sqlalchemy import select, tuple_
+
+from src.batch import send_batch
+from src.conversation import Conversation, ConversationConflict, conversation_loads
+from src.database.migrations import run_migrations
+from src.database.models import conversations
+from src.database.utils import (
+    dispose_engines,
+    get_async_engine,
+    get_engine,
+    init_async_engine,
+    init_engine,
+)
+from src.graphs import registry
+from src.graphs.response_cache import get_response_cache
+from src.graphs.retrieve import uses_lexical_index
+from src.jobs import Job, enqueue, jobs_enabled, start_workers, stop_workers, wait_for_job
+from src.metrics import MetricsMiddleware, metrics_enabled, render
+from src.retrieval.bm25 import get_bm25_index
+from src.retrieval.embedding_cache import CachedEmbedder
+from src.retrieval.embeddings import get_embedder
+from src.retrieval.ingestion import get_ingest_root, ingest, reload_indexes
+from src.user_profile import UserProfile, get_profile_cache, profile_loads
+from src.warmup import is_ready, start_warmup, wait_until_ready
 
 
 load_dotenv(".env")
@@ -37,6 +60,7 @@ class MessageResponse(BaseModel):
     role: str
     content: str
     timestamp: str
+    seq: int | None = None
 
 
 class ConversationResponse(BaseModel):
@@ -49,11 +73,14 @@ class ConversationListItem(BaseModel):
     id: int
     user_id: int
     last_message: MessageResponse | None
+    message_count: int = 0
+    updated_at: str | None = None
 
 
 class MessagesResponse(BaseModel):
     conversation_id: int
     messages: list[MessageResponse]
+    has_more: bool = False
 
 
 class SendMessageResponse(BaseModel):
@@ -62,31 +89,119 @@ class SendMessageResponse(BaseModel):
     messages: list[MessageResponse]
 
 
+class IngestRequest(BaseModel):
+    # Directory relative to INGEST_ROOT; defaults to the whole root
+    path: str = ""
+
+
+class IngestResponse(BaseModel):
+    documents_seen: int
+    documents_skipped: int
+    documents_deleted: int
+    chunks_embedded: int
+    chunks_reused: int
+    chunks_deleted: int
+
+
+class BatchItem(BaseModel):
+    conversation_id: int
+    content: str = Field(min_length=1)
+
+
+class BatchSendRequest(BaseModel):
+    items: list[BatchItem] = Field(min_length=1, max_length=1000)
+    concurrency: int | None = Field(None, ge=1, le=64)
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    conversation_id: int
+    status_code: int
+    assistant: MessageResponse | None = None
+    error: str | None = None
+
+
+class BatchSendResponse(BaseModel):
+    results: list[BatchItemResult]
+
+
+class JobAccepted(BaseModel):
+    job_id: int
+    status: str
+    status_url: str
+
+
+class JobResponse(BaseModel):
+    id: int
+    conversation_id: int
+    status: str
+    attempts: int
+    assistant: MessageResponse | None = None
+    error: str | None = None
+    created_at: str
+    finished_at: str | None = None
+
+
 app = FastAPI(title="Chat API", version="1.0.0")
+app.add_middleware(MetricsMiddleware)
 
 
 @app.on_event("startup")
 def startup() -> None:
-    engine = init_engine()
-    metadata.create_all(engine)
+    run_migrations(init_engine())
+    init_async_engine()
+
+
+@app.on_event("startup")
+async def start_background_tasks() -> None:
+    start_warmup(get_engine())
+    start_workers()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await wait_until_ready()
+    await stop_workers()
+    await dispose_engines()
+
+
+class StoredJSONResponse(JSONResponse):
+    """JSON encoded straight from plain dicts by pydantic-core.
+
+    Routes returning it skip `response_model` validation and serialization,
+    which for long histories cost far more than the query; the model still
+    documents the schema, so content must already match it.
+    """
 
+    def render(self, content: Any) -> bytes:
+        return pydantic_core.to_json(content)
 
-def _as_message_list(data: dict[str, Any]) -> list[MessageResponse]:
+
+def _message_dicts(data: dict[str, Any], start: int = 0) -> list[dict[str, Any]]:
+    """Stored messages in the `MessageResponse` shape."""
     messages = data.get("messages") or []
-    return [MessageResponse(**msg) for msg in messages]
+    return [
+        {
+            "role": msg["role"],
+            "content": msg["content"],
+            "timestamp": msg["timestamp"],
+            "seq": start + i,
+        }
+        for i, msg in enumerate(messages)
+    ]
 
 
 @app.post("/api/v1/users", response_model=UserResponse, status_code=201)
-def create_user(payload: UserCreate) -> UserResponse:
+async def create_user(payload: UserCreate) -> UserResponse:
     profile = UserProfile(name=payload.name)
-    user_id = profile.save()
+    user_id = await profile.asave()
     return UserResponse(id=user_id, name=profile.name)
 
 
 @app.get("/api/v1/users/{user_id}", response_model=UserResponse)
-def get_user(user_id: int) -> UserResponse:
+async def get_user(user_id: int) -> UserResponse:
     try:
-        profile = UserProfile.load(user_id)
+        profile = await UserProfile.aload(user_id)
     except KeyError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
     assert profile.id is not None
@@ -94,109 +209,342 @@ def get_user(user_id: int) -> UserResponse:
 
 
 @app.post("/api/v1/conversations", response_model=ConversationResponse, status_code=201)
-def create_conversation(payload: ConversationCreate) -> ConversationResponse:
+async def create_conversation(payload: ConversationCreate) -> ConversationResponse:
     try:
-        UserProfile.load(payload.user_id)
+        await UserProfile.aload(payload.user_id)
     except KeyError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
     conversation = Conversation(user_id=payload.user_id)
-    conversation_id = conversation.save()
-    return ConversationResponse(
-        id=conversation_id,
-        user_id=conversation.user_id,
-        messages=_as_message_list(conversation.data),
-    )
+    conversation_id = await conversation.asave()
+    return ConversationResponse(id=conversation_id, user_id=conversation.user_id, messages=[])
 
 
 @app.get("/api/v1/conversations/{conversation_id}", response_model=ConversationResponse)
-def get_conversation(conversation_id: int) -> ConversationResponse:
+async def get_conversation(conversation_id: int) -> StoredJSONResponse:
     try:
-        conversation = Conversation.load(conversation_id)
+        conversation = await Conversation.aload(conversation_id)
     except KeyError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
     if conversation.id is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    return ConversationResponse(
-        id=conversation.id,
-        user_id=conversation.user_id,
-        messages=_as_message_list(conversation.data),
+    return StoredJSONResponse(
+        {
+            "id": conversation.id,
+            "user_id": conversation.user_id,
+            "messages": _message_dicts(conversation.data, conversation.message_offset),
+        }
     )
 
 
+def _conversation_cursor(order: str, row: Any) -> str:
+    if order == "updated":
+        return f"{row.updated_at.isoformat()},{row.id}"
+    return str(row.id)
+
+
+def _after_cursor(order: str, cursor: str) -> Any:
+    """WHERE clause selecting the conversations listed after `cursor`."""
+    try:
+        if order == "updated":
+            updated_at, conversation_id = cursor.rsplit(",", 1)
+            return tuple_(conversations.c.updated_at, conversations.c.id) < tuple_(
+                datetime.fromisoformat(updated_at), int(conversation_id)
+            )
+        return conversations.c.id > int(cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor {cursor!r}") from exc
+
+
 @app.get("/api/v1/conversations", response_model=list[ConversationListItem])
-def list_conversations(user_id: int = Query(...)) -> list[ConversationListItem]:
-    engine = get_engine()
-    with engine.connect() as conn:
-        rows = conn.execute(
-            select(conversations.c.id, conversations.c.user_id, conversations.c.data)
-            .where(conversations.c.user_id == user_id)
-            .order_by(conversations.c.id.asc())
-        ).all()
+async def list_conversations(
+    response: Response,
+    user_id: int = Query(...),
+    limit: int | None = Query(None, ge=1, le=1000),
+    cursor: str | None = Query(None),
+    order: Literal["created", "updated"] = Query("created"),
+) -> list[ConversationListItem]:
+    query = select(
+        conversations.c.id,
+        conversations.c.user_id,
+        conversations.c.last_message,
+        conversations.c.message_count,
+        conversations.c.updated_at,
+    ).where(conversations.c.user_id == user_id)
+    if cursor is not None:
+        query = query.where(_after_cursor(order, cursor))
+    if order == "updated":
+        query = query.order_by(conversations.c.updated_at.desc(), conversations.c.id.desc())
+    else:
+        query = query.order_by(conversations.c.id.asc())
+    if limit is not None:
+        # One extra row tells whether there is a next page
+        query = query.limit(limit + 1)
+
+    engine = get_async_engine()
+    async with engine.connect() as conn:
+        rows = (await conn.execute(query)).all()
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _conversation_cursor(order, rows[-1])
 
     items: list[ConversationListItem] = []
     for row in rows:
-        messages = row.data.get("messages") or []
-        last_message = messages[-1] if messages else None
+        last_message = None
+        if row.last_message:
+            last_message = MessageResponse(**row.last_message, seq=row.message_count - 1)
         items.append(
             ConversationListItem(
                 id=row.id,
                 user_id=row.user_id,
-                last_message=MessageResponse(**last_message) if last_message else None,
+                last_message=last_message,
+                message_count=row.message_count,
+                updated_at=row.updated_at.isoformat() if row.updated_at else None,
             )
         )
     return items
 
 
 @app.get("/api/v1/conversations/{conversation_id}/messages", response_model=MessagesResponse)
-def get_messages(conversation_id: int) -> MessagesResponse:
+async def get_messages(
+    conversation_id: int,
+    limit: int | None = Query(None, ge=1, le=1000),
+    before: int | None = Query(None, ge=0),
+    after: int | None = Query(None, ge=-1),
+) -> StoredJSONResponse:
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use only one of 'before' and 'after'")
+
+    # Forward pages fetch one extra row to tell whether newer messages remain
+    fetch = limit + 1 if limit is not None and after is not None else limit
     try:
-        conversation = Conversation.load(conversation_id)
+        conversation = await Conversation.aload(
+            conversation_id, limit=fetch, before=before, after=after
+        )
     except KeyError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
     if conversation.id is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    return MessagesResponse(
-        conversation_id=conversation.id,
-        messages=_as_message_list(conversation.data),
+    page = _message_dicts(conversation.data, conversation.message_offset)
+    if after is not None:
+        has_more = limit is not None and len(page) > limit
+        page = page[:limit]
+    else:
+        has_more = bool(page) and page[0]["seq"] > 0
+    return StoredJSONResponse(
+        {"conversation_id": conversation.id, "messages": page, "has_more": has_more}
     )
 
 
 @app.post(
     "/api/v1/conversations/{conversation_id}/messages",
     response_model=SendMessageResponse,
+    responses={202: {"model": JobAccepted}},
 )
-def send_message(conversation_id: int, payload: MessageCreate) -> SendMessageResponse:
+async def send_message(
+    conversation_id: int,
+    payload: MessageCreate,
+    mode: Literal["sync", "async"] = Query("sync"),
+) -> JSONResponse:
+    if mode == "async":
+        if not jobs_enabled():
+            raise HTTPException(
+                status_code=503,
+                detail="Background jobs are disabled; set JOB_WORKERS to enable mode=async",
+            )
+        try:
+            job_id = await enqueue(conversation_id, payload.content)
+        except KeyError as exc:
+            raise HTTPException(status_code=404, detail=str(exc)) from exc
+        accepted = JobAccepted(job_id=job_id, status="queued", status_url=f"/api/v1/jobs/{job_id}")
+        return JSONResponse(status_code=202, content=accepted.model_dump())
+
     try:
-        conversation = Conversation.load(conversation_id)
+        conversation = await Conversation.aload(conversation_id)
     except KeyError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
     try:
-        response = conversation.invoke(payload.content)
+        response = await conversation.ainvoke(payload.content)
+    except ConversationConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
     except Exception as exc:
         raise HTTPException(
             status_code=500,
             detail=f"Model invocation failed: {exc}",
         ) from exc
-    messages = _as_message_list(conversation.data)
-    assistant_message = MessageResponse(
-        role="assistant",
-        content=response,
-        timestamp=datetime.utcnow().isoformat(),
-    )
+    messages = _message_dicts(conversation.data)
+    assistant_message = {
+        "role": "assistant",
+        "content": response,
+        "timestamp": datetime.utcnow().isoformat(),
+        "seq": None,
+    }
     if messages:
         assistant_message = messages[-1]
 
     if conversation.id is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    return SendMessageResponse(
-        conversation_id=conversation.id,
-        assistant=assistant_message,
-        messages=messages,
+    return StoredJSONResponse(
+        {
+            "conversation_id": conversation.id,
+            "assistant": assistant_message,
+            "messages": messages,
+        }
+    )
+
+
+def _job_response(job: Job) -> JobResponse:
+    assistant = None
+    if job.result is not None:
+        assistant = MessageResponse(**job.result)
+    return JobResponse(
+        id=job.id,
+        conversation_id=job.conversation_id,
+        status=job.status,
+        attempts=job.attempts,
+        assistant=assistant,
+        error=job.error,
+        created_at=job.created_at.isoformat(),
+        finished_at=job.finished_at.isoformat() if job.finished_at else None,
     )
+
+
+@app.get("/api/v1/jobs/{job_id}", response_model=JobResponse)
+async def get_job_status(job_id: int, wait: float = Query(0, ge=0, le=60)) -> JobResponse:
+    job = await wait_for_job(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
+
+
+@app.post("/api/v1/messages/batch", response_model=BatchSendResponse)
+async def send_messages_batch(payload: BatchSendRequest) -> BatchSendResponse:
+    results = await send_batch(
+        [(item.conversation_id, item.content) for item in payload.items],
+        concurrency=payload.concurrency,
+    )
+    return BatchSendResponse(
+        results=[
+            BatchItemResult(
+                index=result.index,
+                conversation_id=result.conversation_id,
+                status_code=result.status_code,
+                assistant=(
+                    MessageResponse(**result.assistant, seq=result.seq)
+                    if result.assistant is not None
+                    else None
+                ),
+                error=result.error,
+            )
+            for result in results
+        ]
+    )
+
+
+def _ndjson(event: dict[str, Any]) -> bytes:
+    return (json.dumps(event) + "\n").encode()
+
+
+@app.post("/api/v1/conversations/{conversation_id}/messages/stream")
+async def stream_message(conversation_id: int, payload: MessageCreate) -> StreamingResponse:
+    try:
+        conversation = await Conversation.aload(conversation_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in conversation.astream(payload.content):
+                yield _ndjson({"type": "token", "content": chunk})
+        except Exception as exc:
+            yield _ndjson({"type": "error", "detail": f"Model invocation failed: {exc}"})
+            return
+
+        assistant = _message_dicts(conversation.data, conversation.message_offset)[-1]
+        yield _ndjson({"type": "done", "conversation_id": conversation_id, "assistant": assistant})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/api/v1/admin/reload", status_code=204)
+async def reload_models() -> None:
+    registry.reload()
+    # Picks up documents ingested by other workers or `doit ingest`
+    await wait_until_ready()
+    await asyncio.to_thread(reload_indexes, lexical=uses_lexical_index())
+
+
+@app.post("/api/v1/admin/ingest", response_model=IngestResponse)
+async def ingest_documents(payload: IngestRequest) -> IngestResponse:
+    root = get_ingest_root().resolve()
+    target = (root / payload.path).resolve()
+    if not target.is_relative_to(root):
+        raise HTTPException(status_code=400, detail="Path must be inside the ingest root")
+    if not target.is_dir():
+        raise HTTPException(status_code=404, detail=f"Directory {payload.path!r} not found")
+
+    # Warmup skips loading stored chunks into an index that is already non-empty
+    await wait_until_ready()
+    # Reading, embedding and writing are blocking; keep them off the event loop
+    lexical_index = get_bm25_index() if uses_lexical_index() else None
+    stats = await asyncio.to_thread(ingest, target, lexical_index=lexical_index)
+    return IngestResponse(**asdict(stats))
+
+
+@app.get("/api/v1/admin/cache-stats")
+async def cache_stats() -> dict[str, Any]:
+    profile_stats = get_profile_cache().stats
+    stats: dict[str, Any] = {
+        "profile_cache": {
+            "hits": profile_stats.hits,
+            "misses": profile_stats.misses,
+            "hit_ratio": profile_stats.hit_ratio,
+        },
+        "response_cache": None,
+        "embedding_cache": None,
+    }
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        stats["response_cache"] = {
+            "memory_hits": response_cache.stats.memory_hits,
+            "db_hits": response_cache.stats.db_hits,
+            "misses": response_cache.stats.misses,
+            "hit_ratio": response_cache.stats.hit_ratio,
+        }
+    embedder = get_embedder()
+    if isinstance(embedder, CachedEmbedder):
+        stats["embedding_cache"] = {
+            "memory_hits": embedder.stats.memory_hits,
+            "db_hits": embedder.stats.db_hits,
+            "misses": embedder.stats.misses,
+            "hit_ratio": embedder.stats.hit_ratio,
+        }
+    stats["load_coalescing"] = {
+        name: {
+            "calls": flight.stats.calls,
+            "loads": flight.stats.loads,
+            "dedup_ratio": flight.stats.dedup_ratio,
+        }
+        for name, flight in (("conversations", conversation_loads), ("profiles", profile_loads))
+    }
+    return stats
+
+
+@app.get("/ready", include_in_schema=False)
+async def ready() -> JSONResponse:
+    if not is_ready():
+        return JSONResponse({"status": "warming_up"}, status_code=503)
+    return JSONResponse({"status": "ready"})
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    if not metrics_enabled():
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,86 @@
+"""Concurrent fan-out of many (conversation_id, content) turns.
+
+Turns for the same conversation run in submission order, since each one sees
+the previous reply; different conversations run concurrently with at most
+`concurrency` model calls in flight (BATCH_CONCURRENCY, default 8). Each
+conversation is saved once its turns have run, with the same merge-and-retry
+as any other save; a failed save fails only that conversation's turns.
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+from src.conversation import Conversation
+
+
+@dataclass
+class BatchResult:
+    index: int
+    conversation_id: int
+    status_code: int = 200
+    # The stored assistant message and its seq; None when the turn failed
+    assistant: Optional[dict[str, Any]] = None
+    seq: Optional[int] = None
+    error: Optional[str] = None
+
+    def fail(self, status_code: int, error: str) -> None:
+        self.status_code = status_code
+        self.error = error
+        self.assistant = None
+        self.seq = None
+
+
+def get_batch_concurrency() -> int:
+    return int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+
+async def send_batch(
+    items: Sequence[tuple[int, str]], concurrency: Optional[int] = None
+) -> list[BatchResult]:
+    """Generate a reply for every (conversation_id, content) item.
+
+    Returns one result per item, in input order. Unknown conversations give a
+    404 result and failed model calls a 500 result; neither stops the rest.
+    """
+    semaphore = asyncio.Semaphore(concurrency or get_batch_concurrency())
+    results = [BatchResult(index=i, conversation_id=cid) for i, (cid, _) in enumerate(items)]
+    groups: dict[int, list[int]] = {}
+    for index, (conversation_id, _) in enumerate(items):
+        groups.setdefault(conversation_id, []).append(index)
+
+    async def run_group(conversation_id: int, indexes: list[int]) -> None:
+        try:
+            conversation = await Conversation.aload(conversation_id)
+        except KeyError as exc:
+            for index in indexes:
+                results[index].fail(404, str(exc))
+            return
+
+        replies: dict[int, dict[str, Any]] = {}
+        for index in indexes:
+            try:
+                async with semaphore:
+                    await conversation.agenerate(items[index][1])
+            except Exception as exc:
+                results[index].fail(500, f"Model invocation failed: {exc}")
+                continue
+            replies[index] = conversation.data["messages"][-1]
+        if not replies:
+            return
+
+        try:
+            await conversation.asave()
+        except Exception as exc:
+            for index in replies:
+                results[index].fail(500, f"Failed to save results: {exc}")
+            return
+        # Turns saved concurrently by others may have been merged in before ours
+        positions = {id(message): i for i, message in enumerate(conversation.data["messages"])}
+        for index, reply in replies.items():
+            results[index].assistant = reply
+            results[index].seq = conversation.message_offset + positions[id(reply)]
+
+    await asyncio.gather(*(run_group(cid, indexes) for cid, indexes in groups.items()))
+    return results
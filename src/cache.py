@@ -0,0 +1,253 @@
+"""Small in-process and shared caches used in front of database reads.
+
+`LRUCache` is a thread-safe, size-bounded cache with per-entry TTLs.
+`RedisCache` keeps entries in Redis so every worker sees the same values and
+invalidations; it needs the optional `redis` package (`pip install rag[redis]`).
+Both count hits and misses. Async callers use the `a`-prefixed methods, which
+for Redis go through `redis.asyncio` instead of blocking the event loop.
+
+Read-through callers take `generation(key)` before reading the source and
+fill the cache with `set_if_unchanged`, which drops the value if the key was
+deleted (invalidated) in between; otherwise a read that overlaps a write
+could put the pre-write value back until it expires.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+
+# Seconds RedisCache keeps a key's invalidation counter after its last delete
+GENERATION_TTL = 86_400
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class Cache(Protocol):
+    stats: CacheStats
+
+    def get(self, key: str) -> Any | None: ...
+
+    def set(self, key: str, value: Any) -> None: ...
+
+    def generation(self, key: str) -> int: ...
+
+    def set_if_unchanged(self, key: str, value: Any, generation: int) -> bool: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+    async def aget(self, key: str) -> Any | None: ...
+
+    async def ageneration(self, key: str) -> int: ...
+
+    async def aset_if_unchanged(self, key: str, value: Any, generation: int) -> bool: ...
+
+    async def adelete(self, key: str) -> None: ...
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 10_000, ttl: float | None = 300.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every delete; recently deleted keys remember theirs, older
+        # ones are covered by the floor (at worst a fill is dropped needlessly)
+        self._generation = 0
+        self._deleted: OrderedDict[str, int] = OrderedDict()
+        self._deleted_floor = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def _store(self, key: str, value: Any) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._store(key, value)
+
+    def generation(self, key: str) -> int:
+        return self._generation
+
+    def set_if_unchanged(self, key: str, value: Any, generation: int) -> bool:
+        with self._lock:
+            if self._deleted.get(key, self._deleted_floor) > generation:
+                return False
+            self._store(key, value)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+            self._deleted[key] = self._generation
+            self._deleted.move_to_end(key)
+            if len(self._deleted) > self.maxsize:
+                _, forgotten = self._deleted.popitem(last=False)
+                self._deleted_floor = max(self._deleted_floor, forgotten)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._deleted.clear()
+            self._deleted_floor = self._generation
+            self.stats = CacheStats()
+
+    # In memory only, so the async variants never wait on I/O
+    async def aget(self, key: str) -> Any | None:
+        return self.get(key)
+
+    async def ageneration(self, key: str) -> int:
+        return self.generation(key)
+
+    async def aset_if_unchanged(self, key: str, value: Any, generation: int) -> bool:
+        return self.set_if_unchanged(key, value, generation)
+
+    async def adelete(self, key: str) -> None:
+        self.delete(key)
+
+
+class RedisCache:
+    """Shared cache for JSON-serializable values, stored under `prefix`."""
+
+    def __init__(self, url: str, *, prefix: str = "rag:", ttl: float | None = 300.0) -> None:
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError as exc:
+            raise RuntimeError(
+                "RedisCache requires the 'redis' package; install it with `pip install rag[redis]`"
+            ) from exc
+        self.url = url
+        self._client: Any = redis.Redis.from_url(url)
+        self._async_redis: Any = redis.asyncio.Redis
+        # Async connections belong to the event loop that opened them
+        self._async_client: Any = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+        self._watch_error: type[Exception] = redis.WatchError
+        self.prefix = prefix
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    def _aclient(self) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = self._async_redis.from_url(self.url)
+            self._async_loop = loop
+        return self._async_client
+
+    def _decode(self, raw: bytes | None) -> Any | None:
+        if raw is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return json.loads(raw)
+
+    def _ttl(self) -> int | None:
+        return int(self.ttl) if self.ttl is not None else None
+
+    def get(self, key: str) -> Any | None:
+        return self._decode(self._client.get(self.prefix + key))
+
+    async def aget(self, key: str) -> Any | None:
+        return self._decode(await self._aclient().get(self.prefix + key))
+
+    def set(self, key: str, value: Any) -> None:
+        self._client.set(self.prefix + key, json.dumps(value), ex=self._ttl())
+
+    def _generation_key(self, key: str) -> str:
+        return f"{self.prefix}generation:{key}"
+
+    def generation(self, key: str) -> int:
+        return int(self._client.get(self._generation_key(key)) or 0)
+
+    async def ageneration(self, key: str) -> int:
+        return int(await self._aclient().get(self._generation_key(key)) or 0)
+
+    def set_if_unchanged(self, key: str, value: Any, generation: int) -> bool:
+        generation_key = self._generation_key(key)
+        with self._client.pipeline() as pipe:
+            try:
+                pipe.watch(generation_key)
+                if int(pipe.get(generation_key) or 0) != generation:
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.set(self.prefix + key, json.dumps(value), ex=self._ttl())
+                pipe.execute()
+            except self._watch_error:
+                # A delete landed between the check and the write
+                return False
+        return True
+
+    async def aset_if_unchanged(self, key: str, value: Any, generation: int) -> bool:
+        generation_key = self._generation_key(key)
+        async with self._aclient().pipeline() as pipe:
+            try:
+                await pipe.watch(generation_key)
+                if int(await pipe.get(generation_key) or 0) != generation:
+                    await pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.set(self.prefix + key, json.dumps(value), ex=self._ttl())
+                await pipe.execute()
+            except self._watch_error:
+                return False
+        return True
+
+    def delete(self, key: str) -> None:
+        generation_key = self._generation_key(key)
+        with self._client.pipeline() as pipe:
+            pipe.delete(self.prefix + key)
+            pipe.incr(generation_key)
+            # Only has to outlive reads in flight
+            pipe.expire(generation_key, GENERATION_TTL)
+            pipe.execute()
+
+    async def adelete(self, key: str) -> None:
+        generation_key = self._generation_key(key)
+        async with self._aclient().pipeline() as pipe:
+            pipe.delete(self.prefix + key)
+            pipe.incr(generation_key)
+            pipe.expire(generation_key, GENERATION_TTL)
+            await pipe.execute()
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(match=f"{self.prefix}*"):
+            self._client.delete(key)
+        self.stats = CacheStats()
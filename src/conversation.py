@@ -1,20 +1,66 @@
-from dataclasses import dataclass, field
-from typing import Any, Optional
+import copy
+import importlib
+import os
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Optional
 from datetime import datetime
 
-from sqlalchemy import select
+from sqlalchemy import Connection, func, select
+from sqlalchemy.exc import IntegrityError
 
-from src.database.utils import get_engine
-from src.database.models import conversations
-from src.graphs.simple_generation_graph import SimpleGenerationGraph
+from src.database.utils import begin_async_write, get_async_engine, get_engine
+from src.database.migrations import move_legacy_messages, refresh_conversation_summary
+from src.database.models import conversations, messages
+from src.graphs.base_graph import BaseGraph
+from src.graphs.registry import get_graph
+from src.metrics import stage
+from src.singleflight import SingleFlight
 from src.user_profile import UserProfile
 
 
+# Compare-and-swap attempts per save before giving up with ConversationConflict
+MAX_SAVE_ATTEMPTS = 5
+
+
+class ConversationConflict(RuntimeError):
+    """A save kept losing compare-and-swap races with concurrent writers."""
+
+
+# "module:class" paths; graph modules pull in langgraph, so they are imported on first use
+GENERATION_GRAPHS: dict[str, str] = {
+    "simple": "src.graphs.simple_generation_graph:SimpleGenerationGraph",
+    "rag": "src.graphs.rag_graph:RagGraph",
+}
+
+# Concurrent `Conversation.aload`s of the same conversation and window share one read
+conversation_loads: SingleFlight["Conversation"] = SingleFlight()
+
+
+def get_generation_graph() -> BaseGraph:
+    """The graph selected by GENERATION_GRAPH (default "simple")."""
+    name = os.getenv("GENERATION_GRAPH", "simple")
+    if name not in GENERATION_GRAPHS:
+        raise ValueError(
+            f"Unknown GENERATION_GRAPH {name!r}; expected one of {sorted(GENERATION_GRAPHS)}"
+        )
+    module, _, class_name = GENERATION_GRAPHS[name].partition(":")
+    graph_cls: type[BaseGraph] = getattr(importlib.import_module(module), class_name)
+    return get_graph(graph_cls)
+
+
 @dataclass
 class Conversation:
     user_id: int
     id: Optional[int] = None
     data: dict[str, Any] = field(default_factory=dict)
+    # seq of data["messages"][0]; non-zero when only a window of the history is loaded
+    message_offset: int = field(default=0, compare=False)
+    # Number of leading data["messages"] entries already stored in the messages table
+    persisted_messages: int = field(default=0, repr=False, compare=False)
+    # conversations.version this object was loaded at or last saved as
+    version: int = field(default=0, compare=False)
+    # Metadata as loaded or last saved, to tell our changes from concurrent ones
+    base_metadata: dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
 
     def __post_init__(self) -> None:
         if "messages" not in self.data:
@@ -23,6 +69,30 @@ class Conversation:
     def to_dict(self) -> dict[str, Any]:
         return self.data
 
+    def copy(self) -> "Conversation":
+        """A copy that can be changed and saved independently of this one."""
+        data = copy.deepcopy(self._metadata())
+        data["messages"] = [dict(message) for message in self.data["messages"]]
+        return replace(self, data=data, base_metadata=copy.deepcopy(self.base_metadata))
+
+    def _metadata(self) -> dict[str, Any]:
+        return {key: value for key, value in self.data.items() if key != "messages"}
+
+    def _summary(self) -> dict[str, Any]:
+        """Summary column values for this save.
+
+        The message columns are only set when the save appends messages: only
+        then is the loaded window known to be the tail of the conversation.
+        """
+        history = self.data["messages"]
+        summary: dict[str, Any] = {"updated_at": datetime.utcnow()}
+        if len(history) > self.persisted_messages:
+            summary["last_message"] = {
+                key: history[-1][key] for key in ("role", "content", "timestamp")
+            }
+            summary["message_count"] = self.message_offset + len(history)
+        return summary
+
     @classmethod
     def from_dict(
         cls,
@@ -32,59 +102,332 @@ class Conversation:
     ) -> "Conversation":
         return cls(user_id=user_id, data=data, id=id)
 
-    def save(self) -> int:
-        engine = get_engine()
-        with engine.begin() as conn:
-            if self.id is None:
-                result = conn.execute(
-                    conversations.insert().values(user_id=self.user_id, data=self.to_dict())
+    def _merge_concurrent(self, conn: Connection) -> None:
+        """Fold in what other writers saved since this object was loaded.
+
+        Messages they appended are placed before our unsaved ones, which are
+        renumbered after them; metadata keys we did not change take their values.
+        """
+        row = conn.execute(
+            select(conversations.c.data, conversations.c.version).where(
+                conversations.c.id == self.id
+            )
+        ).one_or_none()
+        if row is None:
+            raise KeyError(f"No conversation with id={self.id}")
+        theirs = conn.execute(
+            select(messages.c.role, messages.c.content, messages.c.timestamp)
+            .where(
+                messages.c.conversation_id == self.id,
+                messages.c.seq >= self.message_offset + self.persisted_messages,
+            )
+            .order_by(messages.c.seq.asc())
+        ).all()
+
+        ours = self._metadata()
+        metadata = {
+            key: value for key, value in row.data.items() if key in ours or key not in self.base_metadata
+        }
+        metadata.update(
+            (key, value) for key, value in ours.items() if self.base_metadata.get(key) != value
+        )
+        history = self.data["messages"]
+        merged = [
+            {"role": msg.role, "content": msg.content, "timestamp": msg.timestamp} for msg in theirs
+        ]
+        self.data = dict(
+            metadata,
+            messages=history[: self.persisted_messages] + merged + history[self.persisted_messages :],
+        )
+        self.persisted_messages += len(merged)
+        self.base_metadata = dict(row.data)
+        self.version = row.version
+
+    def _write(self, conn: Connection) -> int:
+        if self.id is None:
+            result = conn.execute(
+                conversations.insert().values(
+                    user_id=self.user_id, data=self._metadata(), version=0, **self._summary()
                 )
-                inserted = result.inserted_primary_key
-                if not inserted:
-                    raise RuntimeError("Failed to insert conversation")
-                self.id = inserted[0]
-            else:
-                conn.execute(
+            )
+            inserted = result.inserted_primary_key
+            if not inserted:
+                raise RuntimeError("Failed to insert conversation")
+            self.id = inserted[0]
+            self.version = 0
+        else:
+            for _ in range(MAX_SAVE_ATTEMPTS):
+                updated = conn.execute(
                     conversations.update()
-                    .where(conversations.c.id == self.id)
-                    .values(user_id=self.user_id, data=self.to_dict())
+                    .where(conversations.c.id == self.id, conversations.c.version == self.version)
+                    .values(
+                        user_id=self.user_id,
+                        data=self._metadata(),
+                        version=self.version + 1,
+                        **self._summary(),
+                    )
+                ).rowcount
+                if updated:
+                    self.version += 1
+                    break
+                self._merge_concurrent(conn)
+            else:
+                raise ConversationConflict(
+                    f"Conversation {self.id} changed concurrently {MAX_SAVE_ATTEMPTS} times"
                 )
+        self.base_metadata = self._metadata()
+
+        pending = self.data["messages"][self.persisted_messages:]
+        if pending:
+            conn.execute(
+                messages.insert(),
+                [
+                    {
+                        "conversation_id": self.id,
+                        "seq": self.message_offset + self.persisted_messages + offset,
+                        "role": msg["role"],
+                        "content": msg["content"],
+                        "timestamp": msg["timestamp"],
+                    }
+                    for offset, msg in enumerate(pending)
+                ],
+            )
+        assert self.id is not None
         return self.id
 
-    @classmethod
-    def load(cls, conversation_id: int) -> "Conversation":
+    def _can_retry(self, attempt: int) -> bool:
+        # Message seq clashes come from writers that append without bumping the
+        # version (e.g. an older release during a rolling deploy)
+        return self.id is not None and attempt < MAX_SAVE_ATTEMPTS - 1
+
+    def save(self) -> int:
         engine = get_engine()
-        with engine.connect() as conn:
-            row = conn.execute(
-                select(conversations.c.user_id, conversations.c.data)
-                .where(conversations.c.id == conversation_id)
-            ).one_or_none()
-            if row is None:
-                raise KeyError(f"No conversation with id={conversation_id}")
-            return cls.from_dict(row.user_id, row.data, id=conversation_id)
+        with stage("conversation_save"):
+            for attempt in range(MAX_SAVE_ATTEMPTS):
+                try:
+                    with engine.begin() as conn:
+                        conversation_id = self._write(conn)
+                    break
+                except IntegrityError:
+                    if not self._can_retry(attempt):
+                        raise
+                    with engine.begin() as conn:
+                        self._merge_concurrent(conn)
+        conversation_loads.forget(conversation_id)
+        self.persisted_messages = len(self.data["messages"])
+        return conversation_id
 
-    def invoke(self, message: str) -> str:
-        self.data["messages"].append(
-            {
-                "role": "user",
-                "content": message,
-                "timestamp": datetime.utcnow().isoformat(),
-            }
+    async def asave(self) -> int:
+        with stage("conversation_save"):
+            for attempt in range(MAX_SAVE_ATTEMPTS):
+                try:
+                    async with begin_async_write() as conn:
+                        conversation_id = await conn.run_sync(self._write)
+                    break
+                except IntegrityError:
+                    if not self._can_retry(attempt):
+                        raise
+                    async with get_async_engine().connect() as conn:
+                        await conn.run_sync(self._merge_concurrent)
+        conversation_loads.forget(conversation_id)
+        self.persisted_messages = len(self.data["messages"])
+        return conversation_id
+
+    @classmethod
+    def _read(
+        cls,
+        conn: Connection,
+        conversation_id: int,
+        limit: Optional[int],
+        before: Optional[int],
+        after: Optional[int],
+    ) -> "Conversation":
+        if before is not None and after is not None:
+            raise ValueError("Only one of 'before' and 'after' may be given")
+
+        row = conn.execute(
+            select(conversations.c.user_id, conversations.c.data, conversations.c.version)
+            .where(conversations.c.id == conversation_id)
+        ).one_or_none()
+        if row is None:
+            raise KeyError(f"No conversation with id={conversation_id}")
+
+        data = row.data
+        if "messages" in data:
+            data = move_legacy_messages(conn, conversation_id, data)
+            refresh_conversation_summary(conn, conversation_id)
+
+        query = select(
+            messages.c.seq, messages.c.role, messages.c.content, messages.c.timestamp
+        ).where(messages.c.conversation_id == conversation_id)
+        if after is not None:
+            query = query.where(messages.c.seq > after).order_by(messages.c.seq.asc())
+        else:
+            if before is not None:
+                query = query.where(messages.c.seq < before)
+            query = query.order_by(messages.c.seq.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        rows = list(conn.execute(query).all())
+
+        if after is None:
+            rows.reverse()
+        if rows:
+            offset = rows[0].seq
+        else:
+            # An empty window continues after the last stored message, so
+            # messages appended to it are saved without leaving seq gaps
+            last = conn.execute(
+                select(func.max(messages.c.seq)).where(messages.c.conversation_id == conversation_id)
+            ).scalar()
+            offset = last + 1 if last is not None else 0
+        data = dict(
+            data,
+            messages=[
+                {"role": msg.role, "content": msg.content, "timestamp": msg.timestamp}
+                for msg in rows
+            ],
         )
+        conversation = cls.from_dict(row.user_id, data, id=conversation_id)
+        conversation.message_offset = offset
+        conversation.persisted_messages = len(rows)
+        conversation.version = row.version
+        conversation.base_metadata = conversation._metadata()
+        return conversation
 
-        user_profile = UserProfile.load(self.user_id).to_dict()
-        messages = self.data["messages"]
+    @classmethod
+    def load(
+        cls,
+        conversation_id: int,
+        *,
+        limit: Optional[int] = None,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> "Conversation":
+        """Load a conversation with all or a window of its messages.
 
-        response = SimpleGenerationGraph().invoke(messages, user_profile)
+        Without cursors the last `limit` messages are loaded (all when `limit`
+        is None). `before`/`after` are exclusive message seq cursors selecting
+        the `limit` messages immediately preceding/following that seq.
+        """
+        engine = get_engine()
+        with stage("conversation_load"), engine.begin() as conn:
+            return cls._read(conn, conversation_id, limit, before, after)
+
+    @classmethod
+    async def aload(
+        cls,
+        conversation_id: int,
+        *,
+        limit: Optional[int] = None,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> "Conversation":
+        """Async variant of `load`.
 
+        Concurrent calls with the same arguments share one read of the
+        database; each caller gets its own copy of the result.
+        """
+        with stage("conversation_load"):
+            conversation = await conversation_loads.run(
+                (conversation_id, limit, before, after),
+                lambda: cls._aread(conversation_id, limit, before, after),
+            )
+        return conversation.copy()
+
+    @classmethod
+    async def _aread(
+        cls,
+        conversation_id: int,
+        limit: Optional[int],
+        before: Optional[int],
+        after: Optional[int],
+    ) -> "Conversation":
+        async with get_async_engine().begin() as conn:
+            return await conn.run_sync(cls._read, conversation_id, limit, before, after)
+
+    def _append(self, role: str, content: str) -> None:
         self.data["messages"].append(
             {
-                "role": "assistant",
-                "content": response,
+                "role": role,
+                "content": content,
                 "timestamp": datetime.utcnow().isoformat(),
             }
         )
 
+    def _prompt_window(self) -> tuple[list[dict[str, str]], dict[str, Any], int]:
+        """Messages not yet folded into the running summary, graph memory and
+        the seq of the first returned message."""
+        summary = self.data.get("summary") or {}
+        start = max(0, summary.get("upto", 0) - self.message_offset)
+        memory = {"summary": summary.get("text", "")}
+        return self.data["messages"][start:], memory, self.message_offset + start
+
+    def _remember(self, memory: dict[str, Any], first_seq: int) -> None:
+        if memory.get("summarized"):
+            self.data["summary"] = {
+                "text": memory["summary"],
+                "upto": first_seq + memory["summarized"],
+            }
+
+    def invoke(self, message: str) -> str:
+        self._append("user", message)
+
+        user_profile = UserProfile.load(self.user_id).to_dict()
+        messages, memory, first_seq = self._prompt_window()
+
+        response = get_generation_graph().invoke(messages, user_profile, memory)
+
+        self._remember(memory, first_seq)
+        self._append("assistant", response)
         self.save()
         return response
 
+    async def agenerate(self, message: str) -> str:
+        """Run one turn in memory without saving it.
+
+        If the model call fails the user message is dropped again, leaving the
+        conversation as it was.
+        """
+        self._append("user", message)
+        try:
+            user_profile = (await UserProfile.aload(self.user_id)).to_dict()
+            messages, memory, first_seq = self._prompt_window()
+            response = await get_generation_graph().ainvoke(messages, user_profile, memory)
+        except BaseException:
+            self.data["messages"].pop()
+            raise
+
+        self._remember(memory, first_seq)
+        self._append("assistant", response)
+        return response
+
+    async def ainvoke(self, message: str) -> str:
+        response = await self.agenerate(message)
+        await self.asave()
+        return response
+
+    async def astream(self, message: str) -> AsyncIterator[str]:
+        """Like `ainvoke` but yields response chunks as the model produces them.
+
+        The assistant message is persisted once the stream has been consumed.
+        If the model stream fails or the consumer stops early (a client
+        disconnect closes or cancels the generator), the user message is
+        dropped again, as in `agenerate`.
+        """
+        self._append("user", message)
+        chunks: list[str] = []
+        try:
+            user_profile = (await UserProfile.aload(self.user_id)).to_dict()
+            messages, memory, first_seq = self._prompt_window()
+            graph = get_generation_graph()
+            async for chunk in graph.astream(messages, user_profile, memory):
+                chunks.append(chunk)
+                yield chunk
+        except BaseException:
+            self.data["messages"].pop()
+            raise
+
+        self._remember(memory, first_seq)
+        self._append("assistant", "".join(chunks))
+        await self.asave()
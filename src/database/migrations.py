@@ -0,0 +1,169 @@
+"""Lightweight, run-once migrations for existing databases.
+
+`metadata.create_all` only creates missing tables; anything that has to touch
+existing rows or tables is registered in `MIGRATIONS` and applied once per
+database, with applied names recorded in `schema_migrations`.
+
+Usage: `uv run doit migrate` (also applied on API server startup).
+"""
+
+from datetime import datetime
+from typing import Any, Callable
+
+from sqlalchemy import Connection, Engine, Table, func, inspect, select, text
+
+from src.database.models import conversations, messages, metadata, schema_migrations
+from src.database.utils import get_engine
+
+
+MigrationFn = Callable[[Connection], None]
+
+
+def move_legacy_messages(conn: Connection, conversation_id: int, data: dict[str, Any]) -> dict[str, Any]:
+    """Move a legacy `data["messages"]` blob into the `messages` table.
+
+    Returns the conversation data without the blob; the caller's row is
+    rewritten with it so the move happens exactly once.
+    """
+    data = dict(data)
+    legacy = data.pop("messages", None) or []
+    if legacy:
+        start = conn.execute(
+            select(func.count())
+            .select_from(messages)
+            .where(messages.c.conversation_id == conversation_id)
+        ).scalar_one()
+        conn.execute(
+            messages.insert(),
+            [
+                {
+                    "conversation_id": conversation_id,
+                    "seq": start + offset,
+                    "role": msg["role"],
+                    "content": msg["content"],
+                    "timestamp": msg.get("timestamp") or datetime.utcnow().isoformat(),
+                }
+                for offset, msg in enumerate(legacy)
+            ],
+        )
+    conn.execute(
+        conversations.update().where(conversations.c.id == conversation_id).values(data=data)
+    )
+    return data
+
+
+def _parse_timestamp(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.utcnow()
+
+
+def refresh_conversation_summary(conn: Connection, conversation_id: int) -> None:
+    """Recompute the denormalized summary columns from the messages table."""
+    last = conn.execute(
+        select(messages.c.seq, messages.c.role, messages.c.content, messages.c.timestamp)
+        .where(messages.c.conversation_id == conversation_id)
+        .order_by(messages.c.seq.desc())
+        .limit(1)
+    ).one_or_none()
+    conn.execute(
+        conversations.update()
+        .where(conversations.c.id == conversation_id)
+        .values(
+            last_message=(
+                {"role": last.role, "content": last.content, "timestamp": last.timestamp}
+                if last is not None
+                else None
+            ),
+            message_count=last.seq + 1 if last is not None else 0,
+            updated_at=_parse_timestamp(last.timestamp) if last is not None else datetime.utcnow(),
+        )
+    )
+
+
+def add_missing_columns(conn: Connection, table: Table) -> None:
+    """Add columns declared on `table` but missing from the database table."""
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"
+        if column.server_default is not None:
+            ddl += f" DEFAULT {column.server_default.arg}"  # type: ignore[attr-defined]
+        if not column.nullable:
+            ddl += " NOT NULL"
+        conn.execute(text(ddl))
+
+
+def add_missing_indexes(conn: Connection, table: Table) -> None:
+    """Create indexes declared on `table` but missing from the database table."""
+    existing = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(conn)
+
+
+def _migrate_message_blobs(conn: Connection) -> None:
+    rows = conn.execute(select(conversations.c.id, conversations.c.data)).all()
+    for row in rows:
+        if "messages" in row.data:
+            move_legacy_messages(conn, row.id, row.data)
+
+
+def _add_conversation_summary(conn: Connection) -> None:
+    add_missing_columns(conn, conversations)
+    for conversation_id in conn.execute(select(conversations.c.id)).scalars().all():
+        refresh_conversation_summary(conn, conversation_id)
+
+
+def _add_conversation_version(conn: Connection) -> None:
+    add_missing_columns(conn, conversations)
+
+
+def _add_conversation_indexes(conn: Connection) -> None:
+    # Keyset pagination by update time needs updated_at on every row
+    missing = conn.execute(
+        select(conversations.c.id).where(conversations.c.updated_at.is_(None))
+    ).scalars().all()
+    for conversation_id in missing:
+        refresh_conversation_summary(conn, conversation_id)
+    add_missing_indexes(conn, conversations)
+
+
+MIGRATIONS: list[tuple[str, MigrationFn]] = [
+    ("0001_message_blobs_to_messages_table", _migrate_message_blobs),
+    ("0002_conversation_summary", _add_conversation_summary),
+    ("0003_conversation_version", _add_conversation_version),
+    ("0004_conversation_indexes", _add_conversation_indexes),
+]
+
+
+def run_migrations(engine: Engine | None = None) -> list[str]:
+    """Create missing tables and apply pending migrations; returns applied names.
+
+    An up-to-date database costs two queries (table names and applied
+    migrations), so this is cheap enough to run on every worker boot.
+    """
+    engine = engine or get_engine()
+    if not set(metadata.tables) <= set(inspect(engine).get_table_names()):
+        metadata.create_all(engine)
+    applied: list[str] = []
+    with engine.begin() as conn:
+        done = set(conn.execute(select(schema_migrations.c.name)).scalars())
+        for name, migrate in MIGRATIONS:
+            if name in done:
+                continue
+            migrate(conn)
+            conn.execute(
+                schema_migrations.insert().values(
+                    name=name, applied_at=datetime.utcnow().isoformat()
+                )
+            )
+            applied.append(name)
+    return applied
+
+
+if __name__ == "__main__":
+    for applied_name in run_migrations():
+        print(f"Applied {applied_name}")
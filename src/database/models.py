@@ -1,4 +1,16 @@
-from sqlalchemy import MetaData, Table, Column, Integer, ForeignKey
+from sqlalchemy import (
+    MetaData,
+    Table,
+    Column,
+    Integer,
+    ForeignKey,
+    String,
+    Text,
+    DateTime,
+    LargeBinary,
+    UniqueConstraint,
+    Index,
+)
 from sqlalchemy.types import JSON
 
 
@@ -17,4 +29,101 @@ conversations = Table(
     Column("id", Integer, primary_key=True, autoincrement=True),
     Column("user_id", Integer, ForeignKey("user_profiles.id"), nullable=False),
     Column("data", JSON, nullable=False),  # arbitrary conversation metadata
+    # Denormalized summary maintained on every save, read by conversation listings
+    Column("last_message", JSON, nullable=True),
+    Column("message_count", Integer, nullable=False, server_default="0"),
+    Column("updated_at", DateTime, nullable=True),
+    # Bumped by every save; saves compare-and-swap on it (see Conversation._write)
+    Column("version", Integer, nullable=False, server_default="0"),
+    # Keyset pagination of a user's conversations in creation or update order
+    Index("ix_conversations_user_id_id", "user_id", "id"),
+    Index("ix_conversations_user_id_updated_at", "user_id", "updated_at", "id"),
+)
+
+# Append-only message log; seq is the 0-based position within the conversation
+messages = Table(
+    "messages",
+    metadata,
+    Column("conversation_id", Integer, ForeignKey("conversations.id"), primary_key=True),
+    Column("seq", Integer, primary_key=True, autoincrement=False),
+    Column("role", String(32), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("timestamp", String(64), nullable=False),
+)
+
+# Persistent tier of the opt-in LLM response cache (src/graphs/response_cache.py)
+llm_responses = Table(
+    "llm_responses",
+    metadata,
+    Column("key", String(64), primary_key=True),
+    Column("model", String(128), nullable=False),
+    Column("response", Text, nullable=False),
+    Column("created_at", DateTime, nullable=False, index=True),
+)
+
+# Ingested source files (src/retrieval/ingestion.py); a file whose content hash
+# and embedding model are unchanged is skipped on re-ingestion
+documents = Table(
+    "documents",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("source", String(1024), nullable=False, unique=True),
+    Column("content_hash", String(64), nullable=False),
+    Column("embedding_model", String(128), nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+# Embedded document chunks; a chunk keeps its row (and embedding) across runs
+# for as long as its text, i.e. content_hash, still occurs in the document
+chunks = Table(
+    "chunks",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("document_id", Integer, ForeignKey("documents.id"), nullable=False, index=True),
+    Column("position", Integer, nullable=False),
+    Column("content_hash", String(64), nullable=False),
+    Column("text", Text, nullable=False),
+    # float32 vector as raw bytes
+    Column("embedding", LargeBinary, nullable=False),
+    UniqueConstraint("document_id", "content_hash"),
+)
+
+# Persistent tier of the embedding cache (src/retrieval/embedding_cache.py)
+embedding_cache = Table(
+    "embedding_cache",
+    metadata,
+    Column("model", String(128), primary_key=True),
+    Column("text_hash", String(64), primary_key=True),
+    # float32 vector as raw bytes
+    Column("embedding", LargeBinary, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+# Background generation jobs (src/jobs.py)
+jobs = Table(
+    "jobs",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("conversation_id", Integer, ForeignKey("conversations.id"), nullable=False),
+    Column("content", Text, nullable=False),
+    # queued -> running -> succeeded | failed
+    Column("status", String(16), nullable=False),
+    Column("attempts", Integer, nullable=False, server_default="0"),
+    Column("worker", String(128), nullable=True),
+    # The stored assistant message with its seq, once succeeded
+    Column("result", JSON, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("started_at", DateTime, nullable=True),
+    Column("finished_at", DateTime, nullable=True),
+    # A running job whose lease has expired is claimed again
+    Column("lease_expires_at", DateTime, nullable=True),
+    Index("ix_jobs_status_id", "status", "id"),
+)
+
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("name", String(128), primary_key=True),
+    Column("applied_at", String(64), nullable=False),
 )
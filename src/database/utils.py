@@ -1,35 +1,155 @@
+import asyncio
 import os
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator
 
-from sqlalchemy import create_engine, Engine
+from sqlalchemy import create_engine, event, Engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 
 
 _engine = None
+_async_engine: AsyncEngine | None = None
 _SessionLocal = None
+_sqlite_write_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# Async drivers used when DATABASE_URL names a backend without one
+_ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+
+
+@dataclass(frozen=True)
+class PoolProfile:
+    pool_size: int
+    max_overflow: int
+    pool_recycle: int  # seconds before a connection is replaced; -1 disables
+    pool_timeout: float = 30.0
+
+
+# Selected with DB_POOL_PROFILE; "none" opens a fresh connection per checkout
+POOL_PROFILES: dict[str, PoolProfile | None] = {
+    "none": None,
+    "small": PoolProfile(pool_size=5, max_overflow=5, pool_recycle=1800),
+    "default": PoolProfile(pool_size=10, max_overflow=20, pool_recycle=1800),
+    "large": PoolProfile(pool_size=40, max_overflow=60, pool_recycle=1800),
+}
+
+# PRAGMAs applied in order to every new SQLite connection; each can be overridden
+# by env. busy_timeout goes first so switching journal_mode waits for other writers.
+SQLITE_PRAGMAS: dict[str, tuple[str, str]] = {
+    "busy_timeout": ("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+    "journal_mode": ("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": ("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": ("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+}
 
 def _is_sqlite_url(url: str) -> bool:
-    return url.startswith("sqlite://")
+    return url.startswith("sqlite")
+
+def _is_sqlite_memory_url(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:"
+
+def get_pool_profile() -> PoolProfile | None:
+    name = os.getenv("DB_POOL_PROFILE", "default")
+    if name not in POOL_PROFILES:
+        raise ValueError(f"Unknown DB_POOL_PROFILE {name!r}; expected one of {sorted(POOL_PROFILES)}")
+    profile = POOL_PROFILES[name]
+    if profile is None:
+        return None
+    overrides: dict[str, Any] = {}
+    for field_name, env_name, cast in (
+        ("pool_size", "DB_POOL_SIZE", int),
+        ("max_overflow", "DB_MAX_OVERFLOW", int),
+        ("pool_recycle", "DB_POOL_RECYCLE", int),
+        ("pool_timeout", "DB_POOL_TIMEOUT", float),
+    ):
+        value = os.getenv(env_name)
+        if value is not None:
+            overrides[field_name] = cast(value)
+    return replace(profile, **overrides)
+
+def _pool_options(url: str) -> dict[str, Any]:
+    if _is_sqlite_url(url) and _is_sqlite_memory_url(url):
+        # In-memory databases live and die with their connection; keep SQLAlchemy's default pool
+        return {}
+    profile = get_pool_profile()
+    if profile is None:
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": profile.pool_size,
+        "max_overflow": profile.max_overflow,
+        "pool_recycle": profile.pool_recycle,
+        "pool_timeout": profile.pool_timeout,
+    }
+
+def _apply_sqlite_pragmas(dbapi_connection: Any, _connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, (env_name, default) in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={os.getenv(env_name, default)}")
+    finally:
+        cursor.close()
 
 def get_database_url() -> str:
     return os.getenv("DATABASE_URL", "sqlite:///./local.db")
 
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.drivername)
+    if driver is None:
+        return url
+    return parsed.set(drivername=f"{parsed.drivername}+{driver}").render_as_string(
+        hide_password=False
+    )
+
 def create_new_engine(db_url: str | None = None, *, echo: bool = False) -> Engine:
     url = db_url or get_database_url()
     if _is_sqlite_url(url):
-        return create_engine(
+        engine = create_engine(
             url,
             echo=echo,
             future=True,
             connect_args={"check_same_thread": False},
-            poolclass=NullPool,
+            **_pool_options(url),
         )
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+        return engine
     else:
         return create_engine(
             url,
             echo=echo,
             future=True,
             pool_pre_ping=True,
+            **_pool_options(url),
+        )
+
+def create_new_async_engine(db_url: str | None = None, *, echo: bool = False) -> AsyncEngine:
+    url = to_async_url(db_url or get_database_url())
+    if _is_sqlite_url(url):
+        engine = create_async_engine(
+            url,
+            echo=echo,
+            connect_args={"check_same_thread": False},
+            **_pool_options(url),
+        )
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        return engine
+    else:
+        return create_async_engine(
+            url,
+            echo=echo,
+            pool_pre_ping=True,
+            **_pool_options(url),
         )
 
 def init_engine(db_url: str | None = None, *, echo: bool = False) -> Engine:
@@ -47,3 +167,48 @@ def get_engine() -> Engine:
         init_engine()
     assert _engine is not None
     return _engine
+
+def init_async_engine(db_url: str | None = None, *, echo: bool = False) -> AsyncEngine:
+    global _async_engine
+    if _async_engine is not None:
+        return _async_engine
+
+    _async_engine = create_new_async_engine(db_url, echo=echo)
+    return _async_engine
+
+def get_async_engine() -> AsyncEngine:
+    if _async_engine is None:
+        init_async_engine()
+    assert _async_engine is not None
+    return _async_engine
+
+@asynccontextmanager
+async def begin_async_write() -> AsyncIterator[AsyncConnection]:
+    """`get_async_engine().begin()` for transactions that write.
+
+    SQLite allows one writer at a time; writers of this process queue on a lock
+    instead of contending through busy_timeout back-off sleeps, which is far
+    slower under concurrent load.
+    """
+    engine = get_async_engine()
+    if engine.dialect.name != "sqlite":
+        async with engine.begin() as conn:
+            yield conn
+        return
+
+    loop = asyncio.get_running_loop()
+    lock = _sqlite_write_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        async with engine.begin() as conn:
+            yield conn
+
+async def dispose_engines() -> None:
+    """Close pooled connections of both engines and forget them."""
+    global _engine, _async_engine, _SessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+    _engine = None
+    _async_engine = None
+    _SessionLocal = None
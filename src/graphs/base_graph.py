@@ -1,9 +1,42 @@
-from typing import Any
+from typing import Any, AsyncIterator
 
 from abc import ABC, abstractmethod
 
 
 class BaseGraph(ABC):
+    """Generation graph over a conversation's messages.
+
+    `memory` carries state the graph keeps between turns (e.g. the running
+    "summary" of messages that precede `messages`). Graphs read it and update
+    it in place; the caller persists it with the conversation.
+    """
+
+    @abstractmethod
+    def invoke(
+        self,
+        messages: list[dict[str, str]],
+        user_profile: dict[str, Any],
+        memory: dict[str, Any] | None = None,
+    ) -> str:
+        pass
+
     @abstractmethod
-    def invoke(self, messages: list[dict[str, str]], user_profile: dict[str, Any]) -> str:
-        pass
\ No newline at end of file
+    async def ainvoke(
+        self,
+        messages: list[dict[str, str]],
+        user_profile: dict[str, Any],
+        memory: dict[str, Any] | None = None,
+    ) -> str:
+        pass
+
+    async def astream(
+        self,
+        messages: list[dict[str, str]],
+        user_profile: dict[str, Any],
+        memory: dict[str, Any] | None = None,
+    ) -> AsyncIterator[str]:
+        """Yield response text chunks; concatenated they form the full response.
+
+        Graphs without token streaming yield the whole response at once.
+        """
+        yield await self.ainvoke(messages, user_profile, memory)
@@ -0,0 +1,107 @@
+"""Context-window management for generation graphs.
+
+`manage_context` keeps the prompt within CONTEXT_TOKEN_BUDGET tokens: recent
+messages are sent verbatim and, once the budget is exceeded, the oldest ones
+are folded into a running summary. Folding is incremental (only newly evicted
+messages are summarized, on top of the previous summary) and goes down to
+CONTEXT_KEEP_RATIO of the budget, so a summarization call happens every few
+turns rather than on every turn.
+"""
+
+import os
+from typing import Any
+
+from src.graphs.registry import get_chat_model
+from src.graphs.states import ConversationState
+from src.metrics import stage
+
+
+SUMMARY_MODEL_NAME = "gpt-4.1-mini"
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Update the summary with the new messages. Keep facts, names, decisions and open "
+    "questions; drop pleasantries. Reply with the updated summary only."
+)
+# Per-message overhead of role and formatting tokens in chat prompts
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def get_token_budget() -> int:
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+
+
+def get_keep_ratio() -> float:
+    return float(os.getenv("CONTEXT_KEEP_RATIO", "0.5"))
+
+
+def count_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: dict[str, str]) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _split_point(messages: list[dict[str, str]], budget: int) -> int:
+    """Index of the first message of the longest suffix that fits `budget`.
+
+    The last message is always kept, even if it alone exceeds the budget.
+    """
+    used = 0
+    split = len(messages)
+    for index in range(len(messages) - 1, -1, -1):
+        used += message_tokens(messages[index])
+        if used > budget and split < len(messages):
+            break
+        split = index
+    return split
+
+
+def _plan(state: ConversationState) -> tuple[list[dict[str, str]], list[dict[str, str]], str]:
+    messages = state["messages"]
+    summary = state.get("summary", "")
+    budget = get_token_budget()
+    total = count_tokens(summary) + sum(message_tokens(message) for message in messages)
+    if total <= budget:
+        return [], messages, summary
+    split = _split_point(messages, int(budget * get_keep_ratio()))
+    return messages[:split], messages[split:], summary
+
+
+def _summary_prompt(summary: str, evicted: list[dict[str, str]]) -> list[dict[str, str]]:
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in evicted)
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {
+            "role": "user",
+            "content": f"Current summary:\n{summary or '(empty)'}\n\nNew messages:\n{transcript}",
+        },
+    ]
+
+
+def _result(summary: str, evicted: int, recent: list[dict[str, str]]) -> dict[str, Any]:
+    context = list(recent)
+    if summary:
+        context.insert(
+            0, {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+        )
+    return {"summary": summary, "summarized": evicted, "context": context}
+
+
+def manage_context(state: ConversationState) -> dict[str, Any]:
+    evicted, recent, summary = _plan(state)
+    if evicted:
+        model = get_chat_model(SUMMARY_MODEL_NAME)
+        with stage("summarize"):
+            summary = str(model.invoke(_summary_prompt(summary, evicted)).content)
+    return _result(summary, len(evicted), recent)
+
+
+async def amanage_context(state: ConversationState) -> dict[str, Any]:
+    evicted, recent, summary = _plan(state)
+    if evicted:
+        model = get_chat_model(SUMMARY_MODEL_NAME)
+        with stage("summarize"):
+            summary = str((await model.ainvoke(_summary_prompt(summary, evicted))).content)
+    return _result(summary, len(evicted), recent)
@@ -0,0 +1,23 @@
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import START, END, StateGraph
+
+from src.graphs.context import amanage_context, manage_context
+from src.graphs.retrieve import aretrieve, retrieve
+from src.graphs.simple_generation_graph import SimpleGenerationGraph, acall_model, call_model
+from src.graphs.states import ConversationState
+
+
+class RagGraph(SimpleGenerationGraph):
+    """SimpleGenerationGraph with a `retrieve` step that grounds the prompt in
+    chunks from the vector index."""
+
+    def _build(self) -> "StateGraph[ConversationState]":
+        builder = StateGraph(ConversationState)
+        builder.add_node("manage_context", RunnableLambda(manage_context, afunc=amanage_context))
+        builder.add_node("retrieve", RunnableLambda(retrieve, afunc=aretrieve))
+        builder.add_node("generate", RunnableLambda(call_model, afunc=acall_model))
+        builder.add_edge(START, "manage_context")
+        builder.add_edge("manage_context", "retrieve")
+        builder.add_edge("retrieve", "generate")
+        builder.add_edge("generate", END)
+        return builder
@@ -0,0 +1,73 @@
+"""Process-wide cache of compiled graphs and chat-model clients.
+
+Graphs are compiled once per class and chat models are created once per
+(model, config) pair, so requests reuse the same provider client and its
+keep-alive connection pool. `reload` drops everything so the next request
+rebuilds from current code/config; `set_chat_model` swaps a single client.
+
+`langchain` is imported on first client creation, not with this module, so
+processes that never generate (or do so only after warmup) do not pay for it.
+"""
+
+import threading
+from typing import Any, TypeVar
+
+from src.graphs.base_graph import BaseGraph
+from src.metrics import stage
+
+
+G = TypeVar("G", bound=BaseGraph)
+ModelKey = tuple[str, tuple[tuple[str, Any], ...]]
+
+_lock = threading.Lock()
+_graphs: dict[type[BaseGraph], BaseGraph] = {}
+_models: dict[ModelKey, Any] = {}
+
+
+def _model_key(model: str, config: dict[str, Any]) -> ModelKey:
+    return model, tuple(sorted(config.items()))
+
+
+def get_graph(graph_cls: type[G]) -> G:
+    graph = _graphs.get(graph_cls)
+    if graph is None:
+        with _lock:
+            graph = _graphs.get(graph_cls)
+            if graph is None:
+                with stage("graph_compile"):
+                    graph = graph_cls()
+                _graphs[graph_cls] = graph
+    assert isinstance(graph, graph_cls)
+    return graph
+
+
+def init_chat_model(model: str, **config: Any) -> Any:
+    from langchain.chat_models import init_chat_model as init
+
+    return init(model, **config)
+
+
+def get_chat_model(model: str, **config: Any) -> Any:
+    """Return the shared client for `model`; `config` values must be hashable."""
+    key = _model_key(model, config)
+    client = _models.get(key)
+    if client is None:
+        with _lock:
+            client = _models.get(key)
+            if client is None:
+                client = init_chat_model(model, **config)
+                _models[key] = client
+    return client
+
+
+def set_chat_model(model: str, client: Any, **config: Any) -> None:
+    """Replace the cached client used for `model` with `config`."""
+    with _lock:
+        _models[_model_key(model, config)] = client
+
+
+def reload() -> None:
+    """Drop all cached graphs and chat models; they are rebuilt on next use."""
+    with _lock:
+        _graphs.clear()
+        _models.clear()
@@ -0,0 +1,177 @@
+"""Opt-in cache of model responses keyed on the normalized prompt.
+
+Enabled with LLM_CACHE_ENABLED=1. The key is a SHA-256 of the model name, the
+user profile and the prompt messages (role + whitespace-normalized content;
+timestamps and other metadata are ignored). Lookups go to an in-process LRU
+first (least recently used entries evicted at LLM_CACHE_MEMORY_SIZE) and then
+to the `llm_responses` table, which keeps entries across restarts and workers
+and is pruned to its LLM_CACHE_MAX_ROWS newest entries. Entries expire after
+LLM_CACHE_TTL seconds in both tiers.
+
+Writes are upserts, so concurrent writers of one key both succeed. A failing
+write is logged and dropped: the response it would have cached is returned
+regardless.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import Connection, delete, func, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from src.cache import LRUCache
+from src.database.models import llm_responses
+from src.database.utils import begin_async_write, get_async_engine, get_engine
+
+
+logger = logging.getLogger(__name__)
+
+# Prune the table once per this many inserts rather than on every insert
+PRUNE_EVERY = 64
+
+
+@dataclass
+class ResponseCacheStats:
+    memory_hits: int = 0
+    db_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        hits = self.memory_hits + self.db_hits
+        total = hits + self.misses
+        return hits / total if total else 0.0
+
+
+class ResponseCache:
+    def __init__(self, *, ttl: float, memory_size: int, max_rows: int) -> None:
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.memory = LRUCache(maxsize=memory_size, ttl=ttl)
+        self.stats = ResponseCacheStats()
+        self._inserts = 0
+
+    @staticmethod
+    def key(model: str, messages: list[dict[str, str]], user_profile: dict[str, Any]) -> str:
+        normalized = [
+            [message.get("role", ""), " ".join(str(message.get("content", "")).split())]
+            for message in messages
+        ]
+        payload = json.dumps([model, user_profile, normalized], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _read(self, conn: Connection, key: str) -> str | None:
+        row = conn.execute(
+            select(llm_responses.c.response, llm_responses.c.created_at).where(
+                llm_responses.c.key == key
+            )
+        ).one_or_none()
+        if row is None or row.created_at < self._expired_before():
+            return None
+        return str(row.response)
+
+    def _expired_before(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.ttl)
+
+    def _write(self, conn: Connection, key: str, model: str, response: str) -> None:
+        values = {"key": key, "model": model, "response": response, "created_at": datetime.utcnow()}
+        updated = {name: value for name, value in values.items() if name != "key"}
+        if conn.dialect.name == "mysql":
+            statement: Any = mysql.insert(llm_responses).values(values)
+            statement = statement.on_duplicate_key_update(updated)
+        else:
+            insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+            statement = insert(llm_responses).values(values)
+            statement = statement.on_conflict_do_update(index_elements=["key"], set_=updated)
+        conn.execute(statement)
+        self._inserts += 1
+        if self._inserts % PRUNE_EVERY == 0:
+            self._prune(conn)
+
+    def _prune(self, conn: Connection) -> None:
+        conn.execute(delete(llm_responses).where(llm_responses.c.created_at < self._expired_before()))
+        excess = conn.execute(select(func.count()).select_from(llm_responses)).scalar_one()
+        excess -= self.max_rows
+        if excess <= 0:
+            return
+        oldest = (
+            select(llm_responses.c.key)
+            .order_by(llm_responses.c.created_at.asc())
+            .limit(excess)
+            .scalar_subquery()
+        )
+        conn.execute(delete(llm_responses).where(llm_responses.c.key.in_(oldest)))
+
+    def _remember(self, key: str, response: str | None) -> str | None:
+        if response is None:
+            self.stats.misses += 1
+        else:
+            self.stats.db_hits += 1
+            self.memory.set(key, response)
+        return response
+
+    def get(self, key: str) -> str | None:
+        cached = self.memory.get(key)
+        if cached is not None:
+            self.stats.memory_hits += 1
+            return str(cached)
+        with get_engine().connect() as conn:
+            return self._remember(key, self._read(conn, key))
+
+    async def aget(self, key: str) -> str | None:
+        cached = self.memory.get(key)
+        if cached is not None:
+            self.stats.memory_hits += 1
+            return str(cached)
+        async with get_async_engine().connect() as conn:
+            response = await conn.run_sync(self._read, key)
+        return self._remember(key, response)
+
+    def set(self, key: str, model: str, response: str) -> None:
+        self.memory.set(key, response)
+        try:
+            with get_engine().begin() as conn:
+                self._write(conn, key, model, response)
+        except Exception:
+            logger.warning("Failed to store cached response", exc_info=True)
+
+    async def aset(self, key: str, model: str, response: str) -> None:
+        self.memory.set(key, response)
+        try:
+            async with begin_async_write() as conn:
+                await conn.run_sync(self._write, key, model, response)
+        except Exception:
+            logger.warning("Failed to store cached response", exc_info=True)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        self.stats = ResponseCacheStats()
+        with get_engine().begin() as conn:
+            conn.execute(delete(llm_responses))
+
+
+_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache | None:
+    """The process-wide response cache, or None unless LLM_CACHE_ENABLED is set."""
+    global _cache
+    if os.getenv("LLM_CACHE_ENABLED", "").lower() not in ("1", "true", "yes"):
+        return None
+    if _cache is None:
+        _cache = ResponseCache(
+            ttl=float(os.getenv("LLM_CACHE_TTL", str(24 * 3600))),
+            memory_size=int(os.getenv("LLM_CACHE_MEMORY_SIZE", "1000")),
+            max_rows=int(os.getenv("LLM_CACHE_MAX_ROWS", "100000")),
+        )
+    return _cache
+
+
+def reset_response_cache() -> None:
+    global _cache
+    _cache = None
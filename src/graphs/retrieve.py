@@ -0,0 +1,127 @@
+"""Retrieval step for generation graphs.
+
+`retrieve` looks up the RETRIEVAL_TOP_K chunks most relevant to the latest
+user message and stores them in `state["retrieved"]`. Chunks are also
+prepended to the prompt as a system message, so the `generate` node answers
+grounded in them. RETRIEVAL_MODE selects the ranking:
+
+- `dense` (default): embedding similarity in the process-wide vector index
+- `lexical`: BM25 over the in-process inverted index
+- `hybrid`: both, merged with reciprocal-rank fusion
+"""
+
+import asyncio
+import os
+from typing import Any, Optional
+
+import numpy as np
+
+from src.graphs.states import ConversationState
+from src.metrics import stage
+from src.retrieval.bm25 import get_bm25_index, reciprocal_rank_fusion
+from src.retrieval.embedding_cache import CachedEmbedder
+from src.retrieval.embeddings import get_embedder
+from src.retrieval.vector_index import SearchHit, get_vector_index
+
+
+RETRIEVAL_PROMPT = (
+    "Answer using the following retrieved passages when they are relevant. "
+    "If they do not contain the answer, say so rather than guessing."
+)
+
+
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+HYBRID_DEPTH_FACTOR = 4
+
+
+def get_top_k() -> int:
+    return int(os.getenv("RETRIEVAL_TOP_K", "4"))
+
+
+def get_retrieval_mode() -> str:
+    mode = os.getenv("RETRIEVAL_MODE", "dense")
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown RETRIEVAL_MODE {mode!r}; expected one of {RETRIEVAL_MODES}")
+    return mode
+
+
+def uses_lexical_index() -> bool:
+    return get_retrieval_mode() != "dense"
+
+
+def _query(state: ConversationState) -> str:
+    for message in reversed(state["messages"]):
+        if message["role"] == "user":
+            return message["content"]
+    return ""
+
+
+def format_passages(chunks: list[dict[str, Any]]) -> str:
+    passages = "\n\n".join(f"[{i}] {chunk['text']}" for i, chunk in enumerate(chunks, start=1))
+    return f"{RETRIEVAL_PROMPT}\n\n{passages}"
+
+
+def dense_search(query: str, k: int, vector: Optional[np.ndarray] = None) -> list[SearchHit]:
+    """Nearest chunks to `query`; `vector` is its embedding if already computed."""
+    index = get_vector_index()
+    if not len(index):
+        return []
+    if vector is None:
+        vector = get_embedder().embed([query])
+    return index.search(vector, k)[0]
+
+
+def search(query: str, k: int, vector: Optional[np.ndarray] = None) -> list[SearchHit]:
+    mode = get_retrieval_mode()
+    if mode == "dense":
+        return dense_search(query, k, vector)
+    if mode == "lexical":
+        return get_bm25_index().search(query, k)
+    # Fusion draws from deeper rankings than it returns
+    depth = k * HYBRID_DEPTH_FACTOR
+    return reciprocal_rank_fusion(
+        [dense_search(query, depth, vector), get_bm25_index().search(query, depth)], k
+    )
+
+
+async def asearch(query: str, k: int) -> list[SearchHit]:
+    """Async `search` that does not block the loop.
+
+    The embedding cache is read and written through the async engine; the
+    scoring over the whole corpus (dense matmul, BM25) runs in a thread.
+    """
+    vector = None
+    embedder = get_embedder()
+    if (
+        isinstance(embedder, CachedEmbedder)
+        and get_retrieval_mode() != "lexical"
+        and len(get_vector_index())
+    ):
+        vector = await embedder.aembed([query])
+    return await asyncio.to_thread(search, query, k, vector)
+
+
+def _with_passages(state: ConversationState, hits: list[SearchHit]) -> dict[str, Any]:
+    if not hits:
+        return {"retrieved": []}
+
+    chunks = [hit.to_dict() for hit in hits]
+    context = state.get("context", state["messages"])
+    return {
+        "retrieved": chunks,
+        "context": [{"role": "system", "content": format_passages(chunks)}, *context],
+    }
+
+
+def retrieve(state: ConversationState) -> dict[str, Any]:
+    query = _query(state)
+    with stage("retrieve"):
+        hits = search(query, get_top_k()) if query else []
+    return _with_passages(state, hits)
+
+
+async def aretrieve(state: ConversationState) -> dict[str, Any]:
+    query = _query(state)
+    with stage("retrieve"):
+        hits = await asearch(query, get_top_k()) if query else []
+    return _with_passages(state, hits)
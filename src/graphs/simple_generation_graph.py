@@ -1,32 +1,137 @@
-from typing import Any
+from typing import Any, AsyncIterator
 
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import START, END, StateGraph
-from langchain.chat_models import init_chat_model
 
 from src.graphs.states import ConversationState
 from src.graphs.base_graph import BaseGraph
+from src.graphs.context import amanage_context, manage_context
+from src.graphs.registry import get_chat_model
+from src.graphs.response_cache import get_response_cache
+from src.metrics import stage
+
+
+MODEL_NAME = "gpt-4.1-mini"
 
 
 def call_model(state: ConversationState) -> dict[str, Any]:
-    model = init_chat_model("gpt-4.1-mini")
-    response = model.invoke(state["messages"])
+    prompt = state.get("context", state["messages"])
+    cache = get_response_cache()
+    if cache is not None:
+        key = cache.key(MODEL_NAME, prompt, state["user_profile"])
+        cached = cache.get(key)
+        if cached is not None:
+            return {"response": cached}
+
+    model = get_chat_model(MODEL_NAME)
+    with stage("model_call"):
+        response = model.invoke(prompt)
+    if cache is not None and isinstance(response.content, str):
+        cache.set(key, MODEL_NAME, response.content)
     return {"response": response.content}
 
 
+async def acall_model(state: ConversationState) -> dict[str, Any]:
+    prompt = state.get("context", state["messages"])
+    cache = get_response_cache()
+    if cache is not None:
+        key = cache.key(MODEL_NAME, prompt, state["user_profile"])
+        cached = await cache.aget(key)
+        if cached is not None:
+            return {"response": cached}
+
+    model = get_chat_model(MODEL_NAME)
+    with stage("model_call"):
+        response = await model.ainvoke(prompt)
+    if cache is not None and isinstance(response.content, str):
+        await cache.aset(key, MODEL_NAME, response.content)
+    return {"response": response.content}
+
+
+def _initial_state(
+    messages: list[dict[str, str]],
+    user_profile: dict[str, Any],
+    memory: dict[str, Any] | None,
+) -> ConversationState:
+    state = ConversationState(messages=messages, user_profile=user_profile)
+    if memory and memory.get("summary"):
+        state["summary"] = memory["summary"]
+    return state
+
+
+def _update_memory(memory: dict[str, Any] | None, result: Any) -> None:
+    if memory is not None and isinstance(result, dict):
+        memory["summary"] = result.get("summary", memory.get("summary", ""))
+        memory["summarized"] = result.get("summarized", 0)
+
+
+def _response_from(result: Any) -> str:
+    if not isinstance(result, dict):
+        raise ValueError("Graph invocation returned an invalid response.")
+    response = result.get("response")
+    if not isinstance(response, str):
+        raise ValueError("Graph response payload is missing a response string.")
+    return response
+
+
 class SimpleGenerationGraph(BaseGraph):
     def __init__(self) -> None:
+        self.graph: Any = self._build().compile()
+
+    def _build(self) -> "StateGraph[ConversationState]":
+        """Wire the nodes; subclasses may add steps but must keep a "generate" node."""
         builder = StateGraph(ConversationState)
-        builder.add_node("generate", call_model)
-        builder.add_edge(START, "generate")
+        builder.add_node("manage_context", RunnableLambda(manage_context, afunc=amanage_context))
+        builder.add_node("generate", RunnableLambda(call_model, afunc=acall_model))
+        builder.add_edge(START, "manage_context")
+        builder.add_edge("manage_context", "generate")
         builder.add_edge("generate", END)
-        self.graph: Any = builder.compile()
-
-    def invoke(self, messages: list[dict[str, str]], user_profile: dict[str, Any]) -> str:
-        initial_state = ConversationState(messages=messages, user_profile=user_profile)
-        result = self.graph.invoke(initial_state)
-        if not isinstance(result, dict):
-            raise ValueError("Graph invocation returned an invalid response.")
-        response = result.get("response")
-        if not isinstance(response, str):
-            raise ValueError("Graph response payload is missing a response string.")
-        return response
+        return builder
+
+    def invoke(
+        self,
+        messages: list[dict[str, str]],
+        user_profile: dict[str, Any],
+        memory: dict[str, Any] | None = None,
+    ) -> str:
+        result = self.graph.invoke(_initial_state(messages, user_profile, memory))
+        _update_memory(memory, result)
+        return _response_from(result)
+
+    async def ainvoke(
+        self,
+        messages: list[dict[str, str]],
+        user_profile: dict[str, Any],
+        memory: dict[str, Any] | None = None,
+    ) -> str:
+        result = await self.graph.ainvoke(_initial_state(messages, user_profile, memory))
+        _update_memory(memory, result)
+        return _response_from(result)
+
+    async def astream(
+        self,
+        messages: list[dict[str, str]],
+        user_profile: dict[str, Any],
+        memory: dict[str, Any] | None = None,
+    ) -> AsyncIterator[str]:
+        initial_state = _initial_state(messages, user_profile, memory)
+        streamed = ""
+        final: Any = None
+        async for mode, payload in self.graph.astream(
+            initial_state, stream_mode=["messages", "values"]
+        ):
+            if mode == "values":
+                final = payload
+                continue
+            chunk, metadata = payload
+            if metadata.get("langgraph_node") != "generate":
+                continue
+            if isinstance(chunk.content, str) and chunk.content:
+                streamed += chunk.content
+                yield chunk.content
+
+        # Models that do not stream tokens only surface the final state
+        _update_memory(memory, final)
+        response = _response_from(final)
+        if response.startswith(streamed) and len(response) > len(streamed):
+            yield response[len(streamed):]
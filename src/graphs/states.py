@@ -4,4 +4,12 @@ from typing import TypedDict, Any, NotRequired
 class ConversationState(TypedDict):
     messages: list[dict[str, str]]
     user_profile: dict[str, Any]
-    response: NotRequired[str]
\ No newline at end of file
+    response: NotRequired[str]
+    # Running summary of the turns that precede `messages`
+    summary: NotRequired[str]
+    # Leading `messages` entries folded into `summary` during this run
+    summarized: NotRequired[int]
+    # Prompt actually sent to the model once the context budget is applied
+    context: NotRequired[list[dict[str, str]]]
+    # Chunks found by the retrieve node: {"id", "score", "text", "metadata"}
+    retrieved: NotRequired[list[dict[str, Any]]]
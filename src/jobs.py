@@ -0,0 +1,356 @@
+"""Durable queue of background generation jobs.
+
+`POST /api/v1/conversations/{id}/messages?mode=async` stores the turn as a
+row in the `jobs` table and returns at once; a `JobWorkerPool` claims queued
+rows, runs the turn and records the assistant message (or the error) on the
+row, where `GET /api/v1/jobs/{id}` polls or long-polls for it.
+
+Background execution is opt-in. Workers run as JOB_WORKERS (default 0)
+asyncio tasks in every API process and/or in separate worker processes
+(`uv run doit worker`; set JOB_EXTERNAL_WORKERS in the API processes so
+they accept jobs without running workers themselves). A claim is an
+`UPDATE ... RETURNING` that checks again that the job is still claimable,
+so concurrent workers never run the same job; a worker that loses the race
+moves on to the next one. A claim holds a lease of JOB_LEASE_SECONDS; jobs
+of a worker that died are claimed again once the lease expires, up to
+JOB_MAX_ATTEMPTS claims, after which they fail. Delivery is therefore
+at-least-once: a worker that dies after saving the turn but before
+completing its job leads to a second turn.
+
+Idle workers look for work every JOB_POLL_INTERVAL seconds; jobs enqueued
+and finished in the same process wake workers and waiters immediately.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import Connection, and_, or_, select, update
+
+from src.conversation import Conversation
+from src.database.models import conversations, jobs
+from src.database.utils import begin_async_write, get_async_engine
+
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+def get_worker_count() -> int:
+    return int(os.getenv("JOB_WORKERS", "0"))
+
+
+def jobs_enabled() -> bool:
+    """Whether queued jobs will be run: by this process or by separate workers."""
+    external = os.getenv("JOB_EXTERNAL_WORKERS", "").lower() in ("1", "true", "yes")
+    return get_worker_count() > 0 or external
+
+
+def get_poll_interval() -> float:
+    return float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+
+def get_lease() -> timedelta:
+    return timedelta(seconds=float(os.getenv("JOB_LEASE_SECONDS", "300")))
+
+
+def get_max_attempts() -> int:
+    return int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+@dataclass
+class Job:
+    id: int
+    conversation_id: int
+    content: str
+    status: str
+    attempts: int
+    # {"role", "content", "timestamp", "seq"} of the stored reply once succeeded
+    result: Optional[dict[str, Any]]
+    error: Optional[str]
+    created_at: datetime
+    finished_at: Optional[datetime]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    @classmethod
+    def from_row(cls, row: Any) -> "Job":
+        return cls(
+            id=row.id,
+            conversation_id=row.conversation_id,
+            content=row.content,
+            status=row.status,
+            attempts=row.attempts,
+            result=row.result,
+            error=row.error,
+            created_at=row.created_at,
+            finished_at=row.finished_at,
+        )
+
+
+# Waiters on jobs of this process and how many there are; other processes
+# notice changes by polling
+_finished: dict[int, asyncio.Event] = {}
+_waiters: dict[int, int] = {}
+
+
+def _insert(conn: Connection, conversation_id: int, content: str) -> int:
+    exists = conn.execute(
+        select(conversations.c.id).where(conversations.c.id == conversation_id)
+    ).first()
+    if exists is None:
+        raise KeyError(f"No conversation with id={conversation_id}")
+    result = conn.execute(
+        jobs.insert().values(
+            conversation_id=conversation_id,
+            content=content,
+            status=QUEUED,
+            attempts=0,
+            created_at=datetime.utcnow(),
+        )
+    )
+    inserted = result.inserted_primary_key
+    if not inserted:
+        raise RuntimeError("Failed to insert job")
+    job_id: int = inserted[0]
+    return job_id
+
+
+async def enqueue(conversation_id: int, content: str) -> int:
+    """Queue a turn for `conversation_id`; returns the job id.
+
+    Raises KeyError if the conversation does not exist.
+    """
+    async with begin_async_write() as conn:
+        job_id = await conn.run_sync(_insert, conversation_id, content)
+    if _pool is not None:
+        _pool.wake()
+    return job_id
+
+
+def _read(conn: Connection, job_id: int) -> Optional[Job]:
+    row = conn.execute(select(jobs).where(jobs.c.id == job_id)).one_or_none()
+    return Job.from_row(row) if row is not None else None
+
+
+async def get_job(job_id: int) -> Optional[Job]:
+    async with get_async_engine().connect() as conn:
+        return await conn.run_sync(_read, job_id)
+
+
+async def wait_for_job(job_id: int, timeout: float) -> Optional[Job]:
+    """The job once it has finished or `timeout` seconds have passed; None if unknown."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    # Registered before the first read so a finish in between is not missed
+    event = _finished.setdefault(job_id, asyncio.Event())
+    _waiters[job_id] = _waiters.get(job_id, 0) + 1
+    try:
+        while True:
+            job = await get_job(job_id)
+            remaining = deadline - loop.time()
+            if job is None or job.finished or remaining <= 0:
+                return job
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, get_poll_interval()))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        # The last waiter removes the event, unless a finish already replaced it
+        _waiters[job_id] -= 1
+        if not _waiters[job_id]:
+            del _waiters[job_id]
+            if _finished.get(job_id) is event:
+                del _finished[job_id]
+
+
+def _claimable(now: datetime) -> Any:
+    return or_(
+        jobs.c.status == QUEUED,
+        and_(jobs.c.status == RUNNING, jobs.c.lease_expires_at < now),
+    )
+
+
+def _has_work(conn: Connection) -> bool:
+    now = datetime.utcnow()
+    return conn.execute(select(jobs.c.id).where(_claimable(now)).limit(1)).first() is not None
+
+
+def _claim(conn: Connection, worker: str) -> Optional[Job]:
+    now = datetime.utcnow()
+    max_attempts = get_max_attempts()
+    # Leases that expired on their last attempt are given up on
+    conn.execute(
+        update(jobs)
+        .where(
+            jobs.c.status == RUNNING,
+            jobs.c.lease_expires_at < now,
+            jobs.c.attempts >= max_attempts,
+        )
+        .values(
+            status=FAILED,
+            error=f"Abandoned after {max_attempts} attempts",
+            finished_at=now,
+        )
+    )
+    while True:
+        next_job = conn.execute(
+            select(jobs.c.id)
+            .where(_claimable(now), jobs.c.attempts < max_attempts)
+            .order_by(jobs.c.id)
+            .limit(1)
+        ).scalar_one_or_none()
+        if next_job is None:
+            return None
+        # Checked again on update: another worker may have claimed it since
+        row = conn.execute(
+            update(jobs)
+            .where(jobs.c.id == next_job, _claimable(now), jobs.c.attempts < max_attempts)
+            .values(
+                status=RUNNING,
+                worker=worker,
+                attempts=jobs.c.attempts + 1,
+                started_at=now,
+                lease_expires_at=now + get_lease(),
+            )
+            .returning(*jobs.c)
+        ).one_or_none()
+        if row is not None:
+            return Job.from_row(row)
+
+
+def _finish(
+    conn: Connection, job_id: int, result: Optional[dict[str, Any]], error: Optional[str]
+) -> None:
+    conn.execute(
+        update(jobs)
+        .where(jobs.c.id == job_id)
+        .values(
+            status=FAILED if error is not None else SUCCEEDED,
+            result=result,
+            error=error,
+            finished_at=datetime.utcnow(),
+            lease_expires_at=None,
+        )
+    )
+
+
+async def run_job(job: Job) -> tuple[Optional[dict[str, Any]], Optional[str]]:
+    """Generate and store the reply; returns (result, error)."""
+    try:
+        conversation = await Conversation.aload(job.conversation_id)
+    except KeyError as exc:
+        return None, str(exc)
+    try:
+        await conversation.ainvoke(job.content)
+    except Exception as exc:
+        return None, f"Model invocation failed: {exc}"
+    history = conversation.data["messages"]
+    return dict(history[-1], seq=conversation.message_offset + len(history) - 1), None
+
+
+class JobWorkerPool:
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: list[asyncio.Task[None]] = []
+        self._work_available = asyncio.Event()
+
+    def wake(self) -> None:
+        self._work_available.set()
+
+    def start(self) -> None:
+        for number in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._work(f"{self.name}:{number}")))
+
+    async def stop(self) -> None:
+        """Cancel the workers; jobs they were running are claimed again after their lease."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def run_once(self, worker: str) -> bool:
+        """Claim and run one job; returns False if there was none."""
+        async with get_async_engine().connect() as conn:
+            if not await conn.run_sync(_has_work):
+                return False
+        async with begin_async_write() as conn:
+            job = await conn.run_sync(_claim, worker)
+        if job is None:
+            return False
+
+        result, error = await run_job(job)
+        async with begin_async_write() as conn:
+            await conn.run_sync(_finish, job.id, result, error)
+        event = _finished.pop(job.id, None)
+        if event is not None:
+            event.set()
+        return True
+
+    async def _work(self, worker: str) -> None:
+        while True:
+            try:
+                if await self.run_once(worker):
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job worker %s failed", worker)
+            self._work_available.clear()
+            try:
+                await asyncio.wait_for(self._work_available.wait(), get_poll_interval())
+            except asyncio.TimeoutError:
+                pass
+
+
+_pool: Optional[JobWorkerPool] = None
+
+
+def start_workers(workers: Optional[int] = None) -> Optional[JobWorkerPool]:
+    """Start this process's worker pool (JOB_WORKERS tasks); None if it has no workers."""
+    global _pool
+    workers = get_worker_count() if workers is None else workers
+    if _pool is None and workers > 0:
+        _pool = JobWorkerPool(workers)
+        _pool.start()
+    return _pool
+
+
+async def stop_workers() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
+
+
+async def _serve(workers: int) -> None:
+    start_workers(workers)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stop_workers()
+
+
+if __name__ == "__main__":
+    from src.database.migrations import run_migrations
+    from src.database.utils import init_engine
+
+    parser = argparse.ArgumentParser(description="Run background generation workers")
+    parser.add_argument("--workers", type=int, default=get_worker_count() or 2)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    run_migrations(init_engine())
+    asyncio.run(_serve(args.workers))
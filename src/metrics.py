@@ -0,0 +1,258 @@
+"""Process-local metrics rendered in the Prometheus text exposition format.
+
+Disabled unless METRICS_ENABLED is set. When enabled, `stage(...)` spans time
+the steps of a turn (conversation and profile loads, graph compilation,
+context summarization, retrieval, the model call, the save) into `rag_stage_duration_seconds`,
+`MetricsMiddleware` counts and times every HTTP request, and `GET /metrics`
+serves `render()`. When disabled a span is a shared no-op context manager and
+the middleware passes requests straight through.
+
+Values are per worker process; Prometheus aggregates across workers.
+"""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import AbstractContextManager, nullcontext
+from types import TracebackType
+from typing import Any, Iterator, Optional, Sequence
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+Labels = tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _check(self, labels: Labels) -> None:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+
+    @abstractmethod
+    def samples(self) -> Iterator[tuple[str, Sequence[str], Sequence[str], float]]:
+        """(sample name, label names, label values, value) tuples."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(
+            f"{name}{_format_labels(names, values)} {_format_value(value)}"
+            for name, names, values, value in self.samples()
+        )
+        return "\n".join(lines)
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop all recorded values."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._check(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterator[tuple[str, Sequence[str], Sequence[str], float]]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield self.name, self.labelnames, labels, value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts incl. +Inf, sum); counts are cumulated on render
+        self._values: dict[Labels, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        self._check(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry is not None else 0
+
+    def samples(self) -> Iterator[tuple[str, Sequence[str], Sequence[str], float]]:
+        with self._lock:
+            values = sorted((labels, (list(c), s[0])) for labels, (c, s) in self._values.items())
+        bucket_names = (*self.labelnames, "le")
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", bucket_names, (*labels, _format_value(bound)), cumulative
+            yield f"{self.name}_sum", self.labelnames, labels, total
+            yield f"{self.name}_count", self.labelnames, labels, cumulative
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+REGISTRY: list[_Metric] = []
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds", "Time spent in each stage of a conversation turn", ["stage"]
+)
+REQUESTS = Counter(
+    "rag_http_requests_total", "HTTP requests by method, route and status", ["method", "route", "status"]
+)
+REQUEST_SECONDS = Histogram(
+    "rag_http_request_duration_seconds", "HTTP request latency by method and route", ["method", "route"]
+)
+IN_FLIGHT = Gauge("rag_http_requests_in_flight", "HTTP requests currently being handled")
+
+
+_enabled: Optional[bool] = None
+
+
+def metrics_enabled() -> bool:
+    global _enabled
+    if _enabled is None:
+        _enabled = os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+    return _enabled
+
+
+def set_metrics_enabled(enabled: Optional[bool]) -> None:
+    """Turn recording on or off; None re-reads METRICS_ENABLED on next use."""
+    global _enabled
+    _enabled = enabled
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+def reset() -> None:
+    """Drop all recorded values."""
+    for metric in REGISTRY:
+        metric.clear()
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.stage)
+
+
+_NOOP: AbstractContextManager[Any] = nullcontext()
+
+
+def stage(name: str) -> AbstractContextManager[Any]:
+    """Context manager timing one stage; a shared no-op while metrics are disabled."""
+    if not metrics_enabled():
+        return _NOOP
+    return _Span(name)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latencies and in-flight requests.
+
+    Requests are labelled with their route template (e.g.
+    `/api/v1/conversations/{conversation_id}`) to keep label cardinality bounded.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not metrics_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUESTS.inc(scope["method"], route, str(status))
+            REQUEST_SECONDS.observe(elapsed, scope["method"], route)
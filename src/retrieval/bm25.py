@@ -0,0 +1,230 @@
+"""In-process BM25 inverted index for lexical retrieval.
+
+Complements embedding search for exact identifiers (product codes, error
+numbers, names) that embeddings blur. Postings are compact typed arrays per
+term (`array('i')` of document numbers and term frequencies), appended to on
+insert and scored without copying via `numpy.frombuffer`. Removed documents
+are masked out and their postings dropped once more than COMPACT_RATIO of the
+documents are dead.
+
+`reciprocal_rank_fusion` merges this ranking with a dense one.
+"""
+
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from src.retrieval.vector_index import SearchHit, top_k
+
+
+# Words, plus compounds such as "SKU-4411" or "v1.2.3" kept whole
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+COMPOUND_PATTERN = re.compile(r"\w+(?:[-./]\w+)+")
+SEPARATOR_PATTERN = re.compile(r"[-./]")
+COMPACT_RATIO = 0.25
+# Conventional damping constant of reciprocal-rank fusion
+RRF_K = 60
+
+
+def lexical_tokens(text: str) -> list[str]:
+    """Lower-cased tokens; compounds are emitted whole and, after all tokens, as their parts."""
+    text = text.lower()
+    tokens: list[str] = TOKEN_PATTERN.findall(text)
+    for compound in COMPOUND_PATTERN.findall(text):
+        tokens.extend(SEPARATOR_PATTERN.split(compound))
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        # term -> (document numbers, term frequencies)
+        self._postings: dict[str, tuple[array[int], array[int]]] = {}
+        # Live document frequency per term
+        self._df: dict[str, int] = {}
+        self._ids: list[Optional[str]] = []
+        self._lengths = array("i")
+        # 1 for live document numbers, 0 for removed ones
+        self._alive = bytearray()
+        self._texts: list[str] = []
+        self._metadata: list[dict[str, Any]] = []
+        self._numbers: dict[str, int] = {}
+        self._total_length = 0
+        self._dead = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    def __contains__(self, item_id: object) -> bool:
+        return item_id in self._numbers
+
+    @property
+    def postings_bytes(self) -> int:
+        return sum(
+            docs.itemsize * len(docs) + freqs.itemsize * len(freqs)
+            for docs, freqs in self._postings.values()
+        )
+
+    def add(
+        self,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        metadata: Optional[Sequence[dict[str, Any]]] = None,
+    ) -> None:
+        """Index documents, replacing any existing documents with the same id."""
+        if len(texts) != len(ids):
+            raise ValueError(f"Expected {len(ids)} texts")
+        metadata = metadata if metadata is not None else [{} for _ in ids]
+        with self._lock:
+            for item_id, text, meta in zip(ids, texts, metadata):
+                self._delete(item_id)
+                number = len(self._ids)
+                counts = Counter(lexical_tokens(text))
+                for term, count in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("i"), array("i"))
+                    postings[0].append(number)
+                    postings[1].append(count)
+                    self._df[term] = self._df.get(term, 0) + 1
+                length = counts.total()
+                self._ids.append(item_id)
+                self._lengths.append(length)
+                self._alive.append(1)
+                self._texts.append(text)
+                self._metadata.append(dict(meta))
+                self._numbers[item_id] = number
+                self._total_length += length
+            self._maybe_compact()
+
+    def remove(self, ids: Sequence[str]) -> int:
+        """Remove documents by id; unknown ids are ignored. Returns the number removed."""
+        with self._lock:
+            removed = sum(self._delete(item_id) for item_id in ids)
+            self._maybe_compact()
+        return removed
+
+    def _delete(self, item_id: str) -> bool:
+        number = self._numbers.pop(item_id, None)
+        if number is None:
+            return False
+        for term in set(lexical_tokens(self._texts[number])):
+            self._df[term] -= 1
+        self._ids[number] = None
+        self._alive[number] = 0
+        self._texts[number] = ""
+        self._metadata[number] = {}
+        self._total_length -= self._lengths[number]
+        self._dead += 1
+        return True
+
+    def _maybe_compact(self) -> None:
+        if self._ids and self._dead / len(self._ids) > COMPACT_RATIO:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Renumber live documents densely and drop dead postings."""
+        live = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+        renumber = np.cumsum(live, dtype=np.int64) - 1
+        for term, (docs, freqs) in list(self._postings.items()):
+            numbers = np.frombuffer(docs, dtype=np.int32)
+            keep = live[numbers]
+            if not keep.any():
+                del self._postings[term]
+                self._df.pop(term, None)
+                continue
+            self._postings[term] = (
+                array("i", renumber[numbers[keep]].astype(np.int32).tobytes()),
+                array("i", np.frombuffer(freqs, dtype=np.int32)[keep].tobytes()),
+            )
+        rows = np.flatnonzero(live)
+        self._ids = [self._ids[row] for row in rows]
+        self._lengths = array("i", np.frombuffer(self._lengths, dtype=np.int32)[rows].tobytes())
+        self._alive = bytearray(b"\x01" * len(rows))
+        self._texts = [self._texts[row] for row in rows]
+        self._metadata = [self._metadata[row] for row in rows]
+        self._numbers = {item_id: number for number, item_id in enumerate(self._ids) if item_id}
+        self._dead = 0
+
+    def search(self, query: str, k: int = 4) -> list[SearchHit]:
+        """Top-`k` documents by BM25 score; documents without a query term are not returned."""
+        terms = set(lexical_tokens(query))
+        with self._lock:
+            count = len(self._numbers)
+            if not count or k <= 0:
+                return []
+            lengths = np.frombuffer(self._lengths, dtype=np.int32)
+            average_length = self._total_length / count
+            scores = np.zeros(len(self._ids), dtype=np.float32)
+            for term in terms:
+                postings = self._postings.get(term)
+                df = self._df.get(term, 0)
+                if postings is None or not df:
+                    continue
+                docs = np.frombuffer(postings[0], dtype=np.int32)
+                freqs = np.frombuffer(postings[1], dtype=np.int32).astype(np.float32)
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[docs] / average_length)
+                scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+
+            alive = np.frombuffer(self._alive, dtype=np.uint8)
+            candidates = np.flatnonzero((scores > 0) & (alive == 1))
+            if not len(candidates):
+                return []
+            best = candidates[top_k(scores[candidates][np.newaxis, :], k)[0]]
+            return [
+                SearchHit(
+                    id=str(self._ids[number]),
+                    score=float(scores[number]),
+                    text=self._texts[number],
+                    metadata=self._metadata[number],
+                )
+                for number in best
+            ]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[SearchHit]], k: int = 4) -> list[SearchHit]:
+    """Merge rankings by summed 1 / (RRF_K + rank); scores become the fused score."""
+    fused: dict[str, float] = {}
+    hits: dict[str, SearchHit] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            fused[hit.id] = fused.get(hit.id, 0.0) + 1.0 / (RRF_K + rank)
+            hits.setdefault(hit.id, hit)
+    best = sorted(fused, key=lambda item_id: fused[item_id], reverse=True)[:k]
+    return [
+        SearchHit(
+            id=item_id,
+            score=fused[item_id],
+            text=hits[item_id].text,
+            metadata=hits[item_id].metadata,
+        )
+        for item_id in best
+    ]
+
+
+_index: Optional[BM25Index] = None
+_index_lock = threading.Lock()
+
+
+def get_bm25_index() -> BM25Index:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = BM25Index()
+    return _index
+
+
+def set_bm25_index(index: Optional[BM25Index]) -> None:
+    """Replace the process-wide index; None creates an empty one on next use."""
+    global _index
+    with _index_lock:
+        _index = index
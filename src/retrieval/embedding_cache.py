@@ -0,0 +1,167 @@
+"""Cache of text embeddings keyed by embedding model and content hash.
+
+`CachedEmbedder` wraps any `Embedder`. A batch is first deduplicated, then
+looked up in an in-process LRU (EMBEDDING_CACHE_MEMORY_SIZE entries) and, for
+what is left, in the `embedding_cache` table with one query per LOOKUP_BATCH
+hashes. Only the remaining misses are sent to the wrapped embedder, in a
+single call, and written back to both tiers. `aembed` does the same without
+blocking the event loop. An embedding never changes for a
+given model and text, so entries do not expire.
+
+Enabled for the process-wide embedder with EMBEDDING_CACHE_ENABLED=1.
+"""
+
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Sequence
+
+import numpy as np
+from sqlalchemy import Connection, delete, select
+
+from src.cache import LRUCache
+from src.database.models import embedding_cache
+from src.database.utils import begin_async_write, get_async_engine, get_engine
+from src.retrieval.embeddings import Embedder
+
+
+# Hashes per IN (...) lookup; stays below SQLite's bound-parameter limit
+LOOKUP_BATCH = 500
+
+
+@dataclass
+class EmbeddingCacheStats:
+    memory_hits: int = 0
+    db_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        hits = self.memory_hits + self.db_hits
+        total = hits + self.misses
+        return hits / total if total else 0.0
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class CachedEmbedder:
+    def __init__(self, embedder: Embedder, *, memory_size: int = 10_000) -> None:
+        self.embedder = embedder
+        self.model = embedder.model
+        self.dim = embedder.dim
+        self.memory = LRUCache(maxsize=memory_size, ttl=None)
+        self.stats = EmbeddingCacheStats()
+
+    def _read(self, conn: Connection, hashes: Sequence[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        for start in range(0, len(hashes), LOOKUP_BATCH):
+            rows = conn.execute(
+                select(embedding_cache.c.text_hash, embedding_cache.c.embedding).where(
+                    embedding_cache.c.model == self.model,
+                    embedding_cache.c.text_hash.in_(hashes[start : start + LOOKUP_BATCH]),
+                )
+            )
+            for row in rows:
+                vector = np.frombuffer(row.embedding, dtype=np.float32)
+                if len(vector) == self.dim:
+                    found[row.text_hash] = vector
+        return found
+
+    def _write(self, conn: Connection, vectors: dict[str, np.ndarray]) -> None:
+        hashes = list(vectors)
+        # Another worker may have cached the same texts meanwhile; the values are identical
+        for start in range(0, len(hashes), LOOKUP_BATCH):
+            conn.execute(
+                delete(embedding_cache).where(
+                    embedding_cache.c.model == self.model,
+                    embedding_cache.c.text_hash.in_(hashes[start : start + LOOKUP_BATCH]),
+                )
+            )
+        now = datetime.utcnow()
+        conn.execute(
+            embedding_cache.insert(),
+            [
+                {
+                    "model": self.model,
+                    "text_hash": key,
+                    "embedding": vector.astype(np.float32).tobytes(),
+                    "created_at": now,
+                }
+                for key, vector in vectors.items()
+            ],
+        )
+
+    def _lookup_memory(
+        self, texts: Sequence[str]
+    ) -> tuple[list[str], dict[str, str], dict[str, np.ndarray]]:
+        """Hashes of `texts`, distinct texts by hash and the vectors found in memory."""
+        hashes = [text_hash(text) for text in texts]
+        # Each distinct text is looked up and embedded once per batch
+        unique = dict(zip(hashes, texts))
+        found: dict[str, np.ndarray] = {}
+        for key in unique:
+            cached = self.memory.get(key)
+            if cached is not None:
+                found[key] = cached
+        self.stats.memory_hits += len(found)
+        return hashes, unique, found
+
+    def _compute(self, unique: dict[str, str], missing: list[str]) -> dict[str, np.ndarray]:
+        self.stats.misses += len(missing)
+        computed = self.embedder.embed([unique[key] for key in missing])
+        return dict(zip(missing, np.asarray(computed, dtype=np.float32)))
+
+    def _result(
+        self, hashes: list[str], unique: dict[str, str], found: dict[str, np.ndarray]
+    ) -> np.ndarray:
+        for key in unique:
+            self.memory.set(key, found[key])
+        result = np.empty((len(hashes), self.dim), dtype=np.float32)
+        for row, key in enumerate(hashes):
+            result[row] = found[key]
+        return result
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed `texts`, calling the wrapped embedder only for uncached texts."""
+        hashes, unique, found = self._lookup_memory(texts)
+        missing = [key for key in unique if key not in found]
+        if missing:
+            with get_engine().connect() as conn:
+                stored = self._read(conn, missing)
+            self.stats.db_hits += len(stored)
+            found.update(stored)
+            missing = [key for key in missing if key not in stored]
+        if missing:
+            new = self._compute(unique, missing)
+            with get_engine().begin() as conn:
+                self._write(conn, new)
+            found.update(new)
+        return self._result(hashes, unique, found)
+
+    async def aembed(self, texts: Sequence[str]) -> np.ndarray:
+        """Async variant of `embed` for the event loop: the cache table is read
+        through the async engine and written through `begin_async_write`."""
+        hashes, unique, found = self._lookup_memory(texts)
+        missing = [key for key in unique if key not in found]
+        if missing:
+            async with get_async_engine().connect() as conn:
+                stored = await conn.run_sync(self._read, missing)
+            self.stats.db_hits += len(stored)
+            found.update(stored)
+            missing = [key for key in missing if key not in stored]
+        if missing:
+            new = await asyncio.to_thread(self._compute, unique, missing)
+            async with begin_async_write() as conn:
+                await conn.run_sync(self._write, new)
+            found.update(new)
+        return self._result(hashes, unique, found)
+
+    def clear(self) -> None:
+        """Drop this model's entries from both tiers and reset the counters."""
+        self.memory.clear()
+        self.stats = EmbeddingCacheStats()
+        with get_engine().begin() as conn:
+            conn.execute(delete(embedding_cache).where(embedding_cache.c.model == self.model))
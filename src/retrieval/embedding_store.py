@@ -0,0 +1,336 @@
+"""Persistent, memory-mapped embedding store.
+
+A store is a directory of immutable segments plus a `manifest.json`:
+
+    seg-000001.vectors.npy   float32 (rows, dim), normalized
+    seg-000001.ids.npy       row ids
+    seg-000001.offsets.npy   int64 (rows + 1) offsets into the records file
+    seg-000001.records       UTF-8 JSON {"text", "metadata"} per row, concatenated
+
+All four files are opened with `numpy.memmap`, so opening a store costs
+milliseconds regardless of its size and every worker shares the same pages
+through the OS page cache. Records are decoded only for search hits.
+
+Writes append a new segment and deletes are recorded as tombstones (segment,
+row) in the manifest, which is replaced atomically. Once there are more than
+MAX_SEGMENTS segments or more than COMPACT_RATIO of the rows are tombstoned,
+a background thread merges the live rows into a single segment. Writers in
+different processes are serialized with an advisory `fcntl` lock; readers
+notice a new manifest on their next search.
+"""
+
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Optional, Sequence
+
+import numpy as np
+
+from src.retrieval.vector_index import SearchHit, normalize, top_k
+
+
+MANIFEST = "manifest.json"
+LOCK_FILE = ".lock"
+MAX_SEGMENTS = 8
+COMPACT_RATIO = 0.25
+
+
+@dataclass
+class Segment:
+    name: str
+    vectors: np.ndarray
+    ids: np.ndarray
+    offsets: np.ndarray
+    records: np.ndarray
+    # Live-row mask; False for tombstoned rows
+    live: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def record(self, row: int) -> dict[str, Any]:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        record: dict[str, Any] = json.loads(self.records[start:end].tobytes())
+        return record
+
+
+def _write_segment(
+    directory: Path, name: str, ids: Sequence[str], vectors: np.ndarray, records: Sequence[bytes]
+) -> None:
+    offsets = np.zeros(len(records) + 1, dtype=np.int64)
+    np.cumsum([len(record) for record in records], out=offsets[1:])
+    # Files are written under temporary names so a crash never leaves a half-written segment
+    for suffix, write in (
+        (".vectors.npy", lambda f: np.save(f, np.ascontiguousarray(vectors, dtype=np.float32))),
+        (".ids.npy", lambda f: np.save(f, np.array(ids, dtype=str))),
+        (".offsets.npy", lambda f: np.save(f, offsets)),
+        (".records", lambda f: f.write(b"".join(records))),
+    ):
+        tmp = directory / f"{name}{suffix}.tmp"
+        with open(tmp, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, directory / f"{name}{suffix}")
+
+
+def _open_segment(directory: Path, name: str, deleted: Sequence[int]) -> Segment:
+    ids = np.load(directory / f"{name}.ids.npy", mmap_mode="r")
+    records_path = directory / f"{name}.records"
+    records = (
+        np.memmap(records_path, dtype=np.uint8, mode="r")
+        if records_path.stat().st_size
+        else np.zeros(0, dtype=np.uint8)
+    )
+    live = np.ones(len(ids), dtype=bool)
+    live[list(deleted)] = False
+    return Segment(
+        name=name,
+        vectors=np.load(directory / f"{name}.vectors.npy", mmap_mode="r"),
+        ids=ids,
+        offsets=np.load(directory / f"{name}.offsets.npy", mmap_mode="r"),
+        records=records,
+        live=live,
+    )
+
+
+class EmbeddingStore:
+    def __init__(self, directory: Path | str, dim: int) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self._segments: tuple[Segment, ...] = ()
+        self._next_segment = 1
+        self._manifest_mtime: Optional[int] = None
+        # id -> (segment index, row) of live rows; built on first use by writes
+        self._positions: Optional[dict[str, tuple[int, int]]] = None
+        self._lock = threading.RLock()
+        self._compaction: Optional[threading.Thread] = None
+        self._reload()
+
+    def _manifest_path(self) -> Path:
+        return self.directory / MANIFEST
+
+    def _reload(self) -> None:
+        path = self._manifest_path()
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            # A compaction in another process may delete segments between reading
+            # the manifest and opening them; the next manifest then lists the new ones
+            for _ in range(3):
+                manifest = json.loads(path.read_text())
+                if manifest["dim"] != self.dim:
+                    raise ValueError(
+                        f"Embedding store {self.directory} has dimension {manifest['dim']}, "
+                        f"expected {self.dim}"
+                    )
+                try:
+                    self._segments = tuple(
+                        _open_segment(self.directory, name, manifest["deleted"].get(name, []))
+                        for name in manifest["segments"]
+                    )
+                except FileNotFoundError:
+                    continue
+                break
+            self._next_segment = manifest["next_segment"]
+            self._manifest_mtime = mtime
+            self._positions = None
+
+    def _save_manifest(self, segments: Sequence[Segment]) -> None:
+        manifest = {
+            "dim": self.dim,
+            "segments": [segment.name for segment in segments],
+            "deleted": {
+                segment.name: np.flatnonzero(~segment.live).tolist()
+                for segment in segments
+                if not segment.live.all()
+            },
+            "next_segment": self._next_segment,
+        }
+        tmp = self.directory / f"{MANIFEST}.tmp"
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, self._manifest_path())
+        self._segments = tuple(segments)
+        self._manifest_mtime = self._manifest_path().stat().st_mtime_ns
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Serialize writers across threads and processes on the latest manifest."""
+        with self._lock, open(self.directory / LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._reload()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _live_positions(self) -> dict[str, tuple[int, int]]:
+        if self._positions is None:
+            positions: dict[str, tuple[int, int]] = {}
+            for index, segment in enumerate(self._segments):
+                for row in np.flatnonzero(segment.live):
+                    positions[str(segment.ids[row])] = (index, int(row))
+            self._positions = positions
+        return self._positions
+
+    def _new_segment_name(self) -> str:
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        return name
+
+    def __len__(self) -> int:
+        return sum(int(segment.live.sum()) for segment in self._segments)
+
+    def __contains__(self, item_id: object) -> bool:
+        with self._lock:
+            self._reload()
+            return item_id in self._live_positions()
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        texts: Sequence[str],
+        metadata: Optional[Sequence[dict[str, Any]]] = None,
+    ) -> None:
+        """Append rows as a new segment; existing rows with the same ids are tombstoned."""
+        matrix = normalize(vectors)
+        if matrix.shape != (len(ids), self.dim) or len(texts) != len(ids):
+            raise ValueError(f"Expected {len(ids)} texts and vectors of dimension {self.dim}")
+        if not ids:
+            return
+        metadata = metadata if metadata is not None else [{} for _ in ids]
+        # Later duplicates in one call win, as with repeated VectorIndex.add calls
+        last = {item_id: row for row, item_id in enumerate(ids)}
+        rows = sorted(last.values())
+        records = [
+            json.dumps({"text": texts[row], "metadata": metadata[row]}).encode() for row in rows
+        ]
+
+        with self._writing():
+            self._tombstone(last)
+            name = self._new_segment_name()
+            _write_segment(self.directory, name, [ids[row] for row in rows], matrix[rows], records)
+            segment = _open_segment(self.directory, name, [])
+            self._save_manifest([*self._segments, segment])
+            self._positions = None
+        self._maybe_compact()
+
+    def remove(self, ids: Sequence[str]) -> int:
+        """Tombstone rows by id; unknown ids are ignored. Returns the number removed."""
+        with self._writing():
+            removed = self._tombstone(ids)
+            if removed:
+                self._save_manifest(self._segments)
+                self._positions = None
+        self._maybe_compact()
+        return removed
+
+    def _tombstone(self, ids: Sequence[str] | dict[str, int]) -> int:
+        positions = self._live_positions()
+        removed = 0
+        for item_id in ids:
+            position = positions.get(item_id)
+            if position is not None:
+                index, row = position
+                self._segments[index].live[row] = False
+                removed += 1
+        return removed
+
+    def search(self, queries: np.ndarray, k: int = 4) -> list[list[SearchHit]]:
+        """Cosine top-`k` for each query row across all live rows."""
+        matrix = normalize(queries)
+        self._reload()
+        segments = self._segments
+        candidates: list[tuple[np.ndarray, int, np.ndarray]] = []
+        for index, segment in enumerate(segments):
+            if k <= 0 or not segment.live.any():
+                continue
+            scores = matrix @ segment.vectors.T
+            scores[:, ~segment.live] = -np.inf
+            best = top_k(scores, min(k, int(segment.live.sum())))
+            candidates.append((np.take_along_axis(scores, best, axis=1), index, best))
+        if not candidates:
+            return [[] for _ in range(len(matrix))]
+
+        scores = np.concatenate([c[0] for c in candidates], axis=1)
+        owners = np.concatenate([np.full(c[2].shape, c[1]) for c in candidates], axis=1)
+        rows = np.concatenate([c[2] for c in candidates], axis=1)
+        best = top_k(scores, k)
+        results: list[list[SearchHit]] = []
+        for query in range(len(matrix)):
+            hits = []
+            for column in best[query]:
+                segment = segments[int(owners[query, column])]
+                row = int(rows[query, column])
+                record = segment.record(row)
+                hits.append(
+                    SearchHit(
+                        id=str(segment.ids[row]),
+                        score=float(scores[query, column]),
+                        text=record["text"],
+                        metadata=record["metadata"],
+                    )
+                )
+            results.append(hits)
+        return results
+
+    def needs_compaction(self) -> bool:
+        total = sum(len(segment) for segment in self._segments)
+        dead = total - len(self)
+        return len(self._segments) > MAX_SEGMENTS or (total > 0 and dead / total > COMPACT_RATIO)
+
+    def _maybe_compact(self) -> None:
+        if self.needs_compaction():
+            self.compact_in_background()
+
+    def compact_in_background(self) -> threading.Thread:
+        """Start `compact` in a daemon thread unless one is already running."""
+        with self._lock:
+            if self._compaction is None or not self._compaction.is_alive():
+                self._compaction = threading.Thread(
+                    target=self.compact, name="embedding-store-compaction", daemon=True
+                )
+                self._compaction.start()
+            return self._compaction
+
+    def compact(self) -> None:
+        """Merge all live rows into one segment and delete the old segment files.
+
+        Searches keep using the old segments until the new manifest is written.
+        """
+        with self._writing():
+            old = self._segments
+            if len(old) <= 1 and all(segment.live.all() for segment in old):
+                return
+            ids: list[str] = []
+            records: list[bytes] = []
+            vectors: list[np.ndarray] = []
+            for segment in old:
+                rows = np.flatnonzero(segment.live)
+                ids.extend(str(item_id) for item_id in segment.ids[rows])
+                vectors.append(np.asarray(segment.vectors[rows]))
+                records.extend(
+                    segment.records[segment.offsets[row] : segment.offsets[row + 1]].tobytes()
+                    for row in rows
+                )
+            segments: list[Segment] = []
+            if ids:
+                name = self._new_segment_name()
+                _write_segment(self.directory, name, ids, np.concatenate(vectors), records)
+                segments.append(_open_segment(self.directory, name, []))
+            self._save_manifest(segments)
+            self._positions = None
+            # Open memory maps stay valid after unlinking, so concurrent readers are unaffected
+            for segment in old:
+                for path in self.directory.glob(f"{segment.name}.*"):
+                    path.unlink(missing_ok=True)
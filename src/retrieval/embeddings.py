@@ -0,0 +1,82 @@
+"""Text embedders used by the retrieval stage.
+
+`HashingEmbedder` is a deterministic, offline stand-in for a provider
+embedding model: every token is hashed into one of `dim` signed buckets (the
+"hashing trick") and the counts are L2-normalized, so texts that share words
+get similar vectors. It gives identical vectors in every process and needs no
+network or model download.
+"""
+
+import hashlib
+import os
+import re
+from functools import lru_cache
+from typing import Optional, Protocol, Sequence
+
+import numpy as np
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class Embedder(Protocol):
+    model: str
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return a `(len(texts), dim)` float32 matrix of unit-length rows."""
+        ...
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+@lru_cache(maxsize=100_000)
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+
+
+class HashingEmbedder:
+    def __init__(self, dim: int = 256) -> None:
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (_token_hash(token) for token in tokenize(text)), dtype=np.uint64
+            )
+            if not hashes.size:
+                continue
+            buckets = (hashes % np.uint64(self.dim)).astype(np.intp)
+            signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], buckets, signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+_embedder: Optional[Embedder] = None
+
+
+def get_embedder() -> Embedder:
+    """Process-wide embedder, wrapped in a `CachedEmbedder` if EMBEDDING_CACHE_ENABLED is set."""
+    global _embedder
+    if _embedder is None:
+        embedder: Embedder = HashingEmbedder(dim=int(os.getenv("EMBEDDING_DIM", "256")))
+        if os.getenv("EMBEDDING_CACHE_ENABLED", "").lower() in ("1", "true", "yes"):
+            from src.retrieval.embedding_cache import CachedEmbedder
+
+            embedder = CachedEmbedder(
+                embedder, memory_size=int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "10000"))
+            )
+        _embedder = embedder
+    return _embedder
+
+
+def set_embedder(embedder: Optional[Embedder]) -> None:
+    """Replace the process-wide embedder; None rebuilds it from env on next use."""
+    global _embedder
+    _embedder = embedder
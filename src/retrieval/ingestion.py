@@ -0,0 +1,465 @@
+"""Incremental document ingestion into the `documents`/`chunks` tables.
+
+Files stream through a generator pipeline, one document at a time:
+
+    read_documents → split_documents → embed_batches → write
+
+- Files whose content hash and embedding model match the stored document are
+  skipped before chunking.
+- Chunks of changed files keep their stored row and embedding when their
+  text hash is unchanged. Only new chunk texts are embedded, in batches of
+  INGEST_BATCH_SIZE that may span files.
+- Documents under the ingested root that no longer exist are deleted with
+  their chunks.
+
+The process-wide vector index (and, if given, a BM25 index) is updated in bulk
+as documents are written. `load_index` and `load_lexical_index` fill empty
+indexes from the tables on startup.
+
+In-memory indexes belong to one process: an ingest updates only the indexes
+of the process that ran it. Other API workers (and every worker after a
+`doit ingest`) keep searching their old copy until `reload_indexes` rebuilds
+it, e.g. through `POST /api/v1/admin/reload` on each of them. An
+EMBEDDING_STORE_DIR vector index is shared on disk and needs no reload; the
+BM25 index always does.
+
+Usage: `uv run doit ingest [--path DIR]` (default INGEST_ROOT, `./documents`).
+"""
+
+import argparse
+import hashlib
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import Connection, Engine, bindparam, delete, select, update
+
+from src.database.models import chunks, documents
+from src.database.utils import get_engine
+from src.retrieval.bm25 import BM25Index, get_bm25_index, set_bm25_index
+from src.retrieval.embeddings import Embedder, get_embedder
+from src.retrieval.vector_index import (
+    SearchIndex,
+    create_vector_index,
+    get_vector_index,
+    set_vector_index,
+)
+
+
+SUPPORTED_SUFFIXES = (".txt", ".md", ".rst")
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+INDEX_FLUSH_ROWS = 10_000
+
+
+@dataclass
+class IngestStats:
+    documents_seen: int = 0
+    documents_skipped: int = 0
+    documents_deleted: int = 0
+    chunks_embedded: int = 0
+    chunks_reused: int = 0
+    chunks_deleted: int = 0
+
+
+@dataclass
+class Document:
+    source: str
+    text: str
+    content_hash: str
+
+
+@dataclass
+class PendingDocument:
+    """A changed document with its chunks; `vectors` is filled by `embed_batches`."""
+
+    document: Document
+    texts: list[str]
+    hashes: list[str]
+    # Stored chunk id per hash, for chunks whose text is unchanged
+    known: dict[str, int]
+    vectors: dict[str, np.ndarray] = field(default_factory=dict)
+
+    @property
+    def new_hashes(self) -> list[str]:
+        return [content_hash for content_hash in self.hashes if content_hash not in self.known]
+
+
+def get_ingest_root() -> Path:
+    return Path(os.getenv("INGEST_ROOT", "./documents"))
+
+
+def get_batch_size() -> int:
+    return int(os.getenv("INGEST_BATCH_SIZE", "64"))
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def split_text(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """Split on whitespace into chunks of at most `size` characters.
+
+    Consecutive chunks share up to `overlap` characters of whole words; a
+    single word longer than `size` becomes its own chunk.
+    """
+    words = text.split()
+    result: list[str] = []
+    start = 0
+    while start < len(words):
+        end, length = start, 0
+        while end < len(words) and (end == start or length + len(words[end]) + 1 <= size + 1):
+            length += len(words[end]) + 1
+            end += 1
+        result.append(" ".join(words[start:end]))
+        if end == len(words):
+            break
+        back, covered = end, 0
+        while back > start + 1 and covered + len(words[back - 1]) + 1 <= overlap + 1:
+            back -= 1
+            covered += len(words[back]) + 1
+        start = back
+    return result
+
+
+def iter_files(root: Path) -> Iterator[Path]:
+    for path in sorted(root.rglob("*")):
+        if path.is_file() and path.suffix.lower() in SUPPORTED_SUFFIXES:
+            yield path
+
+
+def read_documents(paths: Iterable[Path]) -> Iterator[Document]:
+    for path in paths:
+        text = path.read_text(encoding="utf-8", errors="replace")
+        yield Document(source=str(path.resolve()), text=text, content_hash=content_hash(text))
+
+
+def split_documents(
+    docs: Iterable[Document], engine: Engine, model: str, stats: IngestStats
+) -> Iterator[PendingDocument]:
+    """Yield changed documents with their chunks; unchanged ones are skipped."""
+    for doc in docs:
+        stats.documents_seen += 1
+        with engine.connect() as conn:
+            stored = conn.execute(
+                select(documents.c.id, documents.c.content_hash, documents.c.embedding_model)
+                .where(documents.c.source == doc.source)
+            ).one_or_none()
+            if stored is not None and (stored.content_hash, stored.embedding_model) == (
+                doc.content_hash,
+                model,
+            ):
+                stats.documents_skipped += 1
+                continue
+
+            known: dict[str, int] = {}
+            if stored is not None and stored.embedding_model == model:
+                known = {
+                    row.content_hash: row.id
+                    for row in conn.execute(
+                        select(chunks.c.id, chunks.c.content_hash)
+                        .where(chunks.c.document_id == stored.id)
+                    )
+                }
+        # Repeated chunk texts within a document are stored once
+        texts: dict[str, str] = {}
+        for text in split_text(doc.text):
+            texts.setdefault(content_hash(text), text)
+        yield PendingDocument(
+            document=doc, texts=list(texts.values()), hashes=list(texts), known=known
+        )
+
+
+def embed_batches(
+    pending: Iterable[PendingDocument], embedder: Embedder, batch_size: int
+) -> Iterator[PendingDocument]:
+    """Embed new chunk texts in batches of `batch_size`, across documents.
+
+    Documents are yielded, in order, once all of their chunks are embedded.
+    """
+    waiting: list[PendingDocument] = []
+    batch: list[tuple[PendingDocument, str, str]] = []
+
+    def flush() -> None:
+        if batch:
+            vectors = embedder.embed([text for _, _, text in batch])
+            for (item, chunk_hash, _), vector in zip(batch, vectors):
+                item.vectors[chunk_hash] = vector
+            batch.clear()
+
+    for item in pending:
+        waiting.append(item)
+        texts = dict(zip(item.hashes, item.texts))
+        for chunk_hash in item.new_hashes:
+            batch.append((item, chunk_hash, texts[chunk_hash]))
+            if len(batch) >= batch_size:
+                flush()
+        while waiting and len(waiting[0].vectors) == len(waiting[0].new_hashes):
+            yield waiting.pop(0)
+    flush()
+    yield from waiting
+
+
+def write_document(
+    conn: Connection, item: PendingDocument, model: str, stats: IngestStats
+) -> tuple[list[int], list[int]]:
+    """Upsert one document and its chunks; returns (deleted, inserted) chunk ids."""
+    doc = item.document
+    values = {
+        "content_hash": doc.content_hash,
+        "embedding_model": model,
+        "updated_at": datetime.utcnow(),
+    }
+    document_id = conn.execute(
+        select(documents.c.id).where(documents.c.source == doc.source)
+    ).scalar_one_or_none()
+    if document_id is None:
+        inserted_key = conn.execute(
+            documents.insert().values(source=doc.source, **values)
+        ).inserted_primary_key
+        if not inserted_key:
+            raise RuntimeError("Failed to insert document")
+        document_id = inserted_key[0]
+    else:
+        conn.execute(update(documents).where(documents.c.id == document_id).values(**values))
+
+    positions = {chunk_hash: position for position, chunk_hash in enumerate(item.hashes)}
+    kept = {item.known[h]: position for h, position in positions.items() if h in item.known}
+    stored = conn.execute(
+        select(chunks.c.id).where(chunks.c.document_id == document_id)
+    ).scalars().all()
+    deleted = [chunk_id for chunk_id in stored if chunk_id not in kept]
+    if deleted:
+        conn.execute(delete(chunks).where(chunks.c.id.in_(deleted)))
+    if kept:
+        conn.execute(
+            update(chunks)
+            .where(chunks.c.id == bindparam("chunk_id"))
+            .values(position=bindparam("new_position")),
+            [
+                {"chunk_id": chunk_id, "new_position": position}
+                for chunk_id, position in kept.items()
+            ],
+        )
+
+    new_hashes = item.new_hashes
+    inserted: list[int] = []
+    if new_hashes:
+        texts = dict(zip(item.hashes, item.texts))
+        conn.execute(
+            chunks.insert(),
+            [
+                {
+                    "document_id": document_id,
+                    "position": positions[chunk_hash],
+                    "content_hash": chunk_hash,
+                    "text": texts[chunk_hash],
+                    "embedding": np.asarray(item.vectors[chunk_hash], dtype=np.float32).tobytes(),
+                }
+                for chunk_hash in new_hashes
+            ],
+        )
+        inserted = list(
+            conn.execute(
+                select(chunks.c.id).where(
+                    chunks.c.document_id == document_id, chunks.c.content_hash.in_(new_hashes)
+                )
+            ).scalars()
+        )
+    stats.chunks_deleted += len(deleted)
+    stats.chunks_reused += len(kept)
+    stats.chunks_embedded += len(new_hashes)
+    return deleted, inserted
+
+
+def delete_missing(
+    engine: Engine, root: Path, seen: set[str], stats: IngestStats
+) -> list[int]:
+    """Delete documents under `root` that were not seen; returns deleted chunk ids."""
+    prefix = str(root.resolve()) + os.sep
+    with engine.begin() as conn:
+        missing = [
+            row.id
+            for row in conn.execute(select(documents.c.id, documents.c.source))
+            if row.source.startswith(prefix) and row.source not in seen
+        ]
+        if not missing:
+            return []
+        deleted = list(
+            conn.execute(
+                select(chunks.c.id).where(chunks.c.document_id.in_(missing))
+            ).scalars()
+        )
+        conn.execute(delete(chunks).where(chunks.c.document_id.in_(missing)))
+        conn.execute(delete(documents).where(documents.c.id.in_(missing)))
+    stats.documents_deleted += len(missing)
+    stats.chunks_deleted += len(deleted)
+    return deleted
+
+
+def _add_to_index(
+    conn: Connection,
+    index: SearchIndex,
+    lexical_index: Optional[BM25Index],
+    chunk_ids: Sequence[int],
+) -> None:
+    if not chunk_ids:
+        return
+    rows = conn.execute(
+        select(chunks.c.id, chunks.c.text, chunks.c.embedding, documents.c.source)
+        .join(documents, documents.c.id == chunks.c.document_id)
+        .where(chunks.c.id.in_(chunk_ids))
+    ).all()
+    _index_rows(index, rows)
+    if lexical_index is not None:
+        _index_texts(lexical_index, rows)
+
+
+def _index_rows(index: SearchIndex, rows: Sequence[Any]) -> None:
+    index.add(
+        [str(row.id) for row in rows],
+        np.frombuffer(b"".join(row.embedding for row in rows), dtype=np.float32).reshape(
+            len(rows), index.dim
+        ),
+        [row.text for row in rows],
+        [{"source": row.source} for row in rows],
+    )
+
+
+def _index_texts(index: BM25Index, rows: Sequence[Any]) -> None:
+    index.add(
+        [str(row.id) for row in rows],
+        [row.text for row in rows],
+        [{"source": row.source} for row in rows],
+    )
+
+
+def ingest(
+    root: Path,
+    *,
+    engine: Optional[Engine] = None,
+    embedder: Optional[Embedder] = None,
+    index: Optional[SearchIndex] = None,
+    lexical_index: Optional[BM25Index] = None,
+    batch_size: Optional[int] = None,
+) -> IngestStats:
+    """Bring the stored chunks (and the vector index) in line with the files under `root`.
+
+    `lexical_index`, if given, is kept in sync as well.
+    """
+    root = root.resolve()
+    if not root.is_dir():
+        raise FileNotFoundError(f"Ingest root {root} is not a directory")
+    engine = engine or get_engine()
+    embedder = embedder or get_embedder()
+    index = index if index is not None else get_vector_index()
+    stats = IngestStats()
+    seen: set[str] = set()
+
+    def track(docs: Iterable[Document]) -> Iterator[Document]:
+        for doc in docs:
+            seen.add(doc.source)
+            yield doc
+
+    pipeline = embed_batches(
+        split_documents(track(read_documents(iter_files(root))), engine, embedder.model, stats),
+        embedder,
+        batch_size or get_batch_size(),
+    )
+    # Index updates are applied in bulk; a persistent index writes a segment per update
+    removed: list[int] = []
+    added: list[int] = []
+
+    def flush() -> None:
+        index.remove([str(chunk_id) for chunk_id in removed])
+        if lexical_index is not None:
+            lexical_index.remove([str(chunk_id) for chunk_id in removed])
+        with engine.connect() as conn:
+            _add_to_index(conn, index, lexical_index, added)
+        removed.clear()
+        added.clear()
+
+    for item in pipeline:
+        with engine.begin() as conn:
+            deleted, inserted = write_document(conn, item, embedder.model, stats)
+        removed.extend(deleted)
+        added.extend(inserted)
+        if len(added) >= INDEX_FLUSH_ROWS:
+            flush()
+
+    removed.extend(delete_missing(engine, root, seen, stats))
+    flush()
+    return stats
+
+
+def load_index(
+    *,
+    engine: Optional[Engine] = None,
+    embedder: Optional[Embedder] = None,
+    index: Optional[SearchIndex] = None,
+    batch_size: int = INDEX_FLUSH_ROWS,
+) -> int:
+    """Add every stored chunk embedded with the current model to the index."""
+    engine = engine or get_engine()
+    embedder = embedder or get_embedder()
+    index = index if index is not None else get_vector_index()
+    loaded = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(
+            select(chunks.c.id, chunks.c.text, chunks.c.embedding, documents.c.source)
+            .join(documents, documents.c.id == chunks.c.document_id)
+            .where(documents.c.embedding_model == embedder.model)
+        )
+        for rows in result.partitions():
+            _index_rows(index, rows)
+            loaded += len(rows)
+    return loaded
+
+
+def load_lexical_index(
+    *,
+    engine: Optional[Engine] = None,
+    index: Optional[BM25Index] = None,
+    batch_size: int = INDEX_FLUSH_ROWS,
+) -> int:
+    """Add every stored chunk to the BM25 index."""
+    engine = engine or get_engine()
+    index = index if index is not None else get_bm25_index()
+    loaded = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(
+            select(chunks.c.id, chunks.c.text, documents.c.source).join(
+                documents, documents.c.id == chunks.c.document_id
+            )
+        )
+        for rows in result.partitions():
+            _index_texts(index, rows)
+            loaded += len(rows)
+    return loaded
+
+
+def reload_indexes(*, engine: Optional[Engine] = None, lexical: bool = False) -> None:
+    """Rebuild this process's in-memory indexes from the tables.
+
+    New indexes are filled on the side and then swapped in, so searches keep
+    using the old ones meanwhile. The BM25 index is rebuilt if `lexical`.
+    """
+    engine = engine or get_engine()
+    if not os.getenv("EMBEDDING_STORE_DIR"):
+        index = create_vector_index(get_embedder().dim)
+        load_index(engine=engine, index=index)
+        set_vector_index(index)
+    if lexical:
+        lexical_index = BM25Index()
+        load_lexical_index(engine=engine, index=lexical_index)
+        set_bm25_index(lexical_index)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest documents for retrieval")
+    parser.add_argument("path", nargs="?", type=Path, default=None, help="defaults to INGEST_ROOT")
+    args = parser.parse_args()
+    print(ingest(args.path or get_ingest_root()))
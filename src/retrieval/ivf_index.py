@@ -0,0 +1,294 @@
+"""Approximate nearest-neighbour search with an inverted-file (IVF) index.
+
+Vectors are partitioned into `nlist` clusters by spherical k-means; a query is
+scored against the centroids first and then only against the vectors of its
+`nprobe` nearest clusters. Larger `nprobe` raises recall at the cost of
+latency; `nprobe == nlist` is exact search. See
+`benchmarks/bench_ann.py` for recall@k and latency against `VectorIndex`.
+
+Until MIN_TRAIN_SIZE vectors have been added the index has a single cluster,
+i.e. searches are exact. It then trains on what it holds and retrains whenever
+it has grown RETRAIN_GROWTH-fold since, so clusters follow the corpus.
+Training clusters a snapshot without holding the index lock, so searches and
+writes go on meanwhile; rows written during training are carried over when
+the new clusters are swapped in.
+"""
+
+import os
+import threading
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from src.retrieval.vector_index import SearchHit, normalize, top_k
+
+
+MIN_TRAIN_SIZE = 4096
+RETRAIN_GROWTH = 4
+# k-means trains on at most this many points per cluster
+TRAIN_POINTS_PER_LIST = 256
+ASSIGN_BATCH = 65_536
+
+
+def get_nprobe() -> int:
+    return int(os.getenv("IVF_NPROBE", "16"))
+
+
+def default_nlist(size: int) -> int:
+    return max(1, int(np.sqrt(size)))
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for every row, in bounded-memory batches."""
+    result = np.empty(len(vectors), dtype=np.intp)
+    for start in range(0, len(vectors), ASSIGN_BATCH):
+        batch = vectors[start : start + ASSIGN_BATCH]
+        result[start : start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+    return result
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over unit-length rows; returns `k` unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    if len(vectors) > k * TRAIN_POINTS_PER_LIST:
+        vectors = vectors[rng.choice(len(vectors), k * TRAIN_POINTS_PER_LIST, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=k)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(vectors[order], starts[~empty], axis=0)
+        # Empty clusters restart from random points
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+class _InvertedList:
+    def __init__(self, dim: int) -> None:
+        self.vectors = np.empty((16, dim), dtype=np.float32)
+        self.ids: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def extend(self, ids: Sequence[str], vectors: np.ndarray) -> int:
+        """Append rows; returns the row of the first one."""
+        start = len(self.ids)
+        size = start + len(ids)
+        if size > len(self.vectors):
+            capacity = len(self.vectors)
+            while capacity < size:
+                capacity *= 2
+            grown = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+            grown[:start] = self.vectors[:start]
+            self.vectors = grown
+        self.vectors[start:size] = vectors
+        self.ids.extend(ids)
+        return start
+
+    def pop(self, row: int) -> Optional[str]:
+        """Remove `row` by moving the last row into it; returns the moved id."""
+        last = len(self.ids) - 1
+        moved = None
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            self.ids[row] = self.ids[last]
+            moved = self.ids[row]
+        self.ids.pop()
+        return moved
+
+
+def _fill(
+    lists: list[_InvertedList],
+    where: dict[str, tuple[int, int]],
+    ids: Sequence[str],
+    vectors: np.ndarray,
+    labels: np.ndarray,
+) -> None:
+    order = np.argsort(labels, kind="stable")
+    groups = np.split(order, np.flatnonzero(np.diff(labels[order])) + 1)
+    for rows in groups:
+        if not len(rows):
+            continue
+        label = int(labels[rows[0]])
+        group_ids = [ids[row] for row in rows]
+        start = lists[label].extend(group_ids, vectors[rows])
+        for offset, item_id in enumerate(group_ids):
+            where[item_id] = (label, start + offset)
+
+
+class IVFIndex:
+    def __init__(self, dim: int, nlist: Optional[int] = None, nprobe: Optional[int] = None) -> None:
+        self.dim = dim
+        # None picks sqrt(size) clusters at each (re)training
+        self.nlist = nlist
+        self.nprobe = nprobe if nprobe is not None else get_nprobe()
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_size = 0
+        self._lists = [_InvertedList(dim)]
+        self._where: dict[str, tuple[int, int]] = {}
+        self._texts: dict[str, str] = {}
+        self._metadata: dict[str, dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        # Ids written since a running training took its snapshot; None when idle
+        self._touched: Optional[set[str]] = None
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, item_id: object) -> bool:
+        return item_id in self._where
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def _all_vectors(self) -> tuple[list[str], np.ndarray]:
+        ids = [item_id for inverted in self._lists for item_id in inverted.ids]
+        vectors = [inverted.vectors[: len(inverted)] for inverted in self._lists]
+        return ids, np.concatenate(vectors) if ids else np.empty((0, self.dim), np.float32)
+
+    def train(self) -> None:
+        """Cluster the stored vectors and redistribute them into the new lists.
+
+        Does nothing while another training is running.
+        """
+        with self._lock:
+            if self._touched is not None:
+                return
+            ids, vectors = self._all_vectors()
+            if not ids:
+                return
+            self._touched = set()
+        try:
+            centroids = kmeans(vectors, self.nlist or default_nlist(len(ids)))
+            lists = [_InvertedList(self.dim) for _ in range(len(centroids))]
+            where: dict[str, tuple[int, int]] = {}
+            _fill(lists, where, ids, vectors, assign(vectors, centroids))
+        except BaseException:
+            with self._lock:
+                self._touched = None
+            raise
+
+        with self._lock:
+            touched, self._touched = self._touched or set(), None
+            # The snapshot holds stale copies of these; take their current rows
+            current = [item_id for item_id in touched if item_id in self._where]
+            rows = [self._vector(item_id) for item_id in current]
+            self._lists, self._where, self._centroids = lists, where, centroids
+            for item_id in touched:
+                self._remove(item_id)
+            if current:
+                matrix = np.stack(rows)
+                self._insert(current, matrix, assign(matrix, centroids))
+            self._trained_size = len(ids)
+
+    def _vector(self, item_id: str) -> np.ndarray:
+        label, row = self._where[item_id]
+        vector: np.ndarray = self._lists[label].vectors[row].copy()
+        return vector
+
+    def _insert(self, ids: Sequence[str], vectors: np.ndarray, labels: np.ndarray) -> None:
+        _fill(self._lists, self._where, ids, vectors, labels)
+
+    def _remove(self, item_id: str) -> bool:
+        position = self._where.pop(item_id, None)
+        if position is None:
+            return False
+        label, row = position
+        moved = self._lists[label].pop(row)
+        if moved is not None:
+            self._where[moved] = (label, row)
+        return True
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        texts: Sequence[str],
+        metadata: Optional[Sequence[dict[str, Any]]] = None,
+    ) -> None:
+        """Insert rows, replacing any existing rows with the same id."""
+        matrix = normalize(vectors)
+        if matrix.shape != (len(ids), self.dim) or len(texts) != len(ids):
+            raise ValueError(f"Expected {len(ids)} texts and vectors of dimension {self.dim}")
+        metadata = metadata if metadata is not None else [{} for _ in ids]
+        # Later duplicates in one call win, as with repeated calls
+        last = {item_id: row for row, item_id in enumerate(ids)}
+        rows = np.fromiter(last.values(), dtype=np.intp, count=len(last))
+        unique_ids = list(last)
+
+        with self._lock:
+            if self._touched is not None:
+                self._touched.update(unique_ids)
+            for item_id in unique_ids:
+                if item_id in self._where:
+                    self._remove(item_id)
+            labels = (
+                assign(matrix[rows], self._centroids)
+                if self._centroids is not None
+                else np.zeros(len(rows), dtype=np.intp)
+            )
+            self._insert(unique_ids, matrix[rows], labels)
+            for item_id, row in last.items():
+                self._texts[item_id] = texts[row]
+                self._metadata[item_id] = dict(metadata[row])
+
+            size = len(self._where)
+            retrain = (not self.trained and size >= MIN_TRAIN_SIZE) or (
+                self.trained and size >= self._trained_size * RETRAIN_GROWTH
+            )
+        if retrain:
+            self.train()
+
+    def remove(self, ids: Sequence[str]) -> int:
+        """Delete rows by id; unknown ids are ignored. Returns the number removed."""
+        removed = 0
+        with self._lock:
+            if self._touched is not None:
+                self._touched.update(ids)
+            for item_id in ids:
+                if self._remove(item_id):
+                    self._texts.pop(item_id, None)
+                    self._metadata.pop(item_id, None)
+                    removed += 1
+        return removed
+
+    def search(
+        self, queries: np.ndarray, k: int = 4, nprobe: Optional[int] = None
+    ) -> list[list[SearchHit]]:
+        """Approximate cosine top-`k` per query row, scanning `nprobe` clusters."""
+        matrix = normalize(queries)
+        results: list[list[SearchHit]] = []
+        with self._lock:
+            if self._centroids is None:
+                probes = np.zeros((len(matrix), 1), dtype=np.intp)
+            else:
+                probes = top_k(matrix @ self._centroids.T, nprobe or self.nprobe)
+            for query, labels in zip(matrix, probes):
+                lists = [self._lists[label] for label in labels if len(self._lists[label])]
+                if not lists or k <= 0:
+                    results.append([])
+                    continue
+                scores = np.concatenate(
+                    [inverted.vectors[: len(inverted)] @ query for inverted in lists]
+                )
+                ids = [item_id for inverted in lists for item_id in inverted.ids]
+                best = top_k(scores[np.newaxis, :], k)[0]
+                results.append(
+                    [
+                        SearchHit(
+                            id=ids[column],
+                            score=float(scores[column]),
+                            text=self._texts[ids[column]],
+                            metadata=self._metadata[ids[column]],
+                        )
+                        for column in best
+                    ]
+                )
+        return results
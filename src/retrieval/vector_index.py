@@ -0,0 +1,220 @@
+"""In-process vector index for retrieval.
+
+Vectors live in one contiguous float32 matrix (grown by doubling) and are
+normalized on insert, so cosine similarity for a whole batch of queries is a
+single matrix product followed by an `argpartition` top-k per row. Rows are
+upserted by id; removals move the last row into the gap to keep the matrix
+dense.
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Optional, Protocol, Sequence
+
+import numpy as np
+
+from src.retrieval.embeddings import get_embedder
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    id: str
+    score: float
+    text: str
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"id": self.id, "score": self.score, "text": self.text, "metadata": self.metadata}
+
+
+class SearchIndex(Protocol):
+    """What retrieval needs from an index; see `VectorIndex` and `EmbeddingStore`."""
+
+    dim: int
+
+    def __len__(self) -> int: ...
+
+    def __contains__(self, item_id: object) -> bool: ...
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        texts: Sequence[str],
+        metadata: Optional[Sequence[dict[str, Any]]] = None,
+    ) -> None: ...
+
+    def remove(self, ids: Sequence[str]) -> int: ...
+
+    def search(self, queries: np.ndarray, k: int = 4) -> list[list[SearchHit]]: ...
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Return `vectors` as a 2-D float32 array of unit-length rows."""
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indexes of the `k` highest scores per row, best first."""
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(k), (scores.shape[0], k))
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+    result: np.ndarray = np.take_along_axis(candidates, order, axis=1)
+    return result
+
+
+class VectorIndex:
+    def __init__(self, dim: int, capacity: int = 1024) -> None:
+        self.dim = dim
+        self._vectors = np.empty((max(capacity, 1), dim), dtype=np.float32)
+        self._size = 0
+        self._ids: list[str] = []
+        self._texts: list[str] = []
+        self._metadata: list[dict[str, Any]] = []
+        self._positions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, item_id: object) -> bool:
+        return item_id in self._positions
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Read-only view of the stored (normalized) vectors."""
+        view = self._vectors[: self._size]
+        view.flags.writeable = False
+        return view
+
+    def _reserve(self, size: int) -> None:
+        if size <= len(self._vectors):
+            return
+        capacity = len(self._vectors)
+        while capacity < size:
+            capacity *= 2
+        grown = np.empty((capacity, self.dim), dtype=np.float32)
+        grown[: self._size] = self._vectors[: self._size]
+        self._vectors = grown
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        texts: Sequence[str],
+        metadata: Optional[Sequence[dict[str, Any]]] = None,
+    ) -> None:
+        """Insert rows, replacing any existing rows with the same id."""
+        matrix = normalize(vectors)
+        if matrix.shape != (len(ids), self.dim) or len(texts) != len(ids):
+            raise ValueError(f"Expected {len(ids)} texts and vectors of dimension {self.dim}")
+        metadata = metadata if metadata is not None else [{} for _ in ids]
+
+        with self._lock:
+            self._reserve(self._size + len(ids))
+            for row, item_id in enumerate(ids):
+                position = self._positions.get(item_id)
+                if position is None:
+                    position = self._size
+                    self._size += 1
+                    self._positions[item_id] = position
+                    self._ids.append(item_id)
+                    self._texts.append(texts[row])
+                    self._metadata.append(dict(metadata[row]))
+                else:
+                    self._texts[position] = texts[row]
+                    self._metadata[position] = dict(metadata[row])
+                self._vectors[position] = matrix[row]
+
+    def remove(self, ids: Sequence[str]) -> int:
+        """Delete rows by id; unknown ids are ignored. Returns the number removed."""
+        removed = 0
+        with self._lock:
+            for item_id in ids:
+                position = self._positions.pop(item_id, None)
+                if position is None:
+                    continue
+                last = self._size - 1
+                if position != last:
+                    self._vectors[position] = self._vectors[last]
+                    self._ids[position] = self._ids[last]
+                    self._texts[position] = self._texts[last]
+                    self._metadata[position] = self._metadata[last]
+                    self._positions[self._ids[position]] = position
+                self._ids.pop()
+                self._texts.pop()
+                self._metadata.pop()
+                self._size = last
+                removed += 1
+        return removed
+
+    def search(self, queries: np.ndarray, k: int = 4) -> list[list[SearchHit]]:
+        """Cosine top-`k` for each query row (a single 1-D query is accepted)."""
+        matrix = normalize(queries)
+        with self._lock:
+            if self._size == 0 or k <= 0:
+                return [[] for _ in range(len(matrix))]
+            scores = matrix @ self._vectors[: self._size].T
+            best = top_k(scores, k)
+            return [
+                [
+                    SearchHit(
+                        id=self._ids[column],
+                        score=float(scores[row, column]),
+                        text=self._texts[column],
+                        metadata=self._metadata[column],
+                    )
+                    for column in best[row]
+                ]
+                for row in range(len(matrix))
+            ]
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index() -> SearchIndex:
+    """Process-wide index sized for the configured embedder.
+
+    With EMBEDDING_STORE_DIR set this is the memory-mapped `EmbeddingStore` in
+    that directory. Otherwise VECTOR_INDEX picks an in-memory index: `exact`
+    (default, `VectorIndex`) or `ivf` (approximate, `IVFIndex`).
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = create_vector_index(get_embedder().dim)
+    return _index
+
+
+def create_vector_index(dim: int) -> SearchIndex:
+    """A new, empty index of the configured kind (see `get_vector_index`)."""
+    store_dir = os.getenv("EMBEDDING_STORE_DIR")
+    if store_dir:
+        from src.retrieval.embedding_store import EmbeddingStore
+
+        return EmbeddingStore(store_dir, dim)
+    kind = os.getenv("VECTOR_INDEX", "exact")
+    if kind == "exact":
+        return VectorIndex(dim)
+    if kind == "ivf":
+        from src.retrieval.ivf_index import IVFIndex
+
+        return IVFIndex(dim)
+    raise ValueError(f"Unknown VECTOR_INDEX {kind!r}; expected 'exact' or 'ivf'")
+
+
+def set_vector_index(index: Optional[SearchIndex]) -> None:
+    """Replace the process-wide index; None creates an empty one on next use."""
+    global _index
+    with _index_lock:
+        _index = index
@@ -0,0 +1,68 @@
+"""Coalescing of concurrent identical loads.
+
+`SingleFlight.run(key, load)` starts `load()` unless a load of the same key
+is already in flight, in which case the caller awaits that one instead: N
+concurrent requests for the same conversation cost one query and one JSON
+decode. Results are shared, so callers must copy anything they mutate.
+
+Keys are tuples whose first element is the id of the loaded row; writers
+call `forget(id)` after committing so loads that start later do not join a
+query that may have read the row before the write.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class SingleFlightStats:
+    calls: int = 0
+    # Calls that started a load; the others shared one already in flight
+    loads: int = 0
+
+    @property
+    def shared(self) -> int:
+        return self.calls - self.loads
+
+    @property
+    def dedup_ratio(self) -> float:
+        return self.shared / self.calls if self.calls else 0.0
+
+
+class SingleFlight(Generic[T]):
+    def __init__(self) -> None:
+        self.stats = SingleFlightStats()
+        self._in_flight: dict[tuple[Hashable, ...], asyncio.Future[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    async def run(self, key: tuple[Hashable, ...], load: Callable[[], Awaitable[T]]) -> T:
+        self.stats.calls += 1
+        future = self._in_flight.get(key)
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            self.stats.loads += 1
+            future = asyncio.ensure_future(load())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._done(key, done))
+        # A cancelled caller must not cancel the load the others are waiting on
+        return await asyncio.shield(future)
+
+    def _done(self, key: tuple[Hashable, ...], future: asyncio.Future[T]) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if not future.cancelled():
+            # Mark the exception retrieved in case every caller was cancelled
+            future.exception()
+
+    def forget(self, group: Hashable) -> None:
+        """Make later calls for keys starting with `group` start a new load."""
+        for key in [key for key in self._in_flight if key[0] == group]:
+            del self._in_flight[key]
+
+    def reset_stats(self) -> None:
+        self.stats = SingleFlightStats()
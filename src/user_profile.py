@@ -1,11 +1,44 @@
+import os
 from dataclasses import dataclass, asdict
 from typing import Optional, Any
 
-from sqlalchemy import select
+from sqlalchemy import Connection, select
 from sqlalchemy.engine import Engine
 
-from src.database.utils import get_engine
+from src.cache import Cache, LRUCache, RedisCache
+from src.database.utils import begin_async_write, get_async_engine, get_engine
 from src.database.models import user_profiles
+from src.metrics import stage
+from src.singleflight import SingleFlight
+
+
+_cache: Cache | None = None
+
+# Concurrent `UserProfile.aload`s that miss the cache share one read
+profile_loads: SingleFlight["UserProfile"] = SingleFlight()
+
+
+def get_profile_cache() -> Cache:
+    """Read-through cache of profile data keyed by profile id.
+
+    Uses Redis when PROFILE_CACHE_URL is set so all workers share entries and
+    invalidations, otherwise a per-process LRU (PROFILE_CACHE_SIZE entries).
+    Entries expire after PROFILE_CACHE_TTL seconds either way.
+    """
+    global _cache
+    if _cache is None:
+        ttl = float(os.getenv("PROFILE_CACHE_TTL", "300"))
+        url = os.getenv("PROFILE_CACHE_URL")
+        if url:
+            _cache = RedisCache(url, prefix="rag:user_profile:", ttl=ttl)
+        else:
+            _cache = LRUCache(maxsize=int(os.getenv("PROFILE_CACHE_SIZE", "10000")), ttl=ttl)
+    return _cache
+
+
+def set_profile_cache(cache: Cache | None) -> None:
+    global _cache
+    _cache = cache
 
 
 @dataclass
@@ -24,30 +57,78 @@ class UserProfile:
     def from_dict(cls, data: dict[str, Any], id: Optional[int] = None) -> "UserProfile":
         return cls(**data, id=id)
 
+    def _write(self, conn: Connection) -> int:
+        if self.id is None:
+            result = conn.execute(user_profiles.insert().values(data=self.to_dict()))
+            inserted = result.inserted_primary_key
+            if not inserted:
+                raise RuntimeError("Failed to insert user profile")
+            self.id = inserted[0]
+        else:
+            conn.execute(
+                user_profiles.update()
+                .where(user_profiles.c.id == self.id)
+                .values(data=self.to_dict())
+            )
+        assert self.id is not None
+        return self.id
+
     def save(self, engine: Engine | None = None) -> int:
         engine = engine or get_engine()
         with engine.begin() as conn:
-            if self.id is None:
-                result = conn.execute(user_profiles.insert().values(data=self.to_dict()))
-                inserted = result.inserted_primary_key
-                if not inserted:
-                    raise RuntimeError("Failed to insert user profile")
-                self.id = inserted[0]
-            else:
-                conn.execute(
-                    user_profiles.update()
-                    .where(user_profiles.c.id == self.id)
-                    .values(data=self.to_dict())
-                )
-        return self.id
+            profile_id = self._write(conn)
+        profile_loads.forget(profile_id)
+        get_profile_cache().delete(str(profile_id))
+        return profile_id
+
+    async def asave(self) -> int:
+        async with begin_async_write() as conn:
+            profile_id = await conn.run_sync(self._write)
+        profile_loads.forget(profile_id)
+        await get_profile_cache().adelete(str(profile_id))
+        return profile_id
+
+    @classmethod
+    def _read(cls, conn: Connection, profile_id: int) -> "UserProfile":
+        row = conn.execute(
+            select(user_profiles.c.data).where(user_profiles.c.id == profile_id)
+        ).one_or_none()
+        if row is None:
+            raise KeyError(f"No profile with id={profile_id}")
+        return cls.from_dict(row.data, id=profile_id)
 
     @classmethod
     def load(cls, profile_id: int) -> "UserProfile":
-        engine = get_engine()
-        with engine.connect() as conn:
-            row = conn.execute(
-                select(user_profiles.c.data).where(user_profiles.c.id == profile_id)
-            ).one_or_none()
-            if row is None:
-                raise KeyError(f"No profile with id={profile_id}")
-            return cls.from_dict(row.data, id=profile_id)
+        with stage("profile_load"):
+            cache = get_profile_cache()
+            data = cache.get(str(profile_id))
+            if data is not None:
+                return cls.from_dict(data, id=profile_id)
+
+            generation = cache.generation(str(profile_id))
+            engine = get_engine()
+            with engine.connect() as conn:
+                profile = cls._read(conn, profile_id)
+            cache.set_if_unchanged(str(profile_id), profile.to_dict(), generation)
+            return profile
+
+    @classmethod
+    async def aload(cls, profile_id: int) -> "UserProfile":
+        with stage("profile_load"):
+            cache = get_profile_cache()
+            data = await cache.aget(str(profile_id))
+            if data is not None:
+                return cls.from_dict(data, id=profile_id)
+
+            profile = await profile_loads.run((profile_id,), lambda: cls._aread(profile_id))
+            return cls.from_dict(profile.to_dict(), id=profile_id)
+
+    @classmethod
+    async def _aread(cls, profile_id: int) -> "UserProfile":
+        cache = get_profile_cache()
+        # A save during the read invalidates the key; its result is then not cached
+        generation = await cache.ageneration(str(profile_id))
+        async with get_async_engine().connect() as conn:
+            profile = await conn.run_sync(cls._read, profile_id)
+        await cache.aset_if_unchanged(str(profile_id), profile.to_dict(), generation)
+        return profile
@@ -0,0 +1,96 @@
+"""Background warmup of an API worker.
+
+The server starts answering as soon as migrations have run; everything a
+first generation would otherwise pay for happens here in the background:
+loading the retrieval indexes, importing and compiling the generation graph
+(which pulls in langgraph/langchain), creating the chat-model clients and
+opening a database connection. `GET /ready` reports 503 until `warm_up` has
+finished so load balancers only route traffic to warm workers; liveness and
+the user/conversation endpoints do not wait.
+
+A failing step is logged and skipped; requests that need it then fail or
+build it themselves, as they would without warmup.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import Engine, text
+
+from src.database.utils import get_async_engine
+
+
+logger = logging.getLogger(__name__)
+
+_task: Optional["asyncio.Task[None]"] = None
+
+
+def _load_indexes(engine: Engine) -> None:
+    from src.graphs.retrieve import uses_lexical_index
+    from src.retrieval.ingestion import load_index, load_lexical_index
+    from src.retrieval.vector_index import get_vector_index
+
+    # Persistent (EMBEDDING_STORE_DIR) indexes are only filled the first time
+    if not len(get_vector_index()):
+        load_index(engine=engine)
+    if uses_lexical_index():
+        load_lexical_index(engine=engine)
+
+
+def _build_graph() -> None:
+    from src.conversation import get_generation_graph
+
+    get_generation_graph()
+
+
+def _build_chat_models() -> None:
+    from src.graphs.context import SUMMARY_MODEL_NAME
+    from src.graphs.registry import get_chat_model
+    from src.graphs.simple_generation_graph import MODEL_NAME
+
+    for model in {MODEL_NAME, SUMMARY_MODEL_NAME}:
+        get_chat_model(model)
+
+
+async def _open_connection() -> None:
+    async with get_async_engine().connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def warm_up(engine: Engine) -> None:
+    steps: list[tuple[str, Callable[[], Awaitable[None]]]] = [
+        ("indexes", lambda: asyncio.to_thread(_load_indexes, engine)),
+        ("graph", lambda: asyncio.to_thread(_build_graph)),
+        ("chat_models", lambda: asyncio.to_thread(_build_chat_models)),
+        ("database", _open_connection),
+    ]
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            await step()
+        except Exception:
+            logger.warning("Warmup step %s failed", name, exc_info=True)
+        else:
+            logger.info("Warmup step %s took %.2fs", name, time.perf_counter() - start)
+
+
+def start_warmup(engine: Engine) -> None:
+    global _task
+    _task = asyncio.create_task(warm_up(engine))
+
+
+def is_ready() -> bool:
+    return _task is not None and _task.done()
+
+
+async def wait_until_ready() -> None:
+    """Wait for a running warmup; steps run in threads and cannot be cancelled midway."""
+    if _task is not None:
+        await asyncio.shield(_task)
+
+
+def reset() -> None:
+    global _task
+    _task = None
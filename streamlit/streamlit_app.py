@@ -1,16 +1,19 @@
+import json
 import os
-from typing import Any, TypedDict, cast
+from typing import Any, Iterator, TypedDict, cast
 
 import requests
 import streamlit as st
 
 DEFAULT_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8002")
+MESSAGE_PAGE_SIZE = 50
 
 
 class MessagePayload(TypedDict, total=False):
     role: str
     content: str
     timestamp: str
+    seq: int
 
 
 class ConversationItem(TypedDict):
@@ -24,13 +27,10 @@ class UserPayload(TypedDict):
     name: str
 
 
-class MessagesPayload(TypedDict):
+class MessagesPayload(TypedDict, total=False):
     conversation_id: int
     messages: list[MessagePayload]
-
-
-class SendMessagePayload(MessagesPayload):
-    assistant: MessagePayload
+    has_more: bool
 
 
 def init_state() -> None:
@@ -41,6 +41,7 @@ def init_state() -> None:
     st.session_state.setdefault("active_conversation_id", None)
     st.session_state.setdefault("messages", [])
     st.session_state.setdefault("messages_loaded_for", None)
+    st.session_state.setdefault("has_older_messages", False)
 
 
 def clear_user_state() -> None:
@@ -50,6 +51,7 @@ def clear_user_state() -> None:
     st.session_state["active_conversation_id"] = None
     st.session_state["messages"] = []
     st.session_state["messages_loaded_for"] = None
+    st.session_state["has_older_messages"] = False
 
 
 def api_request(
@@ -112,10 +114,15 @@ def load_conversations() -> None:
     st.session_state["conversations"] = data
 
 
-def load_messages(conversation_id: int) -> None:
+def load_messages(conversation_id: int, *, older: bool = False) -> None:
+    params: dict[str, Any] = {"limit": MESSAGE_PAGE_SIZE}
+    current = st.session_state["messages"]
+    if older and current and "seq" in current[0]:
+        params["before"] = current[0]["seq"]
     data = api_request(
         "GET",
         f"/api/v1/conversations/{conversation_id}/messages",
+        params=params,
     )
     if data is None:
         return
@@ -123,7 +130,9 @@ def load_messages(conversation_id: int) -> None:
         st.error("Messages payload is invalid.")
         return
     messages_payload = cast(MessagesPayload, data)
-    st.session_state["messages"] = messages_payload.get("messages", [])
+    page = messages_payload.get("messages", [])
+    st.session_state["messages"] = page + current if "before" in params else page
+    st.session_state["has_older_messages"] = messages_payload.get("has_more", False)
     st.session_state["messages_loaded_for"] = conversation_id
 
 
@@ -131,6 +140,7 @@ def set_active_conversation(conversation_id: int | None) -> None:
     st.session_state["active_conversation_id"] = conversation_id
     st.session_state["messages"] = []
     st.session_state["messages_loaded_for"] = None
+    st.session_state["has_older_messages"] = False
 
 
 def register_user(name: str) -> None:
@@ -173,24 +183,28 @@ def create_conversation() -> None:
     load_conversations()
 
 
-def send_message(content: str) -> None:
+def stream_message(content: str) -> Iterator[str]:
+    """Yield assistant tokens from the streaming endpoint as they arrive."""
     conversation_id = st.session_state["active_conversation_id"]
     if conversation_id is None:
         return
-    data = api_request(
-        "POST",
-        f"/api/v1/conversations/{conversation_id}/messages",
-        json={"content": content},
-    )
-    if data is None:
-        return
-    if not isinstance(data, dict):
-        st.error("Message payload is invalid.")
-        return
-    send_payload = cast(SendMessagePayload, data)
-    st.session_state["messages"] = send_payload.get("messages", [])
-    st.session_state["messages_loaded_for"] = conversation_id
-    load_conversations()
+    base_url = st.session_state["api_base_url"].rstrip("/")
+    url = f"{base_url}/api/v1/conversations/{conversation_id}/messages/stream"
+    try:
+        with requests.post(url, json={"content": content}, stream=True, timeout=30) as response:
+            if not response.ok:
+                st.error(f"API error {response.status_code}: {response.text}")
+                return
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get("type") == "token":
+                    yield event.get("content", "")
+                elif event.get("type") == "error":
+                    st.error(event.get("detail", "Streaming failed."))
+    except (requests.RequestException, ValueError) as exc:
+        st.error(f"API request failed: {exc}")
 
 
 def render_sidebar() -> None:
@@ -274,6 +288,10 @@ def render_messages() -> None:
     if st.session_state["messages_loaded_for"] != conversation_id:
         load_messages(conversation_id)
 
+    if st.session_state["has_older_messages"] and st.button("Load earlier messages"):
+        load_messages(conversation_id, older=True)
+        st.rerun()
+
     for msg in st.session_state["messages"]:
         role = msg.get("role", "assistant")
         content = msg.get("content", "")
@@ -281,7 +299,10 @@ def render_messages() -> None:
 
     prompt = st.chat_input("Type a message")
     if prompt:
-        send_message(prompt)
+        st.chat_message("user").write(prompt)
+        st.chat_message("assistant").write_stream(stream_message(prompt))
+        st.session_state["messages_loaded_for"] = None
+        load_conversations()
         st.rerun()
 
 
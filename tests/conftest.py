@@ -1,5 +1,29 @@
+import asyncio
 import sys
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
-sys.path.insert(0, str(ROOT))
\ No newline at end of file
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture()
+def db_engine(tmp_path, monkeypatch):
+    import src.database.utils as db_utils
+    from src.database.migrations import run_migrations
+    from src.user_profile import set_profile_cache
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'unit.db'}")
+    if db_utils._engine is not None:
+        db_utils._engine.dispose()
+    db_utils._engine = None
+    db_utils._async_engine = None
+    db_utils._SessionLocal = None
+
+    set_profile_cache(None)
+    engine = db_utils.get_engine()
+    run_migrations(engine)
+    yield engine
+
+    asyncio.run(db_utils.dispose_engines())
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from datetime import datetime
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import select
@@ -8,7 +10,7 @@ from src.api_server import app
 from src.conversation import Conversation
 from src.database.models import conversations, user_profiles
 from src.database.utils import get_engine
-from src.user_profile import UserProfile
+from src.user_profile import UserProfile, set_profile_cache
 
 
 @pytest.fixture()
@@ -21,7 +23,9 @@ def client(tmp_path, monkeypatch):
     if db_utils._engine is not None:
         db_utils._engine.dispose()
     db_utils._engine = None
+    db_utils._async_engine = None
     db_utils._SessionLocal = None
+    set_profile_cache(None)
 
     with TestClient(app) as test_client:
         yield test_client
@@ -29,6 +33,7 @@ def client(tmp_path, monkeypatch):
     if db_utils._engine is not None:
         db_utils._engine.dispose()
     db_utils._engine = None
+    db_utils._async_engine = None
     db_utils._SessionLocal = None
 
     if db_path.exists():
@@ -93,13 +98,42 @@ class TestApiServer:
             ).all()
         assert len(rows) == 3
 
+    def test_conversation_list_pagination(self, client: TestClient):
+        user_id = client.post("/api/v1/users", json={"name": "Jan"}).json()["id"]
+        created = [
+            client.post("/api/v1/conversations", json={"user_id": user_id}).json()["id"]
+            for _ in range(5)
+        ]
+        with get_engine().begin() as conn:
+            conn.execute(
+                conversations.update()
+                .where(conversations.c.id == created[1])
+                .values(updated_at=datetime(2030, 1, 1))
+            )
+
+        def pages(order: str) -> list[list[int]]:
+            result, params = [], {"user_id": user_id, "limit": 2, "order": order}
+            while True:
+                response = client.get("/api/v1/conversations", params=params)
+                result.append([item["id"] for item in response.json()])
+                if "x-next-cursor" not in response.headers:
+                    return result
+                params["cursor"] = response.headers["x-next-cursor"]
+
+        assert pages("created") == [created[:2], created[2:4], created[4:]]
+        newest_first = [created[1], *reversed([created[0], *created[2:]])]
+        assert pages("updated") == [newest_first[:2], newest_first[2:4], newest_first[4:]]
+
+        response = client.get("/api/v1/conversations", params={"user_id": user_id, "cursor": "x"})
+        assert response.status_code == 400
+
     def test_messages(self, client: TestClient, monkeypatch):
         from src.graphs.simple_generation_graph import SimpleGenerationGraph
 
-        def fake_invoke(self, messages, user_profile):
+        async def fake_ainvoke(self, messages, user_profile, memory=None):
             return "pong"
 
-        monkeypatch.setattr(SimpleGenerationGraph, "invoke", fake_invoke)
+        monkeypatch.setattr(SimpleGenerationGraph, "ainvoke", fake_ainvoke)
 
         user = client.post("/api/v1/users", json={"name": "Jan"}).json()
         user_id = user["id"]
@@ -129,5 +163,274 @@ class TestApiServer:
         messages = response.json()["messages"]
         assert len(messages) == 4
 
+        items = client.get("/api/v1/conversations", params={"user_id": user_id}).json()
+        assert items[0]["message_count"] == 4
+        assert items[0]["last_message"]["content"] == "pong"
+
         loaded = Conversation.load(conversation_id)
-        assert len(loaded.data.get("messages", [])) == 4
\ No newline at end of file
+        assert len(loaded.data.get("messages", [])) == 4
+
+    def test_messages_pagination(self, client: TestClient):
+        user_id = client.post("/api/v1/users", json={"name": "Jan"}).json()["id"]
+        conversation = Conversation(user_id=user_id)
+        conversation.data["messages"].extend(
+            {"role": "user", "content": str(i), "timestamp": "2026-01-01T00:00:00"}
+            for i in range(5)
+        )
+        conversation_id = conversation.save()
+        url = f"/api/v1/conversations/{conversation_id}/messages"
+
+        page = client.get(url, params={"limit": 2}).json()
+        assert [msg["seq"] for msg in page["messages"]] == [3, 4]
+        assert page["has_more"] is True
+
+        page = client.get(url, params={"limit": 3, "before": 3}).json()
+        assert [msg["seq"] for msg in page["messages"]] == [0, 1, 2]
+        assert page["has_more"] is False
+
+        page = client.get(url, params={"limit": 2, "after": -1}).json()
+        assert [msg["content"] for msg in page["messages"]] == ["0", "1"]
+        assert page["has_more"] is True
+
+        page = client.get(url, params={"limit": 2, "after": 2}).json()
+        assert [msg["seq"] for msg in page["messages"]] == [3, 4]
+        assert page["has_more"] is False
+
+        response = client.get(url, params={"before": 3, "after": 1})
+        assert response.status_code == 400
+
+    def test_stored_responses_match_their_models(self, client: TestClient):
+        from src.api_server import ConversationResponse, MessagesResponse
+
+        user_id = client.post("/api/v1/users", json={"name": "Jan"}).json()["id"]
+        conversation = Conversation(user_id=user_id, data={"topic": "x"})
+        conversation.data["messages"].append(
+            {"role": "user", "content": "héllo \"quoted\"", "timestamp": "2026-01-01T00:00:00"}
+        )
+        conversation_id = conversation.save()
+
+        for url, model in (
+            (f"/api/v1/conversations/{conversation_id}", ConversationResponse),
+            (f"/api/v1/conversations/{conversation_id}/messages", MessagesResponse),
+        ):
+            response = client.get(url)
+            assert response.headers["content-type"] == "application/json"
+            assert model.model_validate_json(response.content).model_dump() == response.json()
+
+    def test_stream_message(self, client: TestClient):
+        import json
+
+        from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+        from langchain_core.messages import AIMessage
+
+        from src.graphs import registry
+        from src.graphs.simple_generation_graph import MODEL_NAME
+
+        registry.set_chat_model(
+            MODEL_NAME, GenericFakeChatModel(messages=iter([AIMessage("hello big world")]))
+        )
+        user_id = client.post("/api/v1/users", json={"name": "Jan"}).json()["id"]
+        conversation_id = client.post(
+            "/api/v1/conversations", json={"user_id": user_id}
+        ).json()["id"]
+
+        with client.stream(
+            "POST",
+            f"/api/v1/conversations/{conversation_id}/messages/stream",
+            json={"content": "Hello"},
+        ) as response:
+            assert response.status_code == 200
+            events = [json.loads(line) for line in response.iter_lines() if line]
+        registry.reload()
+
+        tokens = [event["content"] for event in events if event["type"] == "token"]
+        assert len(tokens) > 1
+        assert "".join(tokens) == "hello big world"
+        assert events[-1]["type"] == "done"
+        assert events[-1]["assistant"]["content"] == "hello big world"
+        assert events[-1]["assistant"]["seq"] == 1
+
+        messages = client.get(f"/api/v1/conversations/{conversation_id}/messages").json()
+        assert [msg["content"] for msg in messages["messages"]] == ["Hello", "hello big world"]
+
+    def test_cache_stats(self, client: TestClient, monkeypatch):
+        monkeypatch.delenv("LLM_CACHE_ENABLED", raising=False)
+        user_id = client.post("/api/v1/users", json={"name": "Jan"}).json()["id"]
+        client.get(f"/api/v1/users/{user_id}")
+        client.get(f"/api/v1/users/{user_id}")
+
+        stats = client.get("/api/v1/admin/cache-stats").json()
+
+        assert stats["profile_cache"]["hits"] == 1
+        assert stats["profile_cache"]["misses"] == 1
+        assert stats["response_cache"] is None
+        assert stats["load_coalescing"]["profiles"]["calls"] >= 1
+
+    def test_ready_after_warmup(self, client: TestClient):
+        from src import warmup
+
+        client.portal.call(warmup.wait_until_ready)
+
+        assert warmup.is_ready()
+        assert client.get("/ready").json() == {"status": "ready"}
+
+        warmup.reset()
+        assert client.get("/ready").status_code == 503
+
+    def test_metrics(self, client: TestClient):
+        from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+        from langchain_core.messages import AIMessage
+
+        from src import metrics
+        from src.graphs import registry
+        from src.graphs.simple_generation_graph import MODEL_NAME
+
+        metrics.set_metrics_enabled(False)
+        assert client.get("/metrics").status_code == 404
+
+        metrics.set_metrics_enabled(True)
+        metrics.reset()
+        registry.reload()
+        registry.set_chat_model(MODEL_NAME, GenericFakeChatModel(messages=iter([AIMessage("hi")])))
+        try:
+            user_id = client.post("/api/v1/users", json={"name": "Jan"}).json()["id"]
+            conversation_id = client.post(
+                "/api/v1/conversations", json={"user_id": user_id}
+            ).json()["id"]
+            client.post(f"/api/v1/conversations/{conversation_id}/messages", json={"content": "Hello"})
+            client.get("/api/v1/conversations/999999")
+
+            response = client.get("/metrics")
+        finally:
+            metrics.set_metrics_enabled(None)
+            metrics.reset()
+            registry.reload()
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        for name in (
+            "conversation_load",
+            "profile_load",
+            "graph_compile",
+            "model_call",
+            "conversation_save",
+        ):
+            assert f'rag_stage_duration_seconds_count{{stage="{name}"}}' in body
+        assert (
+            'rag_http_requests_total{method="POST",'
+            'route="/api/v1/conversations/{conversation_id}/messages",status="200"} 1.0'
+        ) in body
+        assert 'route="/api/v1/conversations/{conversation_id}",status="404"} 1.0' in body
+        # The scrape itself is still in flight while rendering
+        assert "rag_http_requests_in_flight 1.0" in body
+
+    def test_async_message_job(self, client: TestClient, monkeypatch):
+        from src.graphs.simple_generation_graph import SimpleGenerationGraph
+
+        async def fake_ainvoke(self, messages, user_profile, memory=None):
+            return f"re {messages[-1]['content']}"
+
+        monkeypatch.setattr(SimpleGenerationGraph, "ainvoke", fake_ainvoke)
+        user_id = client.post("/api/v1/users", json={"name": "Jan"}).json()["id"]
+        conversation_id = client.post(
+            "/api/v1/conversations", json={"user_id": user_id}
+        ).json()["id"]
+
+        disabled = client.post(
+            f"/api/v1/conversations/{conversation_id}/messages",
+            params={"mode": "async"},
+            json={"content": "Hello"},
+        )
+        assert disabled.status_code == 503
+
+        from src.jobs import start_workers
+
+        monkeypatch.setenv("JOB_WORKERS", "1")
+        # Startup already ran without workers; start them on the server's loop
+        client.portal.call(start_workers)
+        response = client.post(
+            f"/api/v1/conversations/{conversation_id}/messages",
+            params={"mode": "async"},
+            json={"content": "Hello"},
+        )
+        assert response.status_code == 202
+        accepted = response.json()
+        assert accepted["status"] == "queued"
+
+        job = client.get(accepted["status_url"], params={"wait": 10}).json()
+        assert job["status"] == "succeeded"
+        assert job["assistant"]["content"] == "re Hello"
+        assert job["assistant"]["seq"] == 1
+        messages = client.get(f"/api/v1/conversations/{conversation_id}/messages").json()
+        assert [msg["content"] for msg in messages["messages"]] == ["Hello", "re Hello"]
+
+        missing = client.post(
+            "/api/v1/conversations/999999/messages",
+            params={"mode": "async"},
+            json={"content": "Hello"},
+        )
+        assert missing.status_code == 404
+        assert client.get("/api/v1/jobs/999999").status_code == 404
+
+    def test_batch_messages(self, client: TestClient, monkeypatch):
+        from src.graphs.simple_generation_graph import SimpleGenerationGraph
+
+        async def fake_ainvoke(self, messages, user_profile, memory=None):
+            if messages[-1]["content"] == "boom":
+                raise RuntimeError("provider down")
+            return f"{messages[-1]['content']} after {len(messages) - 1}"
+
+        monkeypatch.setattr(SimpleGenerationGraph, "ainvoke", fake_ainvoke)
+        user_id = client.post("/api/v1/users", json={"name": "Jan"}).json()["id"]
+        first, second = (
+            client.post("/api/v1/conversations", json={"user_id": user_id}).json()["id"]
+            for _ in range(2)
+        )
+
+        response = client.post(
+            "/api/v1/messages/batch",
+            json={
+                "items": [
+                    {"conversation_id": first, "content": "a"},
+                    {"conversation_id": second, "content": "b"},
+                    {"conversation_id": first, "content": "boom"},
+                    {"conversation_id": 999, "content": "c"},
+                    {"conversation_id": first, "content": "d"},
+                ],
+                "concurrency": 2,
+            },
+        )
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [result["status_code"] for result in results] == [200, 200, 500, 404, 200]
+        assert results[0]["assistant"]["content"] == "a after 0"
+        assert results[1]["assistant"]["content"] == "b after 0"
+        assert "provider down" in results[2]["error"]
+        assert results[4]["assistant"]["content"] == "d after 2"
+        assert results[4]["assistant"]["seq"] == 3
+
+        history = client.get(f"/api/v1/conversations/{first}/messages").json()["messages"]
+        assert [msg["content"] for msg in history] == ["a", "a after 0", "d", "d after 2"]
+
+    def test_ingest_documents(self, client: TestClient, tmp_path, monkeypatch):
+        from src.retrieval.vector_index import get_vector_index, set_vector_index
+
+        root = tmp_path / "documents"
+        (root / "manuals").mkdir(parents=True)
+        (root / "manuals" / "router.md").write_text("The SKU-4411 router supports WPA3.")
+        monkeypatch.setenv("INGEST_ROOT", str(root))
+        set_vector_index(None)
+
+        response = client.post("/api/v1/admin/ingest", json={"path": "manuals"})
+        assert response.status_code == 200
+        assert response.json()["chunks_embedded"] == 1
+        assert len(get_vector_index()) == 1
+
+        response = client.post("/api/v1/admin/ingest", json={})
+        assert response.json()["documents_skipped"] == 1
+
+        assert client.post("/api/v1/admin/ingest", json={"path": "../"}).status_code == 400
+        assert client.post("/api/v1/admin/ingest", json={"path": "missing"}).status_code == 404
+        set_vector_index(None)
@@ -0,0 +1,53 @@
+import asyncio
+
+from src.batch import send_batch
+from src.conversation import Conversation
+from src.user_profile import UserProfile
+
+
+def test_failed_save_fails_only_its_conversation(db_engine, monkeypatch) -> None:
+    from src.graphs.simple_generation_graph import SimpleGenerationGraph
+
+    async def fake_ainvoke(self, messages, user_profile, memory=None):
+        return f"re {messages[-1]['content']}"
+
+    monkeypatch.setattr(SimpleGenerationGraph, "ainvoke", fake_ainvoke)
+    user_id = UserProfile(name="Ada").save()
+    good, bad = (Conversation(user_id=user_id).save() for _ in range(2))
+
+    original = Conversation.asave
+
+    async def failing_asave(self):
+        if self.id == bad:
+            raise RuntimeError("disk full")
+        return await original(self)
+
+    monkeypatch.setattr(Conversation, "asave", failing_asave)
+    results = asyncio.run(send_batch([(good, "a"), (bad, "b"), (good, "c")]))
+
+    assert [result.status_code for result in results] == [200, 500, 200]
+    assert "disk full" in results[1].error
+    assert [result.seq for result in (results[0], results[2])] == [1, 3]
+    assert len(Conversation.load(good).data["messages"]) == 4
+    assert Conversation.load(bad).data["messages"] == []
+
+
+def test_turns_saved_concurrently_shift_reported_seqs(db_engine, monkeypatch) -> None:
+    from src.graphs.simple_generation_graph import SimpleGenerationGraph
+
+    user_id = UserProfile(name="Ada").save()
+    conversation_id = Conversation(user_id=user_id).save()
+
+    async def fake_ainvoke(self, messages, user_profile, memory=None):
+        # Another writer appends a turn while the batch is generating
+        other = await Conversation.aload(conversation_id)
+        other._append("user", "other")
+        await other.asave()
+        return "re"
+
+    monkeypatch.setattr(SimpleGenerationGraph, "ainvoke", fake_ainvoke)
+    (result,) = asyncio.run(send_batch([(conversation_id, "mine")]))
+
+    history = Conversation.load(conversation_id).data["messages"]
+    assert [message["content"] for message in history] == ["other", "mine", "re"]
+    assert result.seq == 2
@@ -0,0 +1,55 @@
+from src.retrieval.bm25 import BM25Index, lexical_tokens, reciprocal_rank_fusion
+from src.retrieval.vector_index import SearchHit
+
+
+DOCS = {
+    "router": "The SKU-4411 router supports WPA3 and mesh networking.",
+    "switch": "The SKU-4412 switch has 24 ports.",
+    "billing": "Invoices are due within 30 days; the router fee is billed monthly.",
+}
+
+
+def _index() -> BM25Index:
+    index = BM25Index()
+    index.add(list(DOCS), list(DOCS.values()))
+    return index
+
+
+def test_lexical_tokens_keep_identifiers_whole() -> None:
+    assert lexical_tokens("SKU-4411, v1.2!") == ["sku-4411", "v1.2", "sku", "4411", "v1", "2"]
+
+
+def test_exact_identifier_ranks_first() -> None:
+    hits = _index().search("sku-4412 stock", k=3)
+
+    assert hits[0].id == "switch"
+    assert "billing" not in [hit.id for hit in hits]
+
+
+def test_rare_terms_outweigh_common_ones() -> None:
+    hits = _index().search("router invoices", k=3)
+
+    assert [hit.id for hit in hits] == ["billing", "router"]
+
+
+def test_remove_and_compaction_keep_results_consistent() -> None:
+    index = _index()
+    for i in range(10):
+        index.add([f"filler-{i}"], [f"filler text {i}"])
+    index.add(["router"], ["The SKU-4411 router was discontinued."])
+
+    assert index.remove([f"filler-{i}" for i in range(10)] + ["missing"]) == 10
+    assert len(index) == 3
+    assert index.search("filler", k=5) == []
+    hits = index.search("discontinued SKU-4411", k=1)
+    assert hits[0].id == "router" and "discontinued" in hits[0].text
+    assert len(index._ids) == 3
+
+
+def test_reciprocal_rank_fusion_prefers_agreement() -> None:
+    def hits(*ids: str) -> list[SearchHit]:
+        return [SearchHit(id=item_id, score=1.0, text=item_id) for item_id in ids]
+
+    fused = reciprocal_rank_fusion([hits("a", "b", "c"), hits("b", "d", "e")], k=3)
+
+    assert [hit.id for hit in fused] == ["b", "a", "d"]
@@ -0,0 +1,44 @@
+from src.cache import LRUCache
+
+
+def test_lru_evicts_least_recently_used() -> None:
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert (cache.stats.hits, cache.stats.misses) == (3, 1)
+
+
+def test_lru_expires_entries(monkeypatch) -> None:
+    now = [100.0]
+    monkeypatch.setattr("src.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(ttl=10)
+    cache.set("a", 1)
+
+    now[0] = 109.0
+    assert cache.get("a") == 1
+    now[0] = 111.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_fill_is_dropped_after_concurrent_delete() -> None:
+    cache = LRUCache(maxsize=2)
+    generation = cache.generation("a")
+    cache.delete("a")
+    assert not cache.set_if_unchanged("a", 1, generation)
+
+    generation = cache.generation("a")
+    assert cache.set_if_unchanged("a", 2, generation)
+    assert cache.get("a") == 2
+
+    # Deletes of keys no longer tracked individually still drop older fills
+    cache.delete("b")
+    cache.delete("c")
+    cache.delete("d")
+    assert not cache.set_if_unchanged("b", 3, generation)
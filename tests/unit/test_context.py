@@ -0,0 +1,81 @@
+from src.conversation import Conversation
+from src.graphs import registry
+from src.graphs.context import SUMMARY_PROMPT, manage_context, message_tokens
+from src.graphs.simple_generation_graph import MODEL_NAME
+from src.user_profile import UserProfile
+
+
+class FakeModel:
+    def __init__(self) -> None:
+        self.prompts: list[list[dict[str, str]]] = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages)
+        if messages[0]["content"] == SUMMARY_PROMPT:
+            content = f"summary#{sum(1 for p in self.prompts if p[0]['content'] == SUMMARY_PROMPT)}"
+        else:
+            content = "x" * 40
+
+        class Response:
+            pass
+
+        response = Response()
+        response.content = content
+        return response
+
+    def summary_prompts(self) -> list[list[dict[str, str]]]:
+        return [p for p in self.prompts if p[0]["content"] == SUMMARY_PROMPT]
+
+
+def _messages(count: int) -> list[dict[str, str]]:
+    return [{"role": "user", "content": "y" * 40} for _ in range(count)]
+
+
+def test_under_budget_keeps_everything(monkeypatch) -> None:
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGET", "1000")
+    messages = _messages(3)
+
+    result = manage_context({"messages": messages, "user_profile": {}})
+
+    assert result == {"summary": "", "summarized": 0, "context": messages}
+
+
+def test_over_budget_folds_oldest(monkeypatch) -> None:
+    per_message = message_tokens(_messages(1)[0])
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGET", str(per_message * 4))
+    model = FakeModel()
+    registry.set_chat_model(MODEL_NAME, model)
+    messages = _messages(6)
+
+    result = manage_context({"messages": messages, "user_profile": {}, "summary": "before"})
+    registry.reload()
+
+    assert result["summarized"] == 4
+    assert result["summary"] == "summary#1"
+    assert result["context"][0]["role"] == "system"
+    assert result["context"][1:] == messages[4:]
+    assert "before" in model.prompts[0][1]["content"]
+
+
+def test_conversation_persists_incremental_summary(db_engine, monkeypatch) -> None:
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGET", "80")
+    model = FakeModel()
+    registry.set_chat_model(MODEL_NAME, model)
+    conversation_id = Conversation(user_id=UserProfile(name="Ada").save()).save()
+
+    for turn in range(6):
+        Conversation.load(conversation_id).invoke(f"question {turn} " + "y" * 40)
+    registry.reload()
+
+    summary = Conversation.load(conversation_id).data["summary"]
+    summary_prompts = model.summary_prompts()
+    assert summary["text"] == f"summary#{len(summary_prompts)}"
+    assert 0 < summary["upto"] < 12
+    # Each summarization only sees messages evicted since the previous one
+    assert len(summary_prompts) < 6
+    assert summary_prompts[0][1]["content"].count("question 0") == 1
+    assert all("question 0" not in p[1]["content"] for p in summary_prompts[1:])
+    # Every generation prompt stays within the budget apart from the summary itself
+    generation_prompts = [p for p in model.prompts if p[0]["content"] != SUMMARY_PROMPT]
+    for prompt in generation_prompts:
+        assert sum(message_tokens(m) for m in prompt if m["role"] != "system") <= 80
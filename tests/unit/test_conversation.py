@@ -0,0 +1,386 @@
+from sqlalchemy import select
+
+from src.conversation import Conversation
+from src.database.migrations import MIGRATIONS, run_migrations
+from src.database.models import conversations, messages, schema_migrations
+from src.user_profile import UserProfile
+
+
+def _message(role: str, content: str) -> dict[str, str]:
+    return {"role": role, "content": content, "timestamp": "2026-01-01T00:00:00"}
+
+
+def test_save_appends_only_new_messages(db_engine) -> None:
+    user_id = UserProfile(name="Ada").save()
+    conversation = Conversation(user_id=user_id)
+    conversation.data["messages"].append(_message("user", "hi"))
+    conversation_id = conversation.save()
+
+    conversation.data["messages"].append(_message("assistant", "hello"))
+    conversation.save()
+
+    with db_engine.connect() as conn:
+        rows = conn.execute(
+            select(messages.c.seq, messages.c.content)
+            .where(messages.c.conversation_id == conversation_id)
+            .order_by(messages.c.seq)
+        ).all()
+        data = conn.execute(
+            select(conversations.c.data).where(conversations.c.id == conversation_id)
+        ).scalar_one()
+
+    assert [(row.seq, row.content) for row in rows] == [(0, "hi"), (1, "hello")]
+    assert "messages" not in data
+
+
+def test_invoke_inserts_two_rows(db_engine, monkeypatch) -> None:
+    from src.graphs.simple_generation_graph import SimpleGenerationGraph
+
+    monkeypatch.setattr(SimpleGenerationGraph, "invoke", lambda self, m, p, memory=None: "pong")
+
+    user_id = UserProfile(name="Ada").save()
+    conversation = Conversation(user_id=user_id)
+    conversation_id = conversation.save()
+
+    conversation.invoke("ping")
+    Conversation.load(conversation_id).invoke("again")
+
+    loaded = Conversation.load(conversation_id)
+    assert [msg["content"] for msg in loaded.data["messages"]] == [
+        "ping",
+        "pong",
+        "again",
+        "pong",
+    ]
+    assert loaded.persisted_messages == 4
+
+
+def test_load_moves_legacy_message_blob(db_engine) -> None:
+    user_id = UserProfile(name="Ada").save()
+    legacy = [_message("user", "old"), _message("assistant", "reply")]
+    with db_engine.begin() as conn:
+        conversation_id = conn.execute(
+            conversations.insert().values(user_id=user_id, data={"messages": legacy})
+        ).inserted_primary_key[0]
+
+    loaded = Conversation.load(conversation_id)
+
+    assert loaded.data["messages"] == legacy
+    with db_engine.connect() as conn:
+        data = conn.execute(
+            select(conversations.c.data).where(conversations.c.id == conversation_id)
+        ).scalar_one()
+    assert "messages" not in data
+
+
+def test_run_migrations_moves_blobs_once(db_engine) -> None:
+    user_id = UserProfile(name="Ada").save()
+    with db_engine.begin() as conn:
+        conn.execute(schema_migrations.delete())
+        conn.execute(
+            conversations.insert().values(
+                user_id=user_id, data={"messages": [_message("user", "old")]}
+            )
+        )
+
+    applied = run_migrations(db_engine)
+
+    assert applied == [name for name, _ in MIGRATIONS]
+    assert run_migrations(db_engine) == []
+    with db_engine.connect() as conn:
+        count = len(conn.execute(select(messages.c.seq)).all())
+    assert count == 1
+
+
+def test_run_migrations_on_current_schema_only_checks(db_engine) -> None:
+    from sqlalchemy import event, inspect
+
+    from src.database.models import jobs
+
+    statements = []
+    event.listen(db_engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+    assert run_migrations(db_engine) == []
+    assert len(statements) == 2
+
+    jobs.drop(db_engine)
+    assert run_migrations(db_engine) == []
+    assert inspect(db_engine).has_table("jobs")
+
+
+def _conversation_with(count: int) -> int:
+    user_id = UserProfile(name="Ada").save()
+    conversation = Conversation(user_id=user_id)
+    conversation.data["messages"].extend(_message("user", str(i)) for i in range(count))
+    return conversation.save()
+
+
+def test_load_windows(db_engine) -> None:
+    conversation_id = _conversation_with(10)
+
+    tail = Conversation.load(conversation_id, limit=3)
+    assert [msg["content"] for msg in tail.data["messages"]] == ["7", "8", "9"]
+    assert tail.message_offset == 7
+
+    older = Conversation.load(conversation_id, limit=3, before=tail.message_offset)
+    assert [msg["content"] for msg in older.data["messages"]] == ["4", "5", "6"]
+    assert older.message_offset == 4
+
+    newer = Conversation.load(conversation_id, limit=2, after=4)
+    assert [msg["content"] for msg in newer.data["messages"]] == ["5", "6"]
+    assert newer.message_offset == 5
+
+
+def test_save_after_tail_load_continues_seq(db_engine) -> None:
+    conversation_id = _conversation_with(5)
+
+    tail = Conversation.load(conversation_id, limit=2)
+    tail.data["messages"].append(_message("user", "new"))
+    tail.save()
+
+    with db_engine.connect() as conn:
+        seqs = conn.execute(
+            select(messages.c.seq).where(messages.c.content == "new")
+        ).scalars().all()
+    assert seqs == [5]
+
+
+def test_save_after_empty_window_continues_seq(db_engine) -> None:
+    conversation_id = _conversation_with(5)
+
+    past_end = Conversation.load(conversation_id, after=99)
+    assert past_end.data["messages"] == []
+    assert past_end.message_offset == 5
+    past_end.data["messages"].append(_message("user", "new"))
+    past_end.save()
+
+    with db_engine.connect() as conn:
+        seqs = conn.execute(
+            select(messages.c.seq).where(messages.c.conversation_id == conversation_id)
+        ).scalars().all()
+    assert sorted(seqs) == [0, 1, 2, 3, 4, 5]
+
+
+def test_save_maintains_summary(db_engine) -> None:
+    conversation_id = _conversation_with(3)
+
+    with db_engine.connect() as conn:
+        row = conn.execute(
+            select(conversations.c.last_message, conversations.c.message_count).where(
+                conversations.c.id == conversation_id
+            )
+        ).one()
+
+    assert row.message_count == 3
+    assert row.last_message["content"] == "2"
+
+
+def test_save_of_earlier_window_keeps_summary(db_engine) -> None:
+    conversation_id = _conversation_with(10)
+    window = Conversation.load(conversation_id, limit=3, before=3)
+    window.data["topic"] = "x"
+    window.save()
+
+    with db_engine.connect() as conn:
+        row = conn.execute(
+            select(conversations.c.last_message, conversations.c.message_count).where(
+                conversations.c.id == conversation_id
+            )
+        ).one()
+
+    assert row.message_count == 10
+    assert row.last_message["content"] == "9"
+    assert Conversation.load(conversation_id).data["topic"] == "x"
+
+
+def test_migration_adds_summary_to_old_schema(tmp_path) -> None:
+    from sqlalchemy import create_engine, inspect, text
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE user_profiles (id INTEGER PRIMARY KEY, data JSON NOT NULL)"))
+        conn.execute(
+            text(
+                "CREATE TABLE conversations (id INTEGER PRIMARY KEY, "
+                "user_id INTEGER NOT NULL REFERENCES user_profiles(id), data JSON NOT NULL)"
+            )
+        )
+        conn.execute(text("INSERT INTO user_profiles (id, data) VALUES (1, '{\"name\": \"Ada\"}')"))
+        conn.execute(
+            text("INSERT INTO conversations (id, user_id, data) VALUES (1, 1, :data)"),
+            {"data": '{"messages": [{"role": "user", "content": "old", "timestamp": "2025-01-01T00:00:00"}]}'},
+        )
+
+    run_migrations(engine)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("conversations")}
+    assert {"last_message", "message_count", "updated_at", "version"} <= columns
+    indexes = {index["name"] for index in inspect(engine).get_indexes("conversations")}
+    assert {"ix_conversations_user_id_id", "ix_conversations_user_id_updated_at"} <= indexes
+    with engine.connect() as conn:
+        row = conn.execute(
+            select(conversations.c.last_message, conversations.c.message_count)
+        ).one()
+    assert row.message_count == 1
+    assert row.last_message["content"] == "old"
+    engine.dispose()
+
+
+def test_ainvoke_round_trip(db_engine, monkeypatch) -> None:
+    import asyncio
+
+    from src.graphs.simple_generation_graph import SimpleGenerationGraph
+
+    async def fake_ainvoke(self, messages, user_profile, memory=None):
+        return f"echo {messages[-1]['content']} for {user_profile['name']}"
+
+    monkeypatch.setattr(SimpleGenerationGraph, "ainvoke", fake_ainvoke)
+    conversation_id = Conversation(user_id=UserProfile(name="Ada").save()).save()
+
+    async def scenario() -> str:
+        conversation = await Conversation.aload(conversation_id)
+        return await conversation.ainvoke("hi")
+
+    assert asyncio.run(scenario()) == "echo hi for Ada"
+    loaded = Conversation.load(conversation_id)
+    assert [msg["role"] for msg in loaded.data["messages"]] == ["user", "assistant"]
+
+
+def test_interrupted_astream_drops_user_message(db_engine, monkeypatch) -> None:
+    import asyncio
+
+    from src.graphs.simple_generation_graph import SimpleGenerationGraph
+
+    async def fake_astream(self, messages, user_profile, memory=None):
+        yield "partial"
+        if messages[-1]["content"] == "fail":
+            raise RuntimeError("model down")
+        yield " reply"
+
+    monkeypatch.setattr(SimpleGenerationGraph, "astream", fake_astream)
+    conversation_id = Conversation(user_id=UserProfile(name="Ada").save()).save()
+
+    async def scenario() -> Conversation:
+        conversation = await Conversation.aload(conversation_id)
+        try:
+            async for _ in conversation.astream("fail"):
+                pass
+        except RuntimeError:
+            pass
+        # A client disconnect closes the stream after the first chunk
+        stream = conversation.astream("disconnect")
+        await stream.__anext__()
+        await stream.aclose()
+        return conversation
+
+    conversation = asyncio.run(scenario())
+    assert conversation.data["messages"] == []
+    assert Conversation.load(conversation_id).data["messages"] == []
+
+
+def test_concurrent_saves_merge_appended_turns(db_engine) -> None:
+    conversation_id = Conversation(user_id=UserProfile(name="Ada").save()).save()
+    first = Conversation.load(conversation_id)
+    second = Conversation.load(conversation_id)
+
+    first.data["messages"] += [_message("user", "a"), _message("assistant", "A")]
+    first.save()
+    second.data["messages"] += [_message("user", "b"), _message("assistant", "B")]
+    second.save()
+
+    assert [msg["content"] for msg in second.data["messages"]] == ["a", "A", "b", "B"]
+    loaded = Conversation.load(conversation_id)
+    assert [msg["content"] for msg in loaded.data["messages"]] == ["a", "A", "b", "B"]
+    assert loaded.version == second.version == 2
+    with db_engine.connect() as conn:
+        row = conn.execute(
+            select(conversations.c.message_count, conversations.c.last_message)
+        ).one()
+    assert row.message_count == 4
+    assert row.last_message["content"] == "B"
+
+
+def test_concurrent_save_keeps_both_metadata_changes(db_engine) -> None:
+    conversation = Conversation(user_id=UserProfile(name="Ada").save(), data={"title": "t"})
+    conversation_id = conversation.save()
+    first = Conversation.load(conversation_id)
+    second = Conversation.load(conversation_id)
+
+    first.data["title"] = "renamed"
+    first.save()
+    second.data["pinned"] = True
+    second.save()
+
+    loaded = Conversation.load(conversation_id)
+    assert loaded.data["title"] == "renamed"
+    assert loaded.data["pinned"] is True
+
+
+def test_save_renumbers_after_unversioned_append(db_engine) -> None:
+    conversation_id = Conversation(user_id=UserProfile(name="Ada").save()).save()
+    conversation = Conversation.load(conversation_id)
+    # A writer that does not bump the version, e.g. an older release
+    with db_engine.begin() as conn:
+        conn.execute(
+            messages.insert().values(conversation_id=conversation_id, seq=0, **_message("user", "x"))
+        )
+
+    conversation.data["messages"].append(_message("user", "y"))
+    conversation.save()
+
+    loaded = Conversation.load(conversation_id)
+    assert [msg["content"] for msg in loaded.data["messages"]] == ["x", "y"]
+
+
+def test_concurrent_ainvoke_on_one_conversation(db_engine, monkeypatch) -> None:
+    import asyncio
+
+    from src.graphs.simple_generation_graph import SimpleGenerationGraph
+
+    async def slow_ainvoke(self, messages, user_profile, memory=None):
+        await asyncio.sleep(0.01)
+        return f"re {messages[-1]['content']}"
+
+    monkeypatch.setattr(SimpleGenerationGraph, "ainvoke", slow_ainvoke)
+    conversation_id = Conversation(user_id=UserProfile(name="Ada").save()).save()
+
+    async def turn(content: str) -> str:
+        conversation = await Conversation.aload(conversation_id)
+        return await conversation.ainvoke(content)
+
+    async def scenario() -> list[str]:
+        return await asyncio.gather(*(turn(str(i)) for i in range(5)))
+
+    assert asyncio.run(scenario()) == [f"re {i}" for i in range(5)]
+    contents = [msg["content"] for msg in Conversation.load(conversation_id).data["messages"]]
+    assert len(contents) == 10
+    for i in range(5):
+        assert contents.index(f"re {i}") == contents.index(str(i)) + 1
+
+
+def test_concurrent_aloads_share_one_read(db_engine, monkeypatch) -> None:
+    import asyncio
+
+    conversation = Conversation(user_id=UserProfile(name="Ada").save(), data={"topic": "x"})
+    conversation._append("user", "hi")
+    conversation_id = conversation.save()
+
+    reads = []
+    original = Conversation._read.__func__
+
+    def counting_read(cls, conn, *args):
+        reads.append(args)
+        return original(cls, conn, *args)
+
+    monkeypatch.setattr(Conversation, "_read", classmethod(counting_read))
+
+    async def scenario():
+        return await asyncio.gather(*(Conversation.aload(conversation_id) for _ in range(5)))
+
+    loaded = asyncio.run(scenario())
+
+    assert len(reads) == 1
+    assert all(item == loaded[0] for item in loaded)
+    loaded[0]._append("assistant", "hello")
+    loaded[0].data["topic"] = "y"
+    assert len(loaded[1].data["messages"]) == 1
+    assert loaded[1].data["topic"] == "x"
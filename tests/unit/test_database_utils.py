@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool, QueuePool
+
+from src.database.utils import create_new_engine, get_pool_profile, to_async_url
+
+
+def test_pool_profile_env_overrides(monkeypatch) -> None:
+    monkeypatch.setenv("DB_POOL_PROFILE", "small")
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+
+    profile = get_pool_profile()
+
+    assert profile is not None
+    assert (profile.pool_size, profile.max_overflow) == (3, 5)
+
+
+def test_unknown_pool_profile(monkeypatch) -> None:
+    monkeypatch.setenv("DB_POOL_PROFILE", "huge")
+
+    with pytest.raises(ValueError, match="Unknown DB_POOL_PROFILE"):
+        get_pool_profile()
+
+
+def test_sqlite_engine_pooling_and_pragmas(tmp_path, monkeypatch) -> None:
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    monkeypatch.setenv("DB_POOL_PROFILE", "large")
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "1234")
+
+    engine = create_new_engine(url)
+    with engine.connect() as conn:
+        journal_mode = conn.execute(text("PRAGMA journal_mode")).scalar_one()
+        busy_timeout = conn.execute(text("PRAGMA busy_timeout")).scalar_one()
+        synchronous = conn.execute(text("PRAGMA synchronous")).scalar_one()
+
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 40
+    assert journal_mode == "wal"
+    assert busy_timeout == 1234
+    assert synchronous == 1  # NORMAL
+    engine.dispose()
+
+    monkeypatch.setenv("DB_POOL_PROFILE", "none")
+    engine = create_new_engine(url)
+    assert isinstance(engine.pool, NullPool)
+    engine.dispose()
+
+
+def test_to_async_url() -> None:
+    assert to_async_url("sqlite:///./local.db") == "sqlite+aiosqlite:///./local.db"
+    assert to_async_url("postgresql://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+    assert to_async_url("postgresql+psycopg://db/app") == "postgresql+psycopg://db/app"
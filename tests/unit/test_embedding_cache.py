@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from src.retrieval.embedding_cache import CachedEmbedder
+from src.retrieval.embeddings import HashingEmbedder, get_embedder, set_embedder
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self) -> None:
+        super().__init__(dim=32)
+        self.calls: list[list[str]] = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return super().embed(texts)
+
+
+@pytest.fixture()
+def inner(db_engine) -> CountingEmbedder:
+    return CountingEmbedder()
+
+
+def test_batch_sends_only_distinct_misses(inner) -> None:
+    cached = CachedEmbedder(inner)
+
+    first = cached.embed(["alpha", "beta", "alpha"])
+    second = cached.embed(["beta", "gamma", "alpha"])
+
+    assert inner.calls == [["alpha", "beta"], ["gamma"]]
+    np.testing.assert_allclose(first, inner.embed(["alpha", "beta", "alpha"]))
+    np.testing.assert_allclose(second, inner.embed(["beta", "gamma", "alpha"]))
+    assert (cached.stats.memory_hits, cached.stats.misses) == (2, 3)
+
+
+def test_database_tier_survives_a_new_process_cache(inner) -> None:
+    CachedEmbedder(inner).embed(["alpha", "beta"])
+
+    fresh = CachedEmbedder(inner)
+    vectors = fresh.embed(["beta", "alpha", "delta"])
+
+    assert inner.calls == [["alpha", "beta"], ["delta"]]
+    assert (fresh.stats.db_hits, fresh.stats.misses) == (2, 1)
+    np.testing.assert_allclose(vectors[1], HashingEmbedder(dim=32).embed(["alpha"])[0])
+
+
+def test_aembed_shares_both_tiers_with_embed(inner) -> None:
+    import asyncio
+
+    CachedEmbedder(inner).embed(["alpha"])
+    fresh = CachedEmbedder(inner)
+
+    vectors = asyncio.run(fresh.aembed(["alpha", "beta"]))
+
+    assert inner.calls == [["alpha"], ["beta"]]
+    assert (fresh.stats.db_hits, fresh.stats.misses) == (1, 1)
+    np.testing.assert_allclose(vectors, HashingEmbedder(dim=32).embed(["alpha", "beta"]))
+    assert CachedEmbedder(inner).embed(["beta"]).shape == (1, 32)
+    assert inner.calls == [["alpha"], ["beta"]]
+
+
+def test_entries_are_per_model(inner) -> None:
+    CachedEmbedder(inner).embed(["alpha"])
+    other = CountingEmbedder()
+    other.model = "other-model"
+
+    CachedEmbedder(other).embed(["alpha"])
+
+    assert other.calls == [["alpha"]]
+
+
+def test_get_embedder_wraps_when_enabled(monkeypatch) -> None:
+    monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "1")
+    set_embedder(None)
+    try:
+        assert isinstance(get_embedder(), CachedEmbedder)
+    finally:
+        set_embedder(None)
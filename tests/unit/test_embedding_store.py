@@ -0,0 +1,70 @@
+import numpy as np
+
+from src.retrieval.embedding_store import MAX_SEGMENTS, EmbeddingStore
+from src.retrieval.vector_index import VectorIndex
+
+
+def _rows(start: int, count: int, dim: int = 16) -> tuple[list[str], np.ndarray, list[str]]:
+    rng = np.random.default_rng(start)
+    ids = [str(i) for i in range(start, start + count)]
+    return ids, rng.normal(size=(count, dim)).astype(np.float32), [f"text {i}" for i in ids]
+
+
+def _ids(hits) -> list[str]:
+    return [hit.id for hit in hits]
+
+
+def test_store_matches_in_memory_index_and_persists(tmp_path) -> None:
+    store = EmbeddingStore(tmp_path, dim=16)
+    index = VectorIndex(dim=16)
+    for start in (0, 100):
+        ids, vectors, texts = _rows(start, 100)
+        metadata = [{"source": f"doc-{i}"} for i in ids]
+        store.add(ids, vectors, texts, metadata)
+        index.add(ids, vectors, texts, metadata)
+    queries = np.random.default_rng(7).normal(size=(5, 16))
+
+    expected = index.search(queries, k=5)
+    assert [_ids(hits) for hits in store.search(queries, k=5)] == [_ids(h) for h in expected]
+
+    reopened = EmbeddingStore(tmp_path, dim=16)
+    hit = reopened.search(queries, k=5)[0][0]
+    assert len(reopened) == 200
+    assert (hit.id, hit.text, hit.metadata) == (
+        expected[0][0].id,
+        expected[0][0].text,
+        expected[0][0].metadata,
+    )
+    assert isinstance(reopened._segments[0].vectors, np.memmap)
+
+
+def test_remove_upsert_and_compact(tmp_path) -> None:
+    store = EmbeddingStore(tmp_path, dim=16)
+    ids, vectors, texts = _rows(0, 50)
+    store.add(ids, vectors, texts)
+
+    assert store.remove(["3", "4", "missing"]) == 2
+    store.add(["5"], vectors[0], ["moved"])
+    assert len(store) == 48 and "3" not in store and "5" in store
+    assert store.search(vectors[0], k=2)[0][0].text in ("moved", "text 0")
+
+    reader = EmbeddingStore(tmp_path, dim=16)
+    store.compact()
+
+    assert len(store._segments) == 1
+    assert len(list(tmp_path.glob("*.vectors.npy"))) == 1
+    for opened in (store, reader, EmbeddingStore(tmp_path, dim=16)):
+        assert len(opened) == 48
+        assert "3" not in _ids(opened.search(vectors[3], k=48)[0])
+
+
+def test_many_segments_compact_in_background(tmp_path) -> None:
+    store = EmbeddingStore(tmp_path, dim=16)
+    for start in range(0, (MAX_SEGMENTS + 1) * 10, 10):
+        store.add(*_rows(start, 10))
+
+    thread = store.compact_in_background()
+    thread.join(timeout=10)
+
+    assert len(store._segments) == 1
+    assert len(store) == (MAX_SEGMENTS + 1) * 10
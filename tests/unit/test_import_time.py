@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+from tests.conftest import ROOT
+
+# Imported lazily by the first generation or by warmup, not by the server module;
+# `benchmarks/bench_import_time.py` measures what that saves
+DEFERRED = (
+    "langgraph",
+    "langchain_core",
+    "langchain_openai",
+    "openai",
+    "src.graphs.simple_generation_graph",
+    "src.retrieval.ivf_index",
+    "src.retrieval.embedding_store",
+)
+
+PROBE = """
+import sys
+import src.api_server
+print(",".join(name for name in sys.argv[1:] if name in sys.modules))
+"""
+
+
+def test_api_server_import_defers_generation_stack() -> None:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, *DEFERRED], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+
+    assert output.strip() == ""
@@ -0,0 +1,99 @@
+from sqlalchemy import func, select
+
+from src.database.models import chunks, documents
+from src.retrieval.embeddings import HashingEmbedder
+from src.retrieval.ingestion import ingest, load_index, split_text
+from src.retrieval.vector_index import VectorIndex
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self) -> None:
+        super().__init__(dim=256)
+        self.calls: list[int] = []
+
+    def embed(self, texts):
+        self.calls.append(len(texts))
+        return super().embed(texts)
+
+
+def _words(prefix: str, count: int) -> str:
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+def test_split_text_respects_size_and_overlap() -> None:
+    text = _words("w", 200)
+
+    parts = split_text(text, size=100, overlap=20)
+
+    assert all(len(part) <= 100 for part in parts)
+    assert parts[0].split()[0] == "w0" and parts[-1].split()[-1] == "w199"
+    assert parts[1].split()[0] in parts[0].split()
+    assert split_text("   ") == []
+
+
+def test_reingest_only_embeds_changes(db_engine, tmp_path) -> None:
+    root = tmp_path / "docs"
+    root.mkdir()
+    (root / "a.md").write_text(_words("alpha", 400))
+    (root / "b.txt").write_text(_words("beta", 50))
+    (root / "ignored.bin").write_text("binary")
+    embedder = CountingEmbedder()
+    index = VectorIndex(embedder.dim)
+
+    first = ingest(root, engine=db_engine, embedder=embedder, index=index, batch_size=2)
+
+    assert first.documents_seen == 2
+    assert first.chunks_embedded == len(index) > 2
+    assert max(embedder.calls) == 2
+
+    embedder.calls.clear()
+    assert ingest(root, engine=db_engine, embedder=embedder, index=index).documents_skipped == 2
+    assert embedder.calls == []
+
+    (root / "a.md").write_text(_words("alpha", 400) + " omega")
+    (root / "b.txt").unlink()
+    third = ingest(root, engine=db_engine, embedder=embedder, index=index)
+
+    assert third.chunks_embedded == 1
+    assert third.chunks_reused == first.chunks_embedded - 2
+    assert third.documents_deleted == 1
+    with db_engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(documents)).scalar_one() == 1
+        stored = conn.execute(select(func.count()).select_from(chunks)).scalar_one()
+    assert stored == len(index)
+
+    hits = index.search(embedder.embed(["omega alpha399"]), k=1)[0]
+    assert "omega" in hits[0].text
+
+    rebuilt = VectorIndex(embedder.dim)
+    assert load_index(engine=db_engine, embedder=embedder, index=rebuilt) == stored
+    assert sorted(rebuilt.search(embedder.embed(["beta1"]), k=stored)[0], key=lambda h: h.id) == (
+        sorted(index.search(embedder.embed(["beta1"]), k=stored)[0], key=lambda h: h.id)
+    )
+
+
+def test_reload_indexes_picks_up_another_process_ingest(db_engine, tmp_path, monkeypatch) -> None:
+    from src.retrieval.bm25 import get_bm25_index, set_bm25_index
+    from src.retrieval.ingestion import reload_indexes
+    from src.retrieval.vector_index import get_vector_index, set_vector_index
+
+    monkeypatch.delenv("EMBEDDING_STORE_DIR", raising=False)
+    root = tmp_path / "docs"
+    root.mkdir()
+    (root / "a.md").write_text(_words("alpha", 50))
+    set_vector_index(None)
+    set_bm25_index(None)
+    try:
+        stale = get_vector_index()
+        # As `doit ingest` would: the tables change, this process's indexes do not
+        ingest(root, engine=db_engine, index=VectorIndex(stale.dim))
+        assert len(stale) == 0
+
+        reload_indexes(engine=db_engine, lexical=True)
+
+        assert get_vector_index() is not stale
+        assert len(get_vector_index()) > 0
+        assert get_bm25_index().search("alpha3", 1)
+    finally:
+        set_vector_index(None)
+        set_bm25_index(None)
@@ -0,0 +1,83 @@
+import numpy as np
+
+from src.retrieval.ivf_index import IVFIndex, kmeans
+from src.retrieval.vector_index import VectorIndex, normalize
+
+
+def _clustered(count: int, dim: int = 32, clusters: int = 20, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(clusters, size=count)
+    return (centers[labels] + 0.3 * rng.normal(size=(count, dim))).astype(np.float32)
+
+
+def test_kmeans_returns_unit_centroids() -> None:
+    centroids = kmeans(normalize(_clustered(2000)), 20)
+
+    assert centroids.shape == (20, 32)
+    np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1.0, rtol=1e-5)
+
+
+def test_ivf_recall_against_exact_search() -> None:
+    vectors = _clustered(5000)
+    ids = [str(i) for i in range(len(vectors))]
+    queries = _clustered(50, seed=1)
+    exact = VectorIndex(dim=32)
+    exact.add(ids, vectors, ids)
+    ivf = IVFIndex(dim=32, nlist=32, nprobe=4)
+    ivf.add(ids, vectors, ids)
+
+    assert ivf.trained
+    expected = [{hit.id for hit in hits} for hits in exact.search(queries, k=10)]
+    found = [{hit.id for hit in hits} for hits in ivf.search(queries, k=10)]
+    recall = np.mean([len(e & f) / 10 for e, f in zip(expected, found)])
+    assert recall >= 0.9
+    exhaustive = [{hit.id for hit in hits} for hits in ivf.search(queries, k=10, nprobe=32)]
+    assert exhaustive == expected
+
+
+def test_ivf_upsert_and_remove() -> None:
+    index = IVFIndex(dim=4)
+    index.add(["a", "b"], np.eye(2, 4), ["a", "b"])
+    index.add(["a"], np.array([[0.0, 0.0, 1.0, 0.0]]), ["a2"])
+
+    assert len(index) == 2 and not index.trained
+    assert index.search(np.array([0.0, 0.0, 1.0, 0.0]), k=1)[0][0].text == "a2"
+    assert index.remove(["a", "missing"]) == 1
+    assert [hit.id for hit in index.search(np.ones(4), k=5)[0]] == ["b"]
+
+
+def test_training_does_not_block_searches_or_writes(monkeypatch) -> None:
+    import threading
+
+    import src.retrieval.ivf_index as ivf_index
+
+    vectors = _clustered(2000)
+    ids = [str(i) for i in range(len(vectors))]
+    index = IVFIndex(dim=32, nlist=16, nprobe=16)
+    index.add(ids, vectors, ids)
+    started, resume = threading.Event(), threading.Event()
+
+    def slow_kmeans(*args, **kwargs):
+        started.set()
+        assert resume.wait(5)
+        return kmeans(*args, **kwargs)
+
+    monkeypatch.setattr(ivf_index, "kmeans", slow_kmeans)
+    training = threading.Thread(target=index.train)
+    training.start()
+    assert started.wait(5)
+
+    # While k-means runs: search, add a row, replace one and remove another
+    assert index.search(vectors[:1], k=1)[0][0].id == "0"
+    index.add(["new", "1"], vectors[[5, 6]], ["new", "one moved"])
+    index.remove(["2"])
+    resume.set()
+    training.join(5)
+
+    assert index.trained and not training.is_alive()
+    assert len(index) == 2000
+    assert "2" not in index
+    assert index.search(vectors[5:6], k=2)[0][0].id in {"5", "new"}
+    assert index.search(vectors[6:7], k=2)[0][0].id in {"6", "1"}
+    assert {hit.text for hit in index.search(vectors[6:7], k=2)[0]} == {"6", "one moved"}
@@ -0,0 +1,139 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, update
+
+from src import jobs
+from src.conversation import Conversation
+from src.database.models import jobs as jobs_table
+from src.user_profile import UserProfile
+
+
+def _conversation() -> int:
+    return Conversation(user_id=UserProfile(name="Ada").save()).save()
+
+
+def _claim(worker: str):
+    from src.database.utils import get_engine
+
+    with get_engine().begin() as conn:
+        return jobs._claim(conn, worker)
+
+
+def test_jobs_are_opt_in(monkeypatch) -> None:
+    monkeypatch.delenv("JOB_WORKERS", raising=False)
+    monkeypatch.delenv("JOB_EXTERNAL_WORKERS", raising=False)
+    assert not jobs.jobs_enabled()
+    assert jobs.start_workers() is None
+
+    monkeypatch.setenv("JOB_EXTERNAL_WORKERS", "1")
+    assert jobs.jobs_enabled()
+
+
+def test_jobs_are_claimed_once_in_order(db_engine) -> None:
+    conversation_id = _conversation()
+    first = asyncio.run(jobs.enqueue(conversation_id, "one"))
+    second = asyncio.run(jobs.enqueue(conversation_id, "two"))
+
+    claimed = [_claim("a"), _claim("b"), _claim("c")]
+
+    assert [job.id if job else None for job in claimed] == [first, second, None]
+    assert claimed[0].status == "running"
+    assert claimed[0].attempts == 1
+
+
+def test_claim_lost_to_another_worker_moves_on(db_engine) -> None:
+    conversation_id = _conversation()
+    first = asyncio.run(jobs.enqueue(conversation_id, "one"))
+    second = asyncio.run(jobs.enqueue(conversation_id, "two"))
+    raced = []
+
+    @event.listens_for(db_engine, "before_cursor_execute")
+    def claim_first_elsewhere(conn, cursor, statement, parameters, context, executemany):
+        # Another worker claims the selected job just before this one updates it
+        if statement.startswith("UPDATE jobs SET status") and "RETURNING" in statement and not raced:
+            raced.append(True)
+            cursor.execute(
+                "UPDATE jobs SET status = 'running', attempts = 1,"
+                " lease_expires_at = '9999-01-01 00:00:00.000000' WHERE id = ?",
+                (first,),
+            )
+
+    try:
+        claimed = _claim("a")
+    finally:
+        event.remove(db_engine, "before_cursor_execute", claim_first_elsewhere)
+
+    assert raced
+    assert claimed.id == second
+    assert asyncio.run(jobs.get_job(first)).attempts == 1
+
+
+def test_expired_lease_is_reclaimed_then_abandoned(db_engine, monkeypatch) -> None:
+    monkeypatch.setenv("JOB_MAX_ATTEMPTS", "2")
+    job_id = asyncio.run(jobs.enqueue(_conversation(), "hello"))
+
+    def expire() -> None:
+        with db_engine.begin() as conn:
+            conn.execute(
+                update(jobs_table).values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+            )
+
+    assert _claim("a").id == job_id
+    assert _claim("b") is None
+    expire()
+    assert _claim("b").attempts == 2
+    expire()
+    assert _claim("c") is None
+
+    job = asyncio.run(jobs.get_job(job_id))
+    assert job.status == "failed"
+    assert job.error == "Abandoned after 2 attempts"
+
+
+def test_worker_runs_job_and_records_reply(db_engine, monkeypatch) -> None:
+    from src.graphs.simple_generation_graph import SimpleGenerationGraph
+
+    async def fake_ainvoke(self, messages, user_profile, memory=None):
+        return "pong"
+
+    monkeypatch.setattr(SimpleGenerationGraph, "ainvoke", fake_ainvoke)
+    conversation_id = _conversation()
+
+    async def scenario():
+        job_id = await jobs.enqueue(conversation_id, "ping")
+        pool = jobs.JobWorkerPool(workers=1)
+        assert await pool.run_once("test")
+        assert not await pool.run_once("test")
+        return await jobs.wait_for_job(job_id, timeout=0)
+
+    job = asyncio.run(scenario())
+    assert job.status == "succeeded"
+    assert job.result["content"] == "pong"
+    assert job.result["seq"] == 1
+    assert [msg["content"] for msg in Conversation.load(conversation_id).data["messages"]] == [
+        "ping",
+        "pong",
+    ]
+
+
+def test_waiters_are_woken_after_another_waiter_times_out(db_engine, monkeypatch) -> None:
+    from src.graphs.simple_generation_graph import SimpleGenerationGraph
+
+    async def fake_ainvoke(self, messages, user_profile, memory=None):
+        return "pong"
+
+    monkeypatch.setattr(SimpleGenerationGraph, "ainvoke", fake_ainvoke)
+    monkeypatch.setenv("JOB_POLL_INTERVAL", "30")
+    conversation_id = _conversation()
+
+    async def scenario():
+        job_id = await jobs.enqueue(conversation_id, "ping")
+        patient = asyncio.create_task(jobs.wait_for_job(job_id, timeout=20))
+        assert not (await jobs.wait_for_job(job_id, timeout=0.05)).finished
+        assert await jobs.JobWorkerPool(workers=1).run_once("test")
+        return await asyncio.wait_for(patient, timeout=5)
+
+    job = asyncio.run(scenario())
+    assert job.status == "succeeded"
+    assert not jobs._finished and not jobs._waiters
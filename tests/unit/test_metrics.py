@@ -0,0 +1,75 @@
+import pytest
+
+from src import metrics
+from src.metrics import Counter, Histogram, REGISTRY, _Metric, stage
+
+
+@pytest.fixture()
+def enabled():
+    metrics.set_metrics_enabled(True)
+    metrics.reset()
+    yield
+    metrics.set_metrics_enabled(None)
+    metrics.reset()
+
+
+def _detached(metric):
+    REGISTRY.remove(metric)
+    return metric
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    histogram = _detached(Histogram("latency_seconds", "Latency", ["route"], buckets=[0.1, 1.0]))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, "/a")
+
+    assert histogram.render().splitlines() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1.0',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3.0',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4.0',
+        'latency_seconds_sum{route="/a"} 4.25',
+        'latency_seconds_count{route="/a"} 4.0',
+    ]
+
+
+def test_counter_escapes_label_values() -> None:
+    counter = _detached(Counter("requests_total", "Requests", ["path"]))
+    counter.inc('a"b\\c')
+    counter.inc('a"b\\c', amount=2)
+
+    assert counter.render().splitlines()[-1] == 'requests_total{path="a\\"b\\\\c"} 3.0'
+    with pytest.raises(ValueError):
+        counter.inc()
+
+
+def test_incomplete_metric_cannot_be_created() -> None:
+    class Incomplete(_Metric):
+        kind = "gauge"
+
+        def clear(self) -> None:
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete", "No samples")
+    assert not any(isinstance(metric, Incomplete) for metric in REGISTRY)
+
+
+def test_stage_is_a_noop_when_disabled() -> None:
+    metrics.set_metrics_enabled(False)
+    try:
+        with stage("model_call"):
+            pass
+        assert metrics.STAGE_SECONDS.count("model_call") == 0
+    finally:
+        metrics.set_metrics_enabled(None)
+
+
+def test_stage_records_even_when_it_raises(enabled) -> None:
+    with pytest.raises(RuntimeError):
+        with stage("model_call"):
+            raise RuntimeError("boom")
+
+    assert metrics.STAGE_SECONDS.count("model_call") == 1
+    assert 'rag_stage_duration_seconds_count{stage="model_call"} 1.0' in metrics.render()
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from src.graphs import registry
+from src.graphs.rag_graph import RagGraph
+from src.graphs.retrieve import retrieve
+from src.graphs.simple_generation_graph import MODEL_NAME
+from src.retrieval.embeddings import get_embedder, set_embedder
+from src.retrieval.vector_index import VectorIndex, set_vector_index
+
+
+class RecordingModel:
+    def __init__(self) -> None:
+        self.prompts: list = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages)
+        return type("Response", (), {"content": "grounded"})()
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+
+@pytest.fixture()
+def index():
+    set_embedder(None)
+    texts = [
+        "Invoices are due within 30 days of the billing date.",
+        "The SKU-4411 router supports WPA3 and mesh networking.",
+        "Our office is closed on public holidays.",
+    ]
+    vector_index = VectorIndex(get_embedder().dim)
+    vector_index.add(["billing", "router", "office"], get_embedder().embed(texts), texts)
+    set_vector_index(vector_index)
+    yield vector_index
+    set_vector_index(None)
+    set_embedder(None)
+
+
+def test_retrieve_puts_best_chunk_first(index, monkeypatch) -> None:
+    monkeypatch.setenv("RETRIEVAL_TOP_K", "2")
+    messages = [{"role": "user", "content": "Does the SKU-4411 router support WPA3?"}]
+
+    result = retrieve({"messages": messages, "user_profile": {}})
+
+    assert [chunk["id"] for chunk in result["retrieved"]][0] == "router"
+    assert len(result["retrieved"]) == 2
+    assert result["context"][0]["role"] == "system"
+    assert "SKU-4411" in result["context"][0]["content"]
+    assert result["context"][1:] == messages
+
+
+def test_retrieve_with_empty_index_leaves_prompt_alone() -> None:
+    set_vector_index(VectorIndex(dim=8))
+    try:
+        result = retrieve({"messages": [{"role": "user", "content": "hi"}], "user_profile": {}})
+    finally:
+        set_vector_index(None)
+
+    assert result == {"retrieved": []}
+
+
+def test_rag_graph_sends_retrieved_passages_to_model(index) -> None:
+    model = RecordingModel()
+    registry.set_chat_model(MODEL_NAME, model)
+    messages = [{"role": "user", "content": "When are invoices due?"}]
+    try:
+        assert RagGraph().invoke(messages, {"name": "Ada"}) == "grounded"
+        assert asyncio.run(RagGraph().ainvoke(messages, {"name": "Ada"})) == "grounded"
+    finally:
+        registry.reload()
+
+    for prompt in model.prompts:
+        assert "30 days" in prompt[0]["content"]
+        assert prompt[-1] == messages[-1]
+
+
+def test_hybrid_retrieve_fuses_lexical_and_dense(index, monkeypatch) -> None:
+    from src.retrieval.bm25 import BM25Index, set_bm25_index
+
+    lexical = BM25Index()
+    lexical.add(["router", "billing"], ["SKU-4411 router", "Invoices are due in 30 days"])
+    set_bm25_index(lexical)
+    monkeypatch.setenv("RETRIEVAL_MODE", "hybrid")
+    monkeypatch.setenv("RETRIEVAL_TOP_K", "2")
+    try:
+        result = retrieve(
+            {"messages": [{"role": "user", "content": "sku-4411 specs"}], "user_profile": {}}
+        )
+    finally:
+        set_bm25_index(None)
+
+    assert result["retrieved"][0]["id"] == "router"
+    assert len(result["retrieved"]) == 2
+
+
+def test_aretrieve_scores_off_the_event_loop(index, monkeypatch) -> None:
+    import threading
+
+    from src.graphs import retrieve as retrieve_module
+
+    search = retrieve_module.search
+    threads = []
+
+    def recording_search(query, k, vector=None):
+        threads.append(threading.current_thread())
+        return search(query, k, vector)
+
+    monkeypatch.setattr(retrieve_module, "search", recording_search)
+    messages = [{"role": "user", "content": "Does the SKU-4411 router support WPA3?"}]
+
+    result = asyncio.run(retrieve_module.aretrieve({"messages": messages, "user_profile": {}}))
+
+    assert result["retrieved"][0]["id"] == "router"
+    assert threads and threads[0] is not threading.main_thread()
@@ -0,0 +1,35 @@
+from src.graphs import registry
+from src.graphs.simple_generation_graph import SimpleGenerationGraph
+
+
+def test_get_graph_compiles_once() -> None:
+    registry.reload()
+
+    first = registry.get_graph(SimpleGenerationGraph)
+
+    assert registry.get_graph(SimpleGenerationGraph) is first
+    registry.reload()
+    assert registry.get_graph(SimpleGenerationGraph) is not first
+
+
+def test_get_chat_model_keyed_by_config(monkeypatch) -> None:
+    created = []
+
+    def fake_init_chat_model(model, **config):
+        created.append((model, config))
+        return object()
+
+    monkeypatch.setattr(registry, "init_chat_model", fake_init_chat_model)
+    registry.reload()
+
+    default = registry.get_chat_model("m")
+    assert registry.get_chat_model("m") is default
+    warm = registry.get_chat_model("m", temperature=0.5)
+
+    assert warm is not default
+    assert created == [("m", {}), ("m", {"temperature": 0.5})]
+
+    swapped = object()
+    registry.set_chat_model("m", swapped)
+    assert registry.get_chat_model("m") is swapped
+    registry.reload()
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from src.graphs import registry
+from src.graphs.response_cache import ResponseCache, get_response_cache, reset_response_cache
+from src.graphs.simple_generation_graph import MODEL_NAME, acall_model, call_model
+
+
+class CountingModel:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def _response(self):
+        self.calls += 1
+
+        class Response:
+            content = f"answer {self.calls}"
+
+        return Response()
+
+    def invoke(self, messages):
+        return self._response()
+
+    async def ainvoke(self, messages):
+        return self._response()
+
+
+@pytest.fixture()
+def model(db_engine, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "1")
+    reset_response_cache()
+    counting = CountingModel()
+    registry.set_chat_model(MODEL_NAME, counting)
+    yield counting
+    registry.reload()
+    reset_response_cache()
+
+
+def _state(content: str, name: str = "Ada"):
+    return {"messages": [{"role": "user", "content": content}], "user_profile": {"name": name}}
+
+
+def test_disabled_by_default(monkeypatch) -> None:
+    monkeypatch.delenv("LLM_CACHE_ENABLED", raising=False)
+    reset_response_cache()
+
+    assert get_response_cache() is None
+
+
+def test_identical_prompts_hit_cache(model) -> None:
+    first = call_model(_state("What is  RAG?"))
+    second = call_model(_state("What is RAG? "))
+    other_profile = call_model(_state("What is RAG?", name="Bob"))
+
+    assert first == second == {"response": "answer 1"}
+    assert other_profile == {"response": "answer 2"}
+    stats = get_response_cache().stats
+    assert (stats.memory_hits, stats.misses) == (1, 2)
+
+
+def test_persistent_tier_survives_memory_loss(model) -> None:
+    asyncio.run(acall_model(_state("hello")))
+    cache = get_response_cache()
+    cache.memory.clear()
+
+    result = asyncio.run(acall_model(_state("hello")))
+
+    assert result == {"response": "answer 1"}
+    assert model.calls == 1
+    assert cache.stats.db_hits == 1
+
+
+def test_ttl_and_size_bound(db_engine, monkeypatch) -> None:
+    from sqlalchemy import func, select
+
+    from src.database.models import llm_responses
+    import src.graphs.response_cache as response_cache
+
+    monkeypatch.setattr(response_cache, "PRUNE_EVERY", 1)
+    cache = ResponseCache(ttl=60, memory_size=10, max_rows=3)
+    for i in range(5):
+        cache.set(f"k{i}", MODEL_NAME, f"v{i}")
+
+    with db_engine.connect() as conn:
+        count = conn.execute(select(func.count()).select_from(llm_responses)).scalar_one()
+    assert count == 3
+
+    cache.memory.clear()
+    assert cache.get("k0") is None
+    assert cache.get("k4") == "v4"
+
+    cache.ttl = -1
+    cache.memory.clear()
+    assert cache.get("k4") is None
+
+
+def test_rewriting_a_key_replaces_its_row(db_engine) -> None:
+    cache = ResponseCache(ttl=60, memory_size=10, max_rows=10)
+    cache.set("k", MODEL_NAME, "old")
+    asyncio.run(cache.aset("k", MODEL_NAME, "new"))
+
+    cache.memory.clear()
+    assert cache.get("k") == "new"
+
+
+def test_failed_cache_write_keeps_model_response(model, monkeypatch) -> None:
+    def broken_write(self, conn, key, model_name, response):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(ResponseCache, "_write", broken_write)
+
+    assert call_model(_state("hello")) == {"response": "answer 1"}
+    assert asyncio.run(acall_model(_state("bye"))) == {"response": "answer 2"}
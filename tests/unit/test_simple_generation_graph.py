@@ -1,6 +1,14 @@
+import asyncio
+
 import pytest
 
-from src.graphs.simple_generation_graph import SimpleGenerationGraph, call_model
+from src.graphs import registry
+from src.graphs.simple_generation_graph import (
+    MODEL_NAME,
+    SimpleGenerationGraph,
+    acall_model,
+    call_model,
+)
 
 
 class FakeGraph:
@@ -12,6 +20,9 @@ class FakeGraph:
         self.last_state = initial_state
         return self._result
 
+    async def ainvoke(self, initial_state):
+        return self.invoke(initial_state)
+
 
 def test_call_model_uses_response_content(monkeypatch) -> None:
     class DummyResponse:
@@ -25,14 +36,13 @@ def test_call_model_uses_response_content(monkeypatch) -> None:
     def fake_init_chat_model(_name: str):
         return DummyModel()
 
-    monkeypatch.setattr(
-        "src.graphs.simple_generation_graph.init_chat_model",
-        fake_init_chat_model,
-    )
+    monkeypatch.setattr("src.graphs.registry.init_chat_model", fake_init_chat_model)
+    registry.reload()
 
     result = call_model({"messages": [{"role": "user", "content": "hi"}], "user_profile": {}})
 
     assert result == {"response": "ok"}
+    registry.reload()
 
 
 def test_invoke_returns_response_string() -> None:
@@ -64,3 +74,49 @@ def test_invoke_raises_on_missing_response_string() -> None:
 
     with pytest.raises(ValueError, match="missing a response string"):
         graph.invoke([], {})
+
+
+def test_acall_model_awaits_model(monkeypatch) -> None:
+    class DummyResponse:
+        content = "async ok"
+
+    class DummyModel:
+        async def ainvoke(self, messages):
+            return DummyResponse()
+
+    registry.set_chat_model(MODEL_NAME, DummyModel())
+
+    result = asyncio.run(acall_model({"messages": [], "user_profile": {}}))
+
+    assert result == {"response": "async ok"}
+    registry.reload()
+
+
+def test_ainvoke_returns_response_string() -> None:
+    graph = SimpleGenerationGraph()
+    graph.graph = FakeGraph({"response": "hello"})
+
+    assert asyncio.run(graph.ainvoke([], {})) == "hello"
+
+    graph.graph = FakeGraph({"response": None})
+    with pytest.raises(ValueError, match="missing a response string"):
+        asyncio.run(graph.ainvoke([], {}))
+
+
+def test_astream_yields_model_tokens() -> None:
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+
+    registry.set_chat_model(
+        MODEL_NAME, GenericFakeChatModel(messages=iter([AIMessage("one two")]))
+    )
+
+    async def collect() -> list[str]:
+        graph = SimpleGenerationGraph()
+        return [chunk async for chunk in graph.astream([{"role": "user", "content": "hi"}], {})]
+
+    chunks = asyncio.run(collect())
+    registry.reload()
+
+    assert "".join(chunks) == "one two"
+    assert len(chunks) > 1
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_load() -> None:
+    flight: SingleFlight[int] = SingleFlight()
+    loads = []
+
+    async def load() -> int:
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def scenario():
+        first = await asyncio.gather(*(flight.run((1,), load) for _ in range(10)))
+        second = await flight.run((1,), load)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first == [42] * 10 and second == 42
+    assert len(loads) == 2
+    assert (flight.stats.calls, flight.stats.loads) == (11, 2)
+    assert flight.stats.dedup_ratio == pytest.approx(9 / 11)
+    assert len(flight) == 0
+
+
+def test_errors_are_shared_and_not_cached() -> None:
+    flight: SingleFlight[int] = SingleFlight()
+
+    async def load() -> int:
+        await asyncio.sleep(0.01)
+        raise KeyError("missing")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.run((1,), load) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, KeyError) for result in results)
+    assert flight.stats.loads == 1
+    assert len(flight) == 0
+
+
+def test_cancelled_caller_does_not_cancel_the_load() -> None:
+    flight: SingleFlight[int] = SingleFlight()
+
+    async def load() -> int:
+        await asyncio.sleep(0.02)
+        return 7
+
+    async def scenario():
+        first = asyncio.create_task(flight.run((1,), load))
+        second = asyncio.create_task(flight.run((1,), load))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == 7
+
+
+def test_forget_starts_a_new_load() -> None:
+    flight: SingleFlight[int] = SingleFlight()
+    values = iter([1, 2])
+
+    async def load() -> int:
+        value = next(values)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def scenario():
+        before = asyncio.create_task(flight.run((5, None), load))
+        await asyncio.sleep(0)
+        flight.forget(5)
+        after = await flight.run((5, None), load)
+        return await before, after
+
+    assert asyncio.run(scenario()) == (1, 2)
@@ -0,0 +1,91 @@
+import asyncio
+
+from src.cache import LRUCache
+from src.user_profile import UserProfile, get_profile_cache, set_profile_cache
+
+
+def test_load_is_cached_until_save(db_engine) -> None:
+    cache = LRUCache()
+    set_profile_cache(cache)
+    profile_id = UserProfile(name="Ada").save()
+
+    assert UserProfile.load(profile_id).name == "Ada"
+    assert UserProfile.load(profile_id).name == "Ada"
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+    profile = UserProfile.load(profile_id)
+    profile.name = "Grace"
+    profile.save()
+
+    assert UserProfile.load(profile_id).name == "Grace"
+    assert cache.stats.misses == 2
+
+
+def test_aload_shares_cache(db_engine) -> None:
+    profile_id = UserProfile(name="Ada").save()
+    UserProfile.load(profile_id)
+
+    profile = asyncio.run(UserProfile.aload(profile_id))
+
+    assert profile.name == "Ada"
+    assert get_profile_cache().stats.hits == 1
+
+
+def test_save_during_aload_is_not_overwritten_in_cache(db_engine, monkeypatch) -> None:
+    set_profile_cache(LRUCache())
+    profile_id = UserProfile(name="Ada").save()
+    original = UserProfile._read.__func__
+
+    def read_then_save(cls, conn, profile_id):
+        profile = original(cls, conn, profile_id)
+        # A save lands after the row was read but before the cache is filled
+        UserProfile(name="Grace", id=profile_id).save()
+        return profile
+
+    monkeypatch.setattr(UserProfile, "_read", classmethod(read_then_save))
+    assert asyncio.run(UserProfile.aload(profile_id)).name == "Ada"
+    monkeypatch.setattr(UserProfile, "_read", classmethod(original))
+
+    assert get_profile_cache().get(str(profile_id)) is None
+    assert asyncio.run(UserProfile.aload(profile_id)).name == "Grace"
+
+
+def test_async_paths_use_async_cache_methods(db_engine) -> None:
+    class AsyncOnlyCache(LRUCache):
+        def get(self, key):
+            raise AssertionError("blocking cache call on the event loop")
+
+        def delete(self, key):
+            raise AssertionError("blocking cache call on the event loop")
+
+        async def aget(self, key):
+            return LRUCache.get(self, key)
+
+        async def adelete(self, key):
+            LRUCache.delete(self, key)
+
+    cache = AsyncOnlyCache()
+    set_profile_cache(cache)
+
+    async def scenario() -> str:
+        profile_id = await UserProfile(name="Ada").asave()
+        await UserProfile.aload(profile_id)
+        profile = await UserProfile.aload(profile_id)
+        profile.name = "Grace"
+        await profile.asave()
+        return (await UserProfile.aload(profile_id)).name
+
+    assert asyncio.run(scenario()) == "Grace"
+    assert (cache.stats.hits, cache.stats.misses) == (1, 2)
+
+
+def test_default_cache_is_lru(monkeypatch) -> None:
+    monkeypatch.delenv("PROFILE_CACHE_URL", raising=False)
+    monkeypatch.setenv("PROFILE_CACHE_SIZE", "7")
+    set_profile_cache(None)
+
+    cache = get_profile_cache()
+
+    assert isinstance(cache, LRUCache)
+    assert cache.maxsize == 7
+    set_profile_cache(None)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from src.retrieval.embeddings import HashingEmbedder
+from src.retrieval.vector_index import VectorIndex
+
+
+def test_hashing_embedder_is_deterministic_and_normalized() -> None:
+    embedder = HashingEmbedder(dim=64)
+
+    first = embedder.embed(["The quick brown fox", ""])
+    second = HashingEmbedder(dim=64).embed(["the QUICK brown fox"])
+
+    assert first.shape == (2, 64)
+    assert first.dtype == np.float32
+    np.testing.assert_allclose(first[0], second[0])
+    assert np.linalg.norm(first[0]) == pytest.approx(1.0)
+    assert not first[1].any()
+
+
+def test_search_matches_brute_force() -> None:
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 32)).astype(np.float32)
+    queries = rng.normal(size=(8, 32)).astype(np.float32)
+    index = VectorIndex(dim=32, capacity=16)
+    index.add([str(i) for i in range(500)], vectors, [f"text {i}" for i in range(500)])
+
+    results = index.search(queries, k=5)
+
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ unit.T)
+    for row, hits in enumerate(results):
+        assert [hit.id for hit in hits] == [str(i) for i in expected[row, :5]]
+        assert hits[0].score >= hits[-1].score
+
+
+def test_add_upserts_and_remove_keeps_rows_dense() -> None:
+    index = VectorIndex(dim=2)
+    index.add(["a", "b", "c"], np.array([[1.0, 0.0], [1.0, 1.0], [0.0, 1.0]]), ["a", "b", "c"])
+    index.add(["a"], np.array([[0.0, 1.0]]), ["a2"], [{"source": "x"}])
+
+    assert len(index) == 3
+    assert index.search(np.array([0.0, 1.0]), k=1)[0][0].text in ("a2", "c")
+
+    assert index.remove(["a", "missing"]) == 1
+    assert len(index) == 2 and "a" not in index
+    hits = index.search(np.array([1.0, 0.0]), k=10)[0]
+    assert [hit.id for hit in hits] == ["b", "c"]
+    assert hits[0].score == pytest.approx(np.sqrt(0.5))
+
+
+def test_search_empty_index() -> None:
+    assert VectorIndex(dim=4).search(np.ones((2, 4)), k=3) == [[], []]